@@ -5,7 +5,7 @@ YOLO RTSP Integration - Home Assistant Custom Component
 from homeassistant.core import HomeAssistant
 from homeassistant.config_entries import ConfigEntry
 from homeassistant.helpers.typing import ConfigType
-from .const import DOMAIN
+from .const import DOMAIN, CONF_MAX_CONCURRENT, CONF_MAX_QUEUED, entry_option
 
 async def async_setup(hass: HomeAssistant, config: ConfigType) -> bool:
     """Set up the integration from configuration.yaml (not used)."""
@@ -21,9 +21,40 @@ async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     from .services import async_setup_services
     integration_dir = entry.entry_id  # Not used for now, but can pass integration path if needed
     await async_setup_services(hass, integration_dir)
+
+    # One keep-alive client shared by every service call of this entry
+    # Satu klien keep-alive dikongsi oleh semua panggilan servis entry ini
+    from .api_client import YoloApiClient, MAX_CONCURRENT_INFERENCES, MAX_QUEUED_INFERENCES
+    # Keep one event stream open so watched cameras update entities as results arrive
+    # Buka satu sambungan event supaya entiti dikemas kini bila hasil sampai
+    from .event_listener import DetectionEventListener
+    from .services import async_handle_stream_event
+    api_url = entry.data.get("external_api_url")
+    if api_url:
+        listener = DetectionEventListener(
+            hass, api_url, lambda event: async_handle_stream_event(hass, event, entry.entry_id))
+        listener.start()
+        client = YoloApiClient(api_url, entry_option(entry, CONF_MAX_CONCURRENT, MAX_CONCURRENT_INFERENCES),
+                               entry_option(entry, CONF_MAX_QUEUED, MAX_QUEUED_INFERENCES))
+        hass.data[DOMAIN][entry.entry_id] = {"listener": listener, "client": client}
+    # Existing entities of this entry pick up thresholds changed in the options flow
+    # Entiti sedia ada guna had yang ditukar dalam options flow
+    from .services import async_apply_entity_options
+    async_apply_entity_options(hass, entry.entry_id)
+    # Options flow changes are applied by reloading the entry
+    # Perubahan options flow digunakan dengan memuat semula entry
+    entry.async_on_unload(entry.add_update_listener(async_reload_entry))
     return True
 
+async def async_reload_entry(hass: HomeAssistant, entry: ConfigEntry):
+    """Reload a config entry after its options changed."""
+    await hass.config_entries.async_reload(entry.entry_id)
+
 async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Unload a config entry."""
-    hass.data[DOMAIN].pop(entry.entry_id, None)
+    entry_data = hass.data[DOMAIN].pop(entry.entry_id, None)
+    if entry_data and entry_data.get("listener"):
+        await entry_data["listener"].stop()
+    if entry_data and entry_data.get("client"):
+        await entry_data["client"].close()
     return True
@@ -0,0 +1,110 @@
+"""Shared async client for the YOLO API, one per config entry.
+# Klien async yang dikongsi untuk API YOLO, satu untuk setiap config entry.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+import aiohttp
+
+_LOGGER = logging.getLogger(__name__)
+
+INFERENCE_PATH = "/api/inference"
+# The API runs INFERENCE_WORKERS=1 inference worker with INFERENCE_QUEUE_SIZE=8 queue slots by default.
+# Two calls in flight keep the next image queued while one runs; more would only wait in the
+# API's queue (and a tiled or sequence call takes several slots), so extra calls wait here instead.
+# Both limits are config entry options; raise them together with the API's workers and queue.
+MAX_CONCURRENT_INFERENCES = 2
+# Calls waiting for a free slot beyond this are refused instead of piling up
+MAX_QUEUED_INFERENCES = 8
+# Keep-alive connections kept open to the API
+MAX_CONNECTIONS = 8
+
+
+class YoloApiError(Exception):
+    """API call failed; status is the HTTP status, or None when the API was not reached."""
+
+    def __init__(self, message: str, status: Optional[int] = None):
+        super().__init__(message)
+        self.status = status
+
+
+class YoloApiClient:
+    """One keep-alive session, a concurrency limit with a bounded queue, and single-flight calls.
+    # Satu sesi keep-alive, had serentak dengan barisan terhad, dan gabung panggilan yang sama."""
+
+    def __init__(self, api_url: str, max_concurrent: int = MAX_CONCURRENT_INFERENCES,
+                 max_queued: int = MAX_QUEUED_INFERENCES):
+        self.api_url = api_url.rstrip("/")
+        self._session = None
+        self._slots = asyncio.Semaphore(max_concurrent)
+        self._max_waiting = max_concurrent + max_queued
+        self._waiting = 0  # Calls holding or waiting for a slot
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+
+    @property
+    def session(self) -> aiohttp.ClientSession:
+        # Created lazily so it belongs to the running event loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=MAX_CONNECTIONS))
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def request(self, method: str, path: str, timeout: float = 10, **kwargs) -> aiohttp.ClientResponse:
+        """Plain request on the shared session (not counted against the inference limit).
+        The response is already read, so it can be used after the call returns."""
+        try:
+            async with self.session.request(method, self.api_url + path,
+                                            timeout=aiohttp.ClientTimeout(total=timeout), **kwargs) as resp:
+                await resp.read()
+                return resp
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise YoloApiError(f"Error contacting YOLO API: {e!r}") from e
+
+    async def inference(self, timeout: float = 60, **kwargs) -> Dict[str, Any]:
+        """POST /api/inference within the concurrency limit; kwargs are json= or data=.
+        # Hantar inference, tunggu giliran kalau had serentak penuh."""
+        if self._waiting >= self._max_waiting:
+            raise YoloApiError("Too many YOLO inference calls queued", 429)
+        self._waiting += 1
+        try:
+            async with self._slots:
+                resp = await self.request("POST", INFERENCE_PATH, timeout=timeout, **kwargs)
+        finally:
+            self._waiting -= 1
+        if resp.status != 200:
+            raise YoloApiError(f"API request failed: {resp.status} {await resp.text()}", resp.status)
+        result = await resp.json()
+        if "error" in result:
+            raise YoloApiError(f"API error: {result['error']}", resp.status)
+        return result
+
+    async def single_flight(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """Run factory() once for concurrent calls with the same key; every caller gets its result.
+        # Panggilan serentak dengan kunci sama berkongsi satu permintaan."""
+        future = self._inflight.get(key)
+        if future is not None:
+            _LOGGER.debug(f"Joining in-flight YOLO call {key}")
+            # shield: a cancelled follower must not cancel the leader's call
+            return await asyncio.shield(future)
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            result = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            # Mark retrieved so an exception nobody else awaited is not logged as unhandled
+            future.exception()
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(key, None)
@@ -1,62 +1,29 @@
-import requests
-from typing import Optional, Dict, Any
+from typing import Dict, Any
 
-# These functions now send requests to the external YOLO API.
+from .api_client import YoloApiClient
 
-EXTERNAL_API_URL = None  # Will be set from config
+# These functions send requests to the external YOLO API through the shared client.
+# Fungsi ini hantar permintaan ke API YOLO luaran melalui klien yang dikongsi.
 
 
-def set_external_api_url(url: str):
-    global EXTERNAL_API_URL
-    EXTERNAL_API_URL = url
+async def fetch_single_frame(client: YoloApiClient, rtsp_url: str, model: str) -> Dict[str, Any]:
+    """Send RTSP URL to external YOLO API for single frame inference.
+    Raises YoloApiError on failure."""
+    return await client.inference(json={"rtsp_url": rtsp_url, "model": model, "mode": "single"}, timeout=60)
 
 
-def fetch_single_frame(rtsp_url: str) -> Optional[Dict[str, Any]]:
-    """Send RTSP URL to external YOLO API for single frame inference.
-    Return API response (dict) or None on error."""
-    if not EXTERNAL_API_URL:
-        print("External YOLO API URL not set.")
-        return None
-    try:
-        resp = requests.post(EXTERNAL_API_URL + "/inference", json={"rtsp_url": rtsp_url, "mode": "single"}, timeout=30)
-        if resp.status_code == 200:
-            return resp.json()
-        print(f"API error: {resp.status_code} {resp.text}")
-        return None
-    except Exception as e:
-        print(f"Error contacting external YOLO API: {e}")
-        return None
-
-
-def fetch_frame_sequence(rtsp_url: str, count: int = 5, interval: int = 1) -> Optional[Dict[str, Any]]:
-    """Send RTSP URL to external YOLO API for sequence inference."""
-    if not EXTERNAL_API_URL:
-        print("External YOLO API URL not set.")
-        return None
-    try:
-        resp = requests.post(EXTERNAL_API_URL + "/inference", json={"rtsp_url": rtsp_url, "mode": "sequence", "count": count, "interval": interval}, timeout=60)
-        if resp.status_code == 200:
-            return resp.json()
-        print(f"API error: {resp.status_code} {resp.text}")
-        return None
-    except Exception as e:
-        print(f"Error contacting external YOLO API: {e}")
-        return None
-
-
-def load_manual_image(image_path: str) -> Optional[Dict[str, Any]]:
-    """Send manual image file to external YOLO API for inference."""
-    if not EXTERNAL_API_URL:
-        print("External YOLO API URL not set.")
-        return None
-    try:
-        with open(image_path, "rb") as f:
-            files = {"image": f}
-            resp = requests.post(EXTERNAL_API_URL + "/inference", files=files, data={"mode": "manual"}, timeout=30)
-            if resp.status_code == 200:
-                return resp.json()
-            print(f"API error: {resp.status_code} {resp.text}")
-            return None
-    except Exception as e:
-        print(f"Error contacting external YOLO API: {e}")
-        return None
+async def fetch_frame_sequence(client: YoloApiClient, rtsp_url: str, model: str,
+                               count: int = 5, interval: int = 1) -> Dict[str, Any]:
+    """Send RTSP URL to external YOLO API for sequence inference.
+    # Pelayan baca semua bingkai dari satu strim dan gabungkan hasil"""
+    payload = {"rtsp_url": rtsp_url, "model": model, "mode": "sequence", "count": count, "interval": interval}
+    return await client.inference(json=payload, timeout=60 + count * interval)
+
+
+async def load_manual_image(client: YoloApiClient, image_data: bytes, model: str) -> Dict[str, Any]:
+    """Send manual image bytes to external YOLO API for inference."""
+    import aiohttp
+    data = aiohttp.FormData()
+    data.add_field("image", image_data, filename="image.jpg", content_type="image/jpeg")
+    data.add_field("model", model)
+    return await client.inference(data=data, timeout=60)
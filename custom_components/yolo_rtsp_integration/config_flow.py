@@ -2,6 +2,10 @@ import voluptuous as vol
 from homeassistant import config_entries
 from homeassistant.core import callback
 from .const import DOMAIN, CONF_CAMERA_URL, CONF_MODEL_PATH, CONF_FETCH_MODE, CONF_SEQUENCE_LENGTH, CONF_FRAME_INTERVAL
+from .const import (CONF_CONFIDENCE_CHANGE, CONF_MIN_UPDATE_INTERVAL, CONF_CLASS_SENSORS,
+                    DEFAULT_CONFIDENCE_CHANGE, DEFAULT_MIN_UPDATE_INTERVAL, DEFAULT_CLASS_SENSORS,
+                    CONF_MAX_CONCURRENT, CONF_MAX_QUEUED, entry_option)
+from .api_client import MAX_CONCURRENT_INFERENCES, MAX_QUEUED_INFERENCES
 
 FETCH_MODES = ["single", "sequence", "manual"]
 
@@ -21,6 +25,11 @@ class YoloRtspConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
 
     VERSION = 1
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry):
+        return YoloRtspOptionsFlow(config_entry)
+
     async def async_step_user(self, user_input=None):
         errors = {}
         if user_input is not None:
@@ -83,6 +92,16 @@ class YoloRtspConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             vol.Required(CONF_FETCH_MODE, default="manual"): vol.In(FETCH_MODES),
             vol.Optional(CONF_SEQUENCE_LENGTH, default=5): int,
             vol.Optional(CONF_FRAME_INTERVAL, default=1): int,
+            # Entity updates: write only when a class count changes or a best confidence
+            # moves by confidence_change, at most once every min_update_interval seconds
+            vol.Optional(CONF_CONFIDENCE_CHANGE, default=DEFAULT_CONFIDENCE_CHANGE): vol.All(
+                vol.Coerce(float), vol.Range(min=0, max=1)),
+            vol.Optional(CONF_MIN_UPDATE_INTERVAL, default=DEFAULT_MIN_UPDATE_INTERVAL): vol.All(
+                vol.Coerce(float), vol.Range(min=0)),
+            vol.Optional(CONF_CLASS_SENSORS, default=DEFAULT_CLASS_SENSORS): bool,
+            # Inference calls sent at once and waiting in Home Assistant (match the API's workers/queue)
+            vol.Optional(CONF_MAX_CONCURRENT, default=MAX_CONCURRENT_INFERENCES): vol.All(int, vol.Range(min=1)),
+            vol.Optional(CONF_MAX_QUEUED, default=MAX_QUEUED_INFERENCES): vol.All(int, vol.Range(min=0)),
         }
         
         # Only add camera_url if not manual mode (and fetch_mode is explicitly set)
@@ -90,3 +109,32 @@ class YoloRtspConfigFlow(config_entries.ConfigFlow, domain=DOMAIN):
             base_schema[vol.Required(CONF_CAMERA_URL, description=FIELD_LABELS[CONF_CAMERA_URL])] = str
             
         return vol.Schema(base_schema)
+
+
+class YoloRtspOptionsFlow(config_entries.OptionsFlow):
+    """Change the options of an existing entry; the entry is reloaded to apply them.
+    # Tukar pilihan entry sedia ada; entry dimuat semula untuk guna pilihan baru
+    """
+
+    def __init__(self, config_entry):
+        self._entry = config_entry
+
+    async def async_step_init(self, user_input=None):
+        if user_input is not None:
+            return self.async_create_entry(title="", data=user_input)
+        return self.async_show_form(step_id="init", data_schema=self._get_schema())
+
+    def _get_schema(self):
+        def option(key, default):
+            return vol.Optional(key, default=entry_option(self._entry, key, default))
+        
+        return vol.Schema({
+            # Entity updates: write only when a class count changes or a best confidence
+            # moves by confidence_change, at most once every min_update_interval seconds
+            option(CONF_CONFIDENCE_CHANGE, DEFAULT_CONFIDENCE_CHANGE): vol.All(vol.Coerce(float), vol.Range(min=0, max=1)),
+            option(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL): vol.All(vol.Coerce(float), vol.Range(min=0)),
+            option(CONF_CLASS_SENSORS, DEFAULT_CLASS_SENSORS): bool,
+            # Inference calls sent at once and waiting in Home Assistant (match the API's workers/queue)
+            option(CONF_MAX_CONCURRENT, MAX_CONCURRENT_INFERENCES): vol.All(int, vol.Range(min=1)),
+            option(CONF_MAX_QUEUED, MAX_QUEUED_INFERENCES): vol.All(int, vol.Range(min=0)),
+        })
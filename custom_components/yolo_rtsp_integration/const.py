@@ -9,3 +9,24 @@ CONF_OUTPUT_IMAGE = "output_image"
 CONF_OUTPUT_JSON = "output_json"
 CONF_MODEL_UPLOAD = "model_upload"
 CONF_MODEL_SELECT = "model_select"
+
+# Entity update limits (keep the recorder small); options stored in the config entry
+# Had kemas kini entiti supaya pangkalan data recorder tak membesar
+CONF_CONFIDENCE_CHANGE = "confidence_change"
+CONF_MIN_UPDATE_INTERVAL = "min_update_interval"
+CONF_CLASS_SENSORS = "class_sensors"
+DEFAULT_CONFIDENCE_CHANGE = 0.1  # Max confidence change that counts as a new state
+DEFAULT_MIN_UPDATE_INTERVAL = 5  # Seconds between state writes per entity
+DEFAULT_CLASS_SENSORS = True  # One count sensor per detected class
+
+# Limits for calls to /api/inference (see api_client.py)
+# Had panggilan serentak ke API
+CONF_MAX_CONCURRENT = "max_concurrent_inferences"
+CONF_MAX_QUEUED = "max_queued_inferences"
+
+
+def entry_option(entry, key, default):
+    """Option of a config entry: changed in the options flow, else set when it was added.
+    # Pilihan entry: dari options flow, atau dari masa integrasi ditambah
+    """
+    return entry.options.get(key, entry.data.get(key, default))
@@ -1,7 +1,10 @@
 from homeassistant.helpers.entity import Entity
+from homeassistant.helpers.event import async_call_later
 from homeassistant.const import ATTR_ATTRIBUTION
-import os
-import json
+from homeassistant.core import callback
+import time
+from typing import Callable, Optional
+from .const import DEFAULT_CONFIDENCE_CHANGE, DEFAULT_MIN_UPDATE_INTERVAL
 
 class DetectionImageEntity(Entity):
     """Entity to store and expose the latest detection image.
@@ -27,15 +30,36 @@ class DetectionImageEntity(Entity):
         }
 
     def update_image(self, image_path: str):
+        if image_path == self._image_path:
+            return  # Tiada perubahan, tak perlu tulis (Unchanged, nothing to write)
         self._image_path = image_path  # Update lokasi gambar baru
         self.schedule_update_ha_state()  # Bagi Home Assistant tahu dah update
 
+def summarize_detections(detections: list) -> dict:
+    """Per-class counts and best confidence of a detection list.
+    # Ringkasan bilangan dan keyakinan tertinggi untuk setiap kelas."""
+    counts, max_confidence = {}, {}
+    for obj in detections:
+        cls = obj.get("class", "unknown")
+        counts[cls] = counts.get(cls, 0) + 1
+        if obj.get("confidence") is not None:
+            max_confidence[cls] = max(max_confidence.get(cls, 0.0), round(obj["confidence"], 2))
+    return {"total": len(detections), "counts": counts, "max_confidence": max_confidence}
+
 class ObjectStatusEntity(Entity):
-    """Entity to store and expose detection JSON as attributes.
-# Kelas ni simpan dan tunjuk hasil pengesanan dalam bentuk JSON."""
-    def __init__(self, name: str, detection_json: list):
+    """Entity to expose a compact detection summary, written only on significant changes.
+# Kelas ni tunjuk ringkasan pengesanan, hanya dikemas kini bila ada perubahan ketara."""
+    def __init__(self, name: str, detection_json: list, confidence_change: float = DEFAULT_CONFIDENCE_CHANGE,
+                 min_update_interval: float = DEFAULT_MIN_UPDATE_INTERVAL,
+                 on_write: Optional[Callable[[dict, Optional[str]], None]] = None):
         self._name = name
-        self._detection_json = detection_json
+        self._summary = summarize_detections(detection_json)  # Ringkasan yang ditulis (Written summary)
+        self._pending = None  # (summary, image url) menunggu debounce (waiting for the debounce)
+        self._on_write = on_write  # Update related entities with what was written
+        self._confidence_change = confidence_change
+        self._min_update_interval = min_update_interval
+        self._last_write = 0.0
+        self._cancel_timer = None
 
     @property
     def name(self):
@@ -43,17 +67,96 @@ class ObjectStatusEntity(Entity):
 
     @property
     def state(self):
-        return len(self._detection_json)  # Bilangan objek dikesan (Number of detected objects)
+        return self._summary["total"]  # Bilangan objek dikesan (Number of detected objects)
 
     @property
     def extra_state_attributes(self):
-        # Flatten detection JSON for attributes
-        # Rata hasil pengesanan untuk dijadikan atribut
-        attrs = {f"object_{i+1}": obj for i, obj in enumerate(self._detection_json)}
-        attrs[ATTR_ATTRIBUTION] = "YOLO RTSP Integration"  # Sumber
-        attrs["json"] = json.dumps(self._detection_json)  # Simpan sebagai JSON
-        return attrs
-
-    def update_detection(self, detection_json: list):
-        self._detection_json = detection_json  # Update hasil pengesanan baru
-        self.schedule_update_ha_state()  # Bagi Home Assistant tahu dah update
+        # Counts and best confidence per class; full detections stay in the saved JSON files
+        # Bilangan dan keyakinan tertinggi ikut kelas; senarai penuh ada dalam fail JSON
+        return {
+            ATTR_ATTRIBUTION: "YOLO RTSP Integration",  # Sumber
+            "counts": self._summary["counts"],
+            "max_confidence": self._summary["max_confidence"],
+        }
+
+    def set_thresholds(self, confidence_change: float, min_update_interval: float):
+        """Use changed options for the results that follow.
+        # Guna had baru untuk hasil seterusnya"""
+        self._confidence_change = confidence_change
+        self._min_update_interval = min_update_interval
+
+    def _significant(self, summary: dict) -> bool:
+        """A class count changed, or a class's best confidence moved by confidence_change or more."""
+        if summary["counts"] != self._summary["counts"]:
+            return True
+        old = self._summary["max_confidence"]
+        return any(abs(conf - old.get(cls, 0.0)) >= self._confidence_change
+                   for cls, conf in summary["max_confidence"].items())
+
+    def update_detection(self, detection_json: list, image_url: str = None) -> bool:
+        """Take a new detection list; returns True when it will be written (now or after the debounce).
+        # Terima hasil baru; True kalau akan ditulis ke Home Assistant"""
+        summary = summarize_detections(detection_json)
+        if not self._significant(summary):
+            # Back to the written state: nothing left to flush
+            self._pending = None
+            return False
+        wait = self._last_write + self._min_update_interval - time.monotonic()
+        if wait <= 0 or self.hass is None:
+            self._write(summary, image_url)
+            return True
+        # Debounce: write the newest summary once the interval has passed
+        self._pending = (summary, image_url)
+        if self._cancel_timer is None:
+            self._cancel_timer = async_call_later(self.hass, wait, self._flush)
+        return True
+
+    @callback
+    def _flush(self, _now):
+        # @callback: run on the event loop, not in an executor thread
+        self._cancel_timer = None
+        if self._pending is not None:
+            self._write(*self._pending)
+
+    def _write(self, summary: dict, image_url: str = None):
+        self._summary = summary
+        self._pending = None
+        self._last_write = time.monotonic()
+        if self.hass is not None:  # Not added yet: the new state is picked up when it is
+            self.schedule_update_ha_state()  # Bagi Home Assistant tahu dah update
+        if self._on_write:
+            self._on_write(summary, image_url)
+
+    async def async_will_remove_from_hass(self):
+        if self._cancel_timer is not None:
+            self._cancel_timer()
+            self._cancel_timer = None
+
+class ClassCountEntity(Entity):
+    """Entity counting one detected class; written only when the count changes.
+# Kelas ni kira satu jenis objek sahaja."""
+    def __init__(self, name: str, class_name: str, count: int):
+        self._name = name
+        self.class_name = class_name
+        self._count = count
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def state(self):
+        return self._count
+
+    @property
+    def extra_state_attributes(self):
+        return {
+            ATTR_ATTRIBUTION: "YOLO RTSP Integration",  # Sumber
+            "class": self.class_name,
+        }
+
+    def update_count(self, count: int):
+        if count != self._count:
+            self._count = count
+            if self.hass is not None:
+                self.schedule_update_ha_state()
@@ -0,0 +1,93 @@
+"""Persistent subscription to detection events pushed by the YOLO API.
+# Sambungan kekal untuk terima hasil pengesanan yang ditolak oleh API YOLO.
+"""
+import asyncio
+import json
+import logging
+from typing import Awaitable, Callable, Dict, Any
+
+import aiohttp
+
+from homeassistant.core import HomeAssistant
+
+_LOGGER = logging.getLogger(__name__)
+
+EVENTS_PATH = "/api/events"
+# The API sends a keep-alive comment every 15 s; anything longer means the link is dead
+READ_TIMEOUT = 60
+MAX_BACKOFF = 60
+
+
+class DetectionEventListener:
+    """Keep one server-sent events connection open and dispatch each event.
+    # Buka satu sambungan SSE dan hantar setiap event ke callback."""
+
+    def __init__(self, hass: HomeAssistant, api_url: str,
+                 on_event: Callable[[Dict[str, Any]], Awaitable[None]]):
+        self._hass = hass
+        self._url = api_url.rstrip("/") + EVENTS_PATH
+        self._on_event = on_event
+        self._task = None
+        self._session = None
+
+    def start(self):
+        if self._task is None:
+            self._task = self._hass.async_create_background_task(self._run(), "yolo_rtsp_event_listener")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def _run(self):
+        """Reconnect loop with exponential backoff.
+        # Cuba sambung semula kalau terputus."""
+        backoff = 1
+        timeout = aiohttp.ClientTimeout(total=None, sock_connect=10, sock_read=READ_TIMEOUT)
+        self._session = aiohttp.ClientSession(timeout=timeout)
+        while True:
+            try:
+                async with self._session.get(self._url, headers={"Accept": "text/event-stream"}) as resp:
+                    if resp.status != 200:
+                        raise aiohttp.ClientResponseError(resp.request_info, resp.history, status=resp.status)
+                    _LOGGER.info(f"Connected to YOLO event stream {self._url}")
+                    backoff = 1
+                    await self._consume(resp)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                _LOGGER.debug(f"YOLO event stream disconnected: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, MAX_BACKOFF)
+
+    async def _consume(self, resp):
+        """Parse the SSE wire format: 'event:'/'data:' lines ended by a blank line."""
+        data_lines = []
+        async for raw in resp.content:
+            line = raw.decode("utf-8").rstrip("\r\n")
+            if not line:
+                if data_lines:
+                    await self._dispatch("\n".join(data_lines))
+                    data_lines = []
+            elif line.startswith(":"):
+                continue  # Keep-alive comment
+            elif line.startswith("data:"):
+                data_lines.append(line[5:].lstrip())
+
+    async def _dispatch(self, data: str):
+        try:
+            event = json.loads(data)
+        except ValueError:
+            _LOGGER.warning(f"Ignoring malformed YOLO event: {data[:200]}")
+            return
+        try:
+            await self._on_event(event)
+        except Exception as e:
+            _LOGGER.error(f"Error handling YOLO event: {e}")
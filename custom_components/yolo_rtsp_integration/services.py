@@ -1,8 +1,11 @@
 from homeassistant.core import HomeAssistant, ServiceCall
 from homeassistant.helpers import entity_platform
 from homeassistant.helpers.entity_component import EntityComponent
-from .camera_fetcher import fetch_single_frame, fetch_frame_sequence, load_manual_image, set_external_api_url
-from .entities import DetectionImageEntity, ObjectStatusEntity
+from .api_client import YoloApiClient, YoloApiError
+from .camera_fetcher import fetch_single_frame, fetch_frame_sequence, load_manual_image
+from .entities import DetectionImageEntity, ObjectStatusEntity, ClassCountEntity, summarize_detections
+from .const import (DOMAIN, CONF_CONFIDENCE_CHANGE, CONF_MIN_UPDATE_INTERVAL, CONF_CLASS_SENSORS,
+                    DEFAULT_CONFIDENCE_CHANGE, DEFAULT_MIN_UPDATE_INTERVAL, DEFAULT_CLASS_SENSORS, entry_option)
 import os
 import json
 from datetime import datetime
@@ -16,6 +19,188 @@ _LOGGER = logging.getLogger(__name__)
 # NOTE: Files under /config/www are served at /local in the UI
 MEDIA_DIR = "www/yolo_rtsp_integration"
 
+# Had simpan hasil dalam MEDIA_DIR (Retention for saved results; 0 disables a limit)
+MEDIA_MAX_RESULTS = 200
+MEDIA_MAX_AGE_DAYS = 7
+
+# Event bus event fired for every track enter/exit (use as an automation trigger)
+TRACK_EVENT = f"{DOMAIN}_track"
+
+def prune_media(media_dir: str, max_results: int = MEDIA_MAX_RESULTS, max_age_days: float = MEDIA_MAX_AGE_DAYS) -> int:
+    """Delete old detection_* files beyond the count and age limits (blocking, run in executor).
+    # Padam fail detection_* lama melebihi had bilangan dan umur
+    """
+    results = {}
+    for name in os.listdir(media_dir):
+        stem, ext = os.path.splitext(name)
+        if name.startswith("detection_") and ext in (".json", ".jpg"):
+            results.setdefault(stem, []).append(os.path.join(media_dir, name))
+    # Timestamped names sort oldest first
+    stems = sorted(results)
+    victims = set(stems[:-max_results] if max_results and len(stems) > max_results else [])
+    if max_age_days:
+        cutoff = datetime.now().timestamp() - max_age_days * 86400
+        victims.update(stem for stem in stems if max(map(os.path.getmtime, results[stem])) < cutoff)
+    for stem in victims:
+        for path in results[stem]:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return len(victims)
+
+def _config_entry(hass: HomeAssistant, entry_id: str = None):
+    """The config entry with entry_id, or the only entry; None if there is no such entry."""
+    if entry_id is not None:
+        return hass.config_entries.async_get_entry(entry_id)
+    config_entries = hass.config_entries.async_entries(DOMAIN)
+    return config_entries[0] if len(config_entries) == 1 else None
+
+def _entity_options(hass: HomeAssistant, entry_id: str = None) -> dict:
+    """Change thresholds of the owning config entry (options flow first), with defaults for older entries."""
+    entry = _config_entry(hass, entry_id)
+    
+    def option(key, default):
+        return entry_option(entry, key, default) if entry else default
+    
+    return {
+        "confidence_change": option(CONF_CONFIDENCE_CHANGE, DEFAULT_CONFIDENCE_CHANGE),
+        "min_update_interval": option(CONF_MIN_UPDATE_INTERVAL, DEFAULT_MIN_UPDATE_INTERVAL),
+        "class_sensors": option(CONF_CLASS_SENSORS, DEFAULT_CLASS_SENSORS),
+    }
+
+def async_apply_entity_options(hass: HomeAssistant, entry_id: str):
+    """Give the status entities of an entry its current thresholds (after an options change).
+    # Guna had terkini entry pada entiti status sedia ada
+    """
+    options = _entity_options(hass, entry_id)
+    for entity in hass.data[DOMAIN].get("entities", {}).values():
+        if isinstance(entity, ObjectStatusEntity) and getattr(entity, "entry_id", None) == entry_id:
+            entity.set_thresholds(options["confidence_change"], options["min_update_interval"])
+
+async def async_update_entities(hass: HomeAssistant, detections: list, img_url: str = None, camera_id: str = None,
+                                entry_id: str = None):
+    """Create or update detection entities, one set per watched camera.
+    The object status entity decides whether a result is written: only significant changes
+    are, at most once per min_update_interval, and the other entities follow it.
+    Thresholds come from the config entry that owns the call (entry_id, or the only entry).
+    # Cipta atau update entiti pengesanan (satu set untuk setiap kamera)
+    """
+    entities = hass.data[DOMAIN]["entities"]
+    suffix = f"_{camera_id}" if camera_id else ""
+    prefix = f"YOLO {camera_id}" if camera_id else "YOLO"
+    
+    # Object Status Entity
+    status_key = f"object_status{suffix}"
+    if status_key in entities:
+        entities[status_key].update_detection(detections, img_url)
+        return
+    entry = _config_entry(hass, entry_id)
+    entry_id = entry.entry_id if entry else None
+    options = _entity_options(hass, entry_id)
+    
+    def apply_summary(summary: dict, image_url: str = None):
+        # Read on every write so a changed class_sensors option applies straight away
+        class_sensors = _entity_options(hass, entry_id)["class_sensors"]
+        _update_summary_entities(hass, summary, image_url, suffix, prefix, class_sensors)
+    
+    entities[status_key] = ObjectStatusEntity(f"{prefix} Object Status", detections, options["confidence_change"],
+                                              options["min_update_interval"], on_write=apply_summary)
+    entities[status_key].entry_id = entry_id  # Whose options apply (see async_apply_entity_options)
+    await hass.data[DOMAIN]["component"].async_add_entities([entities[status_key]], update_before_add=True)
+    apply_summary(summarize_detections(detections), img_url)
+
+def _update_summary_entities(hass: HomeAssistant, summary: dict, img_url: str, suffix: str, prefix: str,
+                             class_sensors: bool):
+    """Bring the count, image and per-class entities in line with a written summary.
+    # Kemas kini entiti bilangan, gambar dan setiap kelas ikut ringkasan yang ditulis
+    """
+    entities = hass.data[DOMAIN]["entities"]
+    new_entities = []
+    
+    # Detection Count Entity
+    count_key = f"detection_count{suffix}"
+    if count_key not in entities:
+        entities[count_key] = DetectionImageEntity(f"{prefix} Detection Count", str(summary["total"]))
+        new_entities.append(entities[count_key])
+    else:
+        entities[count_key].update_image(str(summary["total"]))
+    
+    # Detection Image Entity (store public URL for Lovelace usage)
+    if img_url:
+        image_key = f"detection_image{suffix}"
+        if image_key not in entities:
+            entities[image_key] = DetectionImageEntity(f"{prefix} Detection Image", img_url)
+            new_entities.append(entities[image_key])
+        else:
+            entities[image_key].update_image(img_url)
+    
+    # One count sensor per class seen on this camera; classes that left go back to 0
+    # Satu sensor untuk setiap kelas; kelas yang hilang jadi 0
+    if class_sensors:
+        class_prefix = f"class_count{suffix}:"  # ':' never appears in a camera_id
+        for key, entity in entities.items():
+            if key.startswith(class_prefix) and entity.class_name not in summary["counts"]:
+                entity.update_count(0)
+        for cls, count in summary["counts"].items():
+            class_key = f"{class_prefix}{cls}"
+            if class_key not in entities:
+                entities[class_key] = ClassCountEntity(f"{prefix} {cls} Count", cls, count)
+                new_entities.append(entities[class_key])
+            else:
+                entities[class_key].update_count(count)
+    
+    if new_entities:
+        hass.async_create_task(hass.data[DOMAIN]["component"].async_add_entities(new_entities, update_before_add=True))
+
+async def async_handle_stream_event(hass: HomeAssistant, event: dict, entry_id: str = None):
+    """Apply a detection event pushed by the API of entry_id for a watched camera.
+    # Guna event pengesanan yang ditolak oleh API untuk kamera yang dipantau
+    """
+    camera_id = event.get("camera_id")
+    if event.get("type") == "error":
+        _LOGGER.debug(f"Watch error for {camera_id}: {event.get('error')}")
+        return
+    if not camera_id:
+        return
+    # The API sends a path on its own server; the image entity needs the full URL
+    # API hantar path pada pelayannya sendiri; entiti gambar perlukan URL penuh
+    image_url = event.get("image_url")
+    client = _get_client(hass, entry_id)
+    if image_url and image_url.startswith("/") and client:
+        image_url = client.api_url + image_url
+    if event.get("type") == "detections":
+        await async_update_entities(hass, event.get("detections", []), image_url, camera_id, entry_id)
+        track_events = event.get("track_events", [])
+    elif event.get("type") == "tracks":
+        # Track-only mode: entities change only when something enters or leaves
+        # Mod jejak sahaja: entiti berubah hanya bila objek masuk atau keluar
+        await async_update_entities(hass, event.get("active", []), image_url, camera_id, entry_id)
+        track_events = event.get("events", [])
+    else:
+        return
+    for track_event in track_events:
+        hass.bus.async_fire(TRACK_EVENT, {"camera_id": camera_id, **track_event})
+
+def _get_client(hass: HomeAssistant, entry_id: str = None) -> YoloApiClient:
+    """Return the shared API client of the config entry that owns the call, or None.
+    Without entry_id there must be exactly one entry.
+    # Pulangkan klien API untuk entry yang memiliki panggilan ini
+    """
+    if entry_id is None:
+        config_entries = hass.config_entries.async_entries(DOMAIN)
+        if not config_entries:
+            _LOGGER.error("No YOLO integration config found")
+            return None
+        if len(config_entries) > 1:
+            _LOGGER.error("Several YOLO integration entries are set up; pass entry_id to choose one")
+            return None
+        entry_id = config_entries[0].entry_id
+    client = hass.data[DOMAIN].get(entry_id, {}).get("client")
+    if client is None:
+        _LOGGER.error(f"No YOLO API URL configured for entry {entry_id}")
+    return client
+
 async def async_setup_services(hass: HomeAssistant, integration_dir: str):
     """Register Home Assistant service to trigger inference pipeline.
     # Daftar servis Home Assistant untuk jalankan pipeline inference
@@ -25,10 +210,10 @@ async def async_setup_services(hass: HomeAssistant, integration_dir: str):
     if not os.path.exists(media_abs_dir):
         os.makedirs(media_abs_dir)
 
-    component = hass.data["yolo_rtsp_integration"].setdefault("component", EntityComponent(_LOGGER, "yolo_rtsp_integration", hass))
+    hass.data["yolo_rtsp_integration"].setdefault("component", EntityComponent(_LOGGER, "yolo_rtsp_integration", hass))
     
     # Store entities to reuse them instead of creating new ones
-    entities = hass.data["yolo_rtsp_integration"].setdefault("entities", {})
+    hass.data["yolo_rtsp_integration"].setdefault("entities", {})
 
     async def handle_process(call: ServiceCall):
         """Service handler: send image to external YOLO API, get results, update entities.
@@ -42,136 +227,106 @@ async def async_setup_services(hass: HomeAssistant, integration_dir: str):
         image_path = call.data.get("image_path")  # Fixed parameter name
         camera_url = call.data.get("camera_url")
         
-        # Get API URL from integration config
-        config_entries = hass.config_entries.async_entries("yolo_rtsp_integration")
-        if not config_entries:
-            _LOGGER.error("No YOLO integration config found")
-            return
-        
-        api_url = config_entries[0].data.get("external_api_url")
-        if not api_url:
-            _LOGGER.error("No YOLO API URL configured")
+        # Get the shared API client of the chosen (or only) config entry
+        client = _get_client(hass, call.data.get("entry_id"))
+        if not client:
             return
             
-        _LOGGER.info(f"Using API URL: {api_url}, Model: {model_name}, Mode: {fetch_mode}")
+        if fetch_mode == "manual" and image_path:
+            source = image_path
+        elif fetch_mode in ["single", "sequence"] and camera_url:
+            source = camera_url
+        else:
+            _LOGGER.error(f"Invalid mode or missing parameters. Mode: {fetch_mode}, Image: {image_path}, Camera: {camera_url}")
+            return
+        _LOGGER.info(f"Using API URL: {client.api_url}, Model: {model_name}, Mode: {fetch_mode}")
         
+        # Calls for the same camera/image and model while one is running share its result
+        # Panggilan untuk kamera/gambar dan model yang sama berkongsi satu permintaan
+        key = (fetch_mode, source, model_name, call.data.get("sequence_length"), call.data.get("frame_interval"))
         try:
-            import aiohttp
-            
-            async with aiohttp.ClientSession() as session:
-                # Prepare the request based on mode
-                if fetch_mode == "manual" and image_path:
-                    # Manual image upload mode
-                    if not os.path.exists(image_path):
-                        _LOGGER.error(f"Image file not found: {image_path}")
-                        return
-                        
-                    # Read and send image file to API (async)
-                    def read_image_file():
-                        with open(image_path, 'rb') as f:
-                            return f.read()
-                    
-                    image_data = await hass.async_add_executor_job(read_image_file)
-                    
-                    data = aiohttp.FormData()
-                    data.add_field('image', image_data, filename='image.jpg', content_type='image/jpeg')
-                    data.add_field('model', model_name)
-                    
-                    async with session.post(f"{api_url}/api/inference", data=data, timeout=60) as resp:
-                        if resp.status != 200:
-                            _LOGGER.error(f"API request failed: {resp.status}")
-                            return
-                        result = await resp.json()
-                        
-                elif fetch_mode in ["single", "sequence"] and camera_url:
-                    # RTSP camera mode
-                    payload = {
-                        "rtsp_url": camera_url,
-                        "model": model_name
-                    }
-                    
-                    async with session.post(f"{api_url}/api/inference", json=payload, timeout=60) as resp:
-                        if resp.status != 200:
-                            _LOGGER.error(f"API request failed: {resp.status}")
-                            return
-                        result = await resp.json()
-                else:
-                    _LOGGER.error(f"Invalid mode or missing parameters. Mode: {fetch_mode}, Image: {image_path}, Camera: {camera_url}")
-                    return
-                    
-                # Process API response
-                if "error" in result:
-                    _LOGGER.error(f"API error: {result['error']}")
-                    return
-                    
-                detections = result.get("detections", [])
-                detection_count = len(detections)
-                
-                _LOGGER.info(f"Received {detection_count} detections from API")
-                
-                # Save results and create entities
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                
-                # Save detection JSON (async)
-                json_filename = f"detection_{timestamp}.json"
-                json_path = os.path.join(media_abs_dir, json_filename)
-                
-                def write_json_file():
-                    with open(json_path, "w") as jf:
-                        json.dump(result, jf, indent=2)
-                
-                await hass.async_add_executor_job(write_json_file)
-                
-                # Save annotated image from base64 if provided (async)
-                img_path = None
-                img_url = None  # Public URL served by HA at /local/...
-                if "image_base64" in result:
-                    img_filename = f"detection_{timestamp}.jpg"
-                    img_path = os.path.join(media_abs_dir, img_filename)
-                    img_url = f"/local/yolo_rtsp_integration/{img_filename}"
-                    
-                    def write_base64_image():
-                        # Decode base64 image data
-                        img_data = base64.b64decode(result["image_base64"])
-                        with open(img_path, "wb") as img_file:
-                            img_file.write(img_data)
-                    
-                    await hass.async_add_executor_job(write_base64_image)
-                    _LOGGER.info(f"Saved annotated image from base64: {img_path} (public: {img_url})")
-                
-                # Create/update entities (reuse existing ones)
-                # Detection Count Entity
-                if "detection_count" not in entities:
-                    entities["detection_count"] = DetectionImageEntity("YOLO Detection Count", str(detection_count))
-                    await component.async_add_entities([entities["detection_count"]], update_before_add=True)
-                else:
-                    entities["detection_count"].update_image(str(detection_count))
-                
-                # Detection Image Entity (store public URL for Lovelace usage)
-                if img_url:
-                    if "detection_image" not in entities:
-                        entities["detection_image"] = DetectionImageEntity("YOLO Detection Image", img_url)
-                        await component.async_add_entities([entities["detection_image"]], update_before_add=True)
-                    else:
-                        entities["detection_image"].update_image(img_url)
-                
-                # Object Status Entity
-                if "object_status" not in entities:
-                    entities["object_status"] = ObjectStatusEntity("YOLO Object Status", detections)
-                    await component.async_add_entities([entities["object_status"]], update_before_add=True)
-                else:
-                    entities["object_status"].update_detection(detections)
-                
-                _LOGGER.info(f"Detection complete: {detection_count} objects found")
-                _LOGGER.info(f"Results saved: {json_path}")
-                if img_path:
-                    _LOGGER.info(f"Image saved: {img_path} (public: {img_url})")
-                    
+            await client.single_flight(key, lambda: process(client, call, model_name, fetch_mode, source))
+        except YoloApiError as e:
+            _LOGGER.error(str(e))
         except Exception as e:
             _LOGGER.error(f"Error during inference: {str(e)}")
             import traceback
             _LOGGER.error(traceback.format_exc())
 
+    async def process(client: YoloApiClient, call: ServiceCall, model_name: str, fetch_mode: str, source: str):
+        """Run one inference, save the results and update entities.
+        # Jalankan satu inference, simpan hasil dan update entiti
+        """
+        if fetch_mode == "manual":
+            # Manual image upload mode
+            if not os.path.exists(source):
+                _LOGGER.error(f"Image file not found: {source}")
+                return
+                
+            # Read and send image file to API (async)
+            def read_image_file():
+                with open(source, 'rb') as f:
+                    return f.read()
+            
+            image_data = await hass.async_add_executor_job(read_image_file)
+            result = await load_manual_image(client, image_data, model_name)
+        elif fetch_mode == "sequence":
+            # Server reads the frames from one stream and aggregates them
+            result = await fetch_frame_sequence(client, source, model_name,
+                                                call.data.get("sequence_length", 5), call.data.get("frame_interval", 1))
+        else:
+            # RTSP camera mode
+            result = await fetch_single_frame(client, source, model_name)
+            
+        detections = result.get("detections", [])
+        detection_count = len(detections)
+        
+        _LOGGER.info(f"Received {detection_count} detections from API")
+        
+        # Save results and create entities
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        
+        # Save detection JSON (async)
+        json_filename = f"detection_{timestamp}.json"
+        json_path = os.path.join(media_abs_dir, json_filename)
+        
+        def write_json_file():
+            with open(json_path, "w") as jf:
+                json.dump(result, jf, indent=2)
+        
+        await hass.async_add_executor_job(write_json_file)
+        
+        # Save annotated image from base64 if provided (async)
+        img_path = None
+        img_url = None  # Public URL served by HA at /local/...
+        if "image_base64" in result:
+            img_filename = f"detection_{timestamp}.jpg"
+            img_path = os.path.join(media_abs_dir, img_filename)
+            img_url = f"/local/yolo_rtsp_integration/{img_filename}"
+            
+            def write_base64_image():
+                # Decode base64 image data
+                img_data = base64.b64decode(result["image_base64"])
+                with open(img_path, "wb") as img_file:
+                    img_file.write(img_data)
+            
+            await hass.async_add_executor_job(write_base64_image)
+            _LOGGER.info(f"Saved annotated image from base64: {img_path} (public: {img_url})")
+        
+        # Keep the media folder bounded
+        pruned = await hass.async_add_executor_job(prune_media, media_abs_dir)
+        if pruned:
+            _LOGGER.debug(f"Pruned {pruned} old detection results")
+        
+        # Create/update entities (reuse existing ones)
+        await async_update_entities(hass, detections, img_url, entry_id=call.data.get("entry_id"))
+        
+        _LOGGER.info(f"Detection complete: {detection_count} objects found")
+        _LOGGER.info(f"Results saved: {json_path}")
+        if img_path:
+            _LOGGER.info(f"Image saved: {img_path} (public: {img_url})")
+        return result
+
     # Service schema for UI testing
     service_schema = vol.Schema({
         vol.Optional("model_name", default="yolov8n.pt"): str,
@@ -180,6 +335,8 @@ async def async_setup_services(hass: HomeAssistant, integration_dir: str):
         vol.Optional("fetch_mode", default="manual"): vol.In(["single", "sequence", "manual"]),
         vol.Optional("sequence_length", default=5): int,
         vol.Optional("frame_interval", default=1): int,
+        # Config entry to use when the integration is added more than once
+        vol.Optional("entry_id"): str,
     })
     
     # Register the service
@@ -190,4 +347,64 @@ async def async_setup_services(hass: HomeAssistant, integration_dir: str):
         schema=service_schema
     )
     _LOGGER.info("Service yolo_rtsp_integration.run_inference registered successfully")
+
+    async def handle_watch(call: ServiceCall):
+        """Register a camera for continuous detection; results arrive via the event stream.
+        # Daftar kamera untuk pengesanan berterusan
+        """
+        client = _get_client(hass, call.data.get("entry_id"))
+        if not client:
+            return
+        payload = {
+            "camera_id": call.data["camera_id"],
+            "rtsp_url": call.data["camera_url"],
+            "model": call.data["model_name"],
+            "fps": call.data["fps"],
+            "emit": call.data["emit"],
+        }
+        try:
+            resp = await client.request("POST", "/api/streams", json=payload)
+            if resp.status != 200:
+                _LOGGER.error(f"Failed to watch camera {payload['camera_id']}: {resp.status} {await resp.text()}")
+                return
+            _LOGGER.info(f"Watching camera {payload['camera_id']} at {payload['fps']} FPS")
+        except Exception as e:
+            _LOGGER.error(f"Error registering watched camera: {str(e)}")
+
+    async def handle_unwatch(call: ServiceCall):
+        """Stop continuous detection on a camera.
+        # Berhenti pantau kamera
+        """
+        client = _get_client(hass, call.data.get("entry_id"))
+        if not client:
+            return
+        camera_id = call.data["camera_id"]
+        try:
+            resp = await client.request("DELETE", f"/api/streams/{camera_id}")
+            if resp.status not in (200, 404):
+                _LOGGER.error(f"Failed to unwatch camera {camera_id}: {resp.status}")
+                return
+            _LOGGER.info(f"Stopped watching camera {camera_id}")
+        except Exception as e:
+            _LOGGER.error(f"Error removing watched camera: {str(e)}")
+
+    hass.services.async_register(
+        "yolo_rtsp_integration",
+        "watch_camera",
+        handle_watch,
+        schema=vol.Schema({
+            vol.Required("camera_id"): vol.Match(r"^[A-Za-z0-9_]+$"),
+            vol.Required("camera_url"): str,
+            vol.Optional("model_name", default="yolov8n.pt"): str,
+            vol.Optional("fps", default=1.0): vol.Coerce(float),
+            vol.Optional("emit", default="detections"): vol.In(["detections", "tracks"]),
+            vol.Optional("entry_id"): str,
+        })
+    )
+    hass.services.async_register(
+        "yolo_rtsp_integration",
+        "unwatch_camera",
+        handle_unwatch,
+        schema=vol.Schema({vol.Required("camera_id"): str, vol.Optional("entry_id"): str})
+    )
     return True
@@ -1,9 +1,8 @@
-from flask import Flask, request, jsonify, send_from_directory, send_file
+from flask import Flask, Response, g, request, jsonify, send_from_directory, send_file, stream_with_context
 from flask_cors import CORS
 import os
 import cv2
 import numpy as np
-from ultralytics import YOLO
 import json
 import uuid
 from datetime import datetime
@@ -11,14 +10,37 @@ import shutil
 from PIL import Image
 import io
 import base64
-import torch
 import gc
 import psutil
+import threading
+import queue
+import time
+from collections import namedtuple
+from urllib.parse import quote
 
-# N150 optimizations
-torch.set_num_threads(2)  # Limit threads for N150
-os.environ['OMP_NUM_THREADS'] = '2'
-os.environ['MKL_NUM_THREADS'] = '2'
+from capture import CaptureManager, DecodeOptions, guess_substream
+from streaming import EventBroker, StreamScheduler
+from inference_pool import InferencePool, InferenceTimeout, Overloaded
+from backends import BACKENDS, create_backend, default_backend
+import detections as dets_mod
+from rendering import RecentResults, draw_detections, encode_jpeg, multipart_body
+from model_cache import ModelCache
+from model_store import ModelStore, UploadError, valid_model_name
+from model_registry import ModelRegistry, describe, measure_latency
+from result_store import ResultStore
+from result_cache import ResultCache, cache_key
+from history import DetectionHistory, camera_label, parse_bucket
+from motion import MotionGate, parse_regions
+import zones as zones_mod
+import tiles as tiles_mod
+from tracker import TrackerRegistry
+import sequence as sequence_mod
+import metrics as metrics_mod
+
+# N150 optimizations (set before torch/onnxruntime are imported by a backend)
+INFERENCE_THREADS = int(os.environ.get('TORCH_NUM_THREADS', '2'))  # Limit threads for N150
+os.environ['OMP_NUM_THREADS'] = str(INFERENCE_THREADS)
+os.environ['MKL_NUM_THREADS'] = str(INFERENCE_THREADS)
 
 # Note: PyTorch 2.0.1 doesn't have add_safe_globals, but weights_only defaults to False
 
@@ -26,155 +48,660 @@ app = Flask(__name__, static_folder='/app/frontend/build/static', static_url_pat
 CORS(app)
 
 # Configuration
-MODELS_DIR = "/app/models"
-UPLOADS_DIR = "/app/uploads"
-RESULTS_DIR = "/app/results"
+MODELS_DIR = os.environ.get('MODELS_DIR', '/app/models')
+UPLOADS_DIR = os.environ.get('UPLOADS_DIR', '/app/uploads')
+RESULTS_DIR = os.environ.get('RESULTS_DIR', '/app/results')
 
 # Ensure directories exist
 os.makedirs(MODELS_DIR, exist_ok=True)
 os.makedirs(UPLOADS_DIR, exist_ok=True)
 os.makedirs(RESULTS_DIR, exist_ok=True)
+model_store = ModelStore(MODELS_DIR)
+
+# Saved results: indexed in SQLite and pruned by age, count and total size (0 disables a limit)
+RESULTS_MAX_AGE_DAYS = float(os.environ.get('RESULTS_MAX_AGE_DAYS', '7'))
+RESULTS_MAX_COUNT = int(os.environ.get('RESULTS_MAX_COUNT', '5000'))
+RESULTS_MAX_MB = int(os.environ.get('RESULTS_MAX_MB', '1024'))
+RESULTS_PRUNE_INTERVAL = int(os.environ.get('RESULTS_PRUNE_INTERVAL', '300'))  # seconds
+# Only keep the annotated image of frames that contain detections (JSON is always kept)
+RESULTS_IMAGES_WITH_DETECTIONS_ONLY = os.environ.get('RESULTS_IMAGES_WITH_DETECTIONS_ONLY', 'false').lower() in ('true', '1', 'yes')
+result_store = ResultStore(RESULTS_DIR, os.path.join(RESULTS_DIR, '.index.sqlite3'),
+                           max_age_days=RESULTS_MAX_AGE_DAYS, max_count=RESULTS_MAX_COUNT, max_mb=RESULTS_MAX_MB,
+                           prune_interval=RESULTS_PRUNE_INTERVAL,
+                           images_with_detections_only=RESULTS_IMAGES_WITH_DETECTIONS_ONLY)
+
+# Detection history (every analysed frame, queried with /api/history)
+HISTORY_ENABLED = os.environ.get('HISTORY_ENABLED', 'true').lower() in ('true', '1', 'yes')
+HISTORY_DB = os.environ.get('HISTORY_DB', os.path.join(RESULTS_DIR, '.history.sqlite3'))
+HISTORY_MAX_AGE_DAYS = float(os.environ.get('HISTORY_MAX_AGE_DAYS', '90'))
+HISTORY_BATCH_SIZE = int(os.environ.get('HISTORY_BATCH_SIZE', '500'))  # frames per insert transaction
+HISTORY_FLUSH_INTERVAL = float(os.environ.get('HISTORY_FLUSH_INTERVAL', '1'))  # seconds
+history = DetectionHistory(HISTORY_DB, batch_size=HISTORY_BATCH_SIZE, flush_interval=HISTORY_FLUSH_INTERVAL,
+                           max_age_days=HISTORY_MAX_AGE_DAYS) if HISTORY_ENABLED else None
+
+# RTSP capture sessions: keep streams open between requests, close when idle
+CAPTURE_IDLE_TTL = int(os.environ.get('CAPTURE_IDLE_TTL', '120'))  # seconds
+CAPTURE_MAX_FRAME_AGE = float(os.environ.get('CAPTURE_MAX_FRAME_AGE', '5'))  # seconds
+capture_manager = CaptureManager(idle_ttl=CAPTURE_IDLE_TTL, max_age=CAPTURE_MAX_FRAME_AGE)
+
+# Cheaper decoding (needs the ffmpeg binary; falls back to OpenCV without it)
+CAPTURE_DECODER = os.environ.get('CAPTURE_DECODER', 'auto')  # auto, ffmpeg or opencv
+CAPTURE_DECODE_SIZE = int(os.environ.get('CAPTURE_DECODE_SIZE', '640'))  # longest side after decode, 0 = full
+CAPTURE_KEYFRAMES_ONLY = os.environ.get('CAPTURE_KEYFRAMES_ONLY', 'false').lower() in ('true', '1', 'yes')
+CAPTURE_HWACCEL = os.environ.get('CAPTURE_HWACCEL', 'auto')  # none, vaapi or auto (VAAPI if /dev/dri exists)
+CAPTURE_PREFER_SUBSTREAM = os.environ.get('CAPTURE_PREFER_SUBSTREAM', 'false').lower() in ('true', '1', 'yes')
+
+# Loaded models are kept in an LRU bounded by measured memory (defaults sized for a 2GB N150)
+MODEL_CACHE_MB = int(os.environ.get('MODEL_CACHE_MB', '400'))
+MAX_LOADED_MODELS = int(os.environ.get('MAX_LOADED_MODELS', '3'))
+# Comma-separated model files ("name" or "name:backend") to load at startup / never evict
+PRELOAD_MODELS = [m.strip() for m in os.environ.get('PRELOAD_MODELS', '').split(',') if m.strip()]
+PINNED_MODELS = [m.strip() for m in os.environ.get('PINNED_MODELS', '').split(',') if m.strip()]
+
+# Dummy inferences run right after a model loads, so allocator/graph warm-up is not paid by a real request
+WARMUP_RUNS = int(os.environ.get('WARMUP_RUNS', '2'))
+WARMUP_RESOLUTION = os.environ.get('WARMUP_RESOLUTION', '640x360')  # WxH of typical camera frames
+
+# Profile every new model in the background (classes, input size, latency); off = only on POST .../profile
+MODEL_PROFILE = os.environ.get('MODEL_PROFILE', 'false').lower() in ('true', '1', 'yes')
+MODEL_PROFILE_RUNS = int(os.environ.get('MODEL_PROFILE_RUNS', '5'))
+
+# Startup state reported by /api/ready
+readiness = {"ready": False, "stage": "starting", "models": {}, "errors": []}
+
+# .onnx models run on ONNX Runtime by default; set to "openvino" to use OpenVINO instead
+ONNX_BACKEND = os.environ.get('ONNX_BACKEND', 'onnxruntime')
+
+# Inference settings shared by single and batched predict calls
+INFERENCE_SIZE = 640
+PREDICT_ARGS = dict(
+    imgsz=INFERENCE_SIZE,
+    conf=0.25,
+    iou=0.7,
+    max_det=100  # Limit detections for memory
+)
+
+# Response content for /api/inference
+#   inline     - detections + base64 JPEG + saved files (default, original behaviour)
+#   url        - detections + saved JPEG/JSON URLs, no base64
+#   detections - detections only; the image can still be rendered lazily by result_id
+#   multipart  - multipart/mixed with the JSON part and the raw JPEG bytes
+RESPONSE_MODES = ('inline', 'url', 'detections', 'multipart')
+JPEG_QUALITY = int(os.environ.get('JPEG_QUALITY', '85'))
+RECENT_RESULTS = int(os.environ.get('RECENT_RESULTS', '8'))  # frames kept for lazy rendering
+recent_results = RecentResults(RECENT_RESULTS)
+
+# Uploaded images seen recently (same bytes, model and options) are answered without decoding or inference.
+# RESULT_CACHE_SIZE=0 disables it; clients can opt out per request with cache=false.
+RESULT_CACHE_SIZE = int(os.environ.get('RESULT_CACHE_SIZE', '32'))
+RESULT_CACHE_MB = float(os.environ.get('RESULT_CACHE_MB', '64'))
+RESULT_CACHE_TTL = float(os.environ.get('RESULT_CACHE_TTL', '300'))  # seconds
+result_cache = ResultCache(RESULT_CACHE_SIZE, RESULT_CACHE_MB, RESULT_CACHE_TTL)
+
+# Inference worker pool: workers own model loading and prediction, HTTP threads only do I/O.
+# Each worker uses INFERENCE_THREADS cores, so workers x threads should not exceed the CPU count.
+INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', '1'))
+INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', '8'))  # beyond this: 503 + Retry-After
+INFERENCE_TIMEOUT = int(os.environ.get('INFERENCE_TIMEOUT', '60'))  # seconds a request waits for its result
+
+# Micro-batching: group concurrent /api/inference requests for the same model (0 disables)
+BATCH_WINDOW_MS = int(os.environ.get('BATCH_WINDOW_MS', '10'))
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', '4'))
+
+# HTTP server: "waitress" (production, threaded) or "dev" (Flask development server)
+SERVER = os.environ.get('SERVER', 'waitress')
+SERVER_THREADS = int(os.environ.get('SERVER_THREADS', '16'))  # uploads, downloads, SSE and status
+
+# Motion gate: reuse a camera's previous detections while its picture is static.
+# Enabled per request with motion_gate=true (or for every camera with MOTION_GATE=true).
+MOTION_GATE = os.environ.get('MOTION_GATE', 'false').lower() in ('true', '1', 'yes')
+MOTION_THRESHOLD = float(os.environ.get('MOTION_THRESHOLD', '0.005'))  # fraction of pixels that must change
+MOTION_PIXEL_THRESHOLD = int(os.environ.get('MOTION_PIXEL_THRESHOLD', '25'))  # grey levels counted as change
+MOTION_MAX_SKIP = float(os.environ.get('MOTION_MAX_SKIP', '60'))  # seconds before a forced refresh
+motion_gate = MotionGate(pixel_threshold=MOTION_PIXEL_THRESHOLD, min_changed=MOTION_THRESHOLD, max_skip=MOTION_MAX_SKIP)
+
+# Zones: named regions of interest; in crop mode only their bounding boxes are inferred
+ROI_PADDING = float(os.environ.get('ROI_PADDING', '0.05'))  # crop margin, fraction of the zone size
+
+# Sliced inference (tiled=true): overlapping native-resolution tiles, batched and merged across tiles
+TILE_SIZE = int(os.environ.get('TILE_SIZE', str(INFERENCE_SIZE)))
+TILE_OVERLAP = float(os.environ.get('TILE_OVERLAP', '0.2'))
+MAX_TILES = int(os.environ.get('MAX_TILES', '16'))  # tile size grows to stay within this
+TILE_MERGE = os.environ.get('TILE_MERGE', 'fuse')  # "fuse" (join boxes cut by tile edges) or "nms"
+TILE_FULL_FRAME = os.environ.get('TILE_FULL_FRAME', 'true').lower() in ('true', '1', 'yes')  # add a downscaled full view for large objects
+
+# Tracking: stable track ids, dwell time and enter/exit events per camera
+TRACK_IOU = float(os.environ.get('TRACK_IOU', '0.3'))
+TRACK_MIN_HITS = int(os.environ.get('TRACK_MIN_HITS', '2'))  # matches before a track is confirmed ("enter")
+TRACK_MAX_AGE = float(os.environ.get('TRACK_MAX_AGE', '5'))  # seconds unseen before "exit"
+trackers = TrackerRegistry(iou_threshold=TRACK_IOU, min_hits=TRACK_MIN_HITS, max_age=TRACK_MAX_AGE)
+
+# Sequence mode (mode=sequence): count frames, interval seconds apart, inferred as one batch and aggregated
+MAX_SEQUENCE_FRAMES = int(os.environ.get('MAX_SEQUENCE_FRAMES', '10'))
+MAX_SEQUENCE_INTERVAL = 10.0  # seconds
+SEQUENCE_MIN_VOTE = float(os.environ.get('SEQUENCE_MIN_VOTE', '0.4'))  # summed confidence / frames to keep an object
+
+# Continuous detection ("watch" mode)
+STREAM_WORKERS = int(os.environ.get('STREAM_WORKERS', '1'))
+STREAM_MAX_FPS = float(os.environ.get('STREAM_MAX_FPS', '5'))
+EVENTS_KEEPALIVE = 15  # seconds between SSE keep-alive comments
+
+# Prometheus metrics (/metrics): stage and request timers on the hot path, the rest read at scrape time
+metrics = metrics_mod.Registry()
+STAGE_SECONDS = metrics.histogram('yolo_stage_seconds', "Time spent in each pipeline stage", ['stage'])
+REQUEST_SECONDS = metrics.histogram('yolo_http_request_seconds', "HTTP request latency", ['endpoint', 'method'])
+REQUESTS_TOTAL = metrics.counter('yolo_http_requests_total', "HTTP requests by status", ['endpoint', 'method', 'status'])
 
-# Store loaded models in memory (limit to 1 for N150)
-loaded_models = {}
-MAX_LOADED_MODELS = 1
+process = psutil.Process(os.getpid())
 
 def get_memory_usage():
     """Get current memory usage"""
-    process = psutil.Process(os.getpid())
     return process.memory_info().rss / 1024 / 1024  # MB
 
-def clear_model_cache():
-    """Clear model cache to free memory"""
-    global loaded_models
-    loaded_models.clear()
-    gc.collect()
-    torch.cuda.empty_cache() if torch.cuda.is_available() else None
+def create_model(cache_key):
+    """ModelCache loader: instantiate the backend for (model_path, backend)"""
+    model_path, backend = cache_key
+    model = create_backend(model_path, backend, threads=INFERENCE_THREADS, onnx_backend=ONNX_BACKEND)
+    model.class_lookup = dets_mod.class_lookup(model.names)
+    # Ultralytics predictors are not thread-safe; one predict per model at a time
+    model.lock = threading.Lock()
+    return model
 
-def get_model_info(model_path):
-    """Get model information"""
-    try:
-        stat = os.stat(model_path)
-        return {
-            "name": os.path.basename(model_path),
-            "size": stat.st_size,
-            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
-            "path": model_path
-        }
-    except Exception as e:
-        return None
+def warm_up_model(model):
+    """Run WARMUP_RUNS dummy inferences at the serving resolution"""
+    if WARMUP_RUNS <= 0:
+        return
+    w, h = (int(v) for v in WARMUP_RESOLUTION.lower().split('x'))
+    dummy = np.full((h, w, 3), 114, dtype=np.uint8)
+    started = datetime.now()
+    with model.lock:
+        for _ in range(WARMUP_RUNS):
+            model.predict([dummy], **PREDICT_ARGS)
+    print(f"Warm-up done in {(datetime.now() - started).total_seconds():.2f}s")
 
-def load_model(model_path):
-    """Load YOLO model with caching and memory management"""
-    global loaded_models
-    
-    # Clear cache if we have too many models loaded
-    if len(loaded_models) >= MAX_LOADED_MODELS:
-        clear_model_cache()
+model_cache = ModelCache(create_model, get_memory_usage, budget_mb=MODEL_CACHE_MB, max_models=MAX_LOADED_MODELS,
+                         warmup=warm_up_model)
+for pinned in PINNED_MODELS:
+    model_cache.pin(os.path.join(MODELS_DIR, pinned.split(':')[0]))
+
+def profile_model(model_path):
+    """Registry profiler: describe the cached model and time it through the inference pool"""
+    key = (model_path, default_backend(model_path, ONNX_BACKEND))
+    w, h = (int(v) for v in WARMUP_RESOLUTION.lower().split('x'))
+    dummy = np.full((h, w, 3), 114, dtype=np.uint8)
     
-    if model_path in loaded_models:
-        return loaded_models[model_path]
+    def run():
+        # Queued like any request, so profiling never runs beside the inference workers
+        output = inference_pool.submit(key, dummy, timeout=INFERENCE_TIMEOUT)
+        if output.error:
+            raise RuntimeError(output.error)
     
+    latency = measure_latency(run, MODEL_PROFILE_RUNS)
+    # The serving copy the pool just loaded, so profiling stays within MODEL_CACHE_MB
+    model = model_cache.get(key)
+    info = describe(model, model_path)
+    info["latency_ms"] = latency
+    info["profile_backend"] = model.name
+    info["profile_resolution"] = WARMUP_RESOLUTION
+    return info
+
+def load_model(model_path, backend=None):
+    """Load model into its inference backend through the LRU model cache"""
+    backend = backend or default_backend(model_path, ONNX_BACKEND)
     try:
-        print(f"Loading model: {model_path}")
-        print(f"Memory before loading: {get_memory_usage():.1f} MB")
-        
-        # Load model with CPU device explicitly (PyTorch 2.0.1 defaults to weights_only=False)
-        model = YOLO(model_path)
-        model.to('cpu')  # Ensure CPU inference
-        
-        loaded_models[model_path] = model
-        
-        print(f"Memory after loading: {get_memory_usage():.1f} MB")
-        
-        return model
+        return model_cache.get((model_path, backend))
     except Exception as e:
         print(f"Error loading model {model_path}: {e}")
         return None
 
-def fetch_rtsp_frame(rtsp_url, timeout=10):
-    """Fetch single frame from RTSP stream"""
+def preload_models():
+    """Startup phase: load and warm PRELOAD_MODELS, then report ready"""
+    readiness["stage"] = "preloading"
+    for spec in PRELOAD_MODELS:
+        name, _, backend = spec.partition(':')
+        model_path = os.path.join(MODELS_DIR, name)
+        readiness["models"][spec] = "loading"
+        if not os.path.exists(model_path):
+            print(f"Preload skipped, model not found: {name}")
+            readiness["models"][spec] = "missing"
+            readiness["errors"].append(f"Model not found: {name}")
+            continue
+        if load_model(model_path, backend or None) is None:
+            readiness["models"][spec] = "failed"
+            readiness["errors"].append(f"Failed to load model: {name}")
+        else:
+            readiness["models"][spec] = "ready"
+    readiness["stage"] = "serving"
+    readiness["ready"] = True
+
+def capture_options(rtsp_url, params, full_resolution=False):
+    """DecodeOptions for a request or watched camera; full_resolution for tiles and zone crops"""
+    keyframes_only = parse_flag(params.get('keyframes_only'), CAPTURE_KEYFRAMES_ONLY)
+    if full_resolution:
+        return DecodeOptions(CAPTURE_DECODER, 0, keyframes_only, CAPTURE_HWACCEL)
+    substream_url = params.get('substream_url')
+    if not substream_url and parse_flag(params.get('prefer_substream'), CAPTURE_PREFER_SUBSTREAM):
+        substream_url = guess_substream(rtsp_url)
+    return DecodeOptions(CAPTURE_DECODER, CAPTURE_DECODE_SIZE, keyframes_only, CAPTURE_HWACCEL, substream_url)
+
+def fetch_rtsp_frame(rtsp_url, timeout=10, options=None):
+    """Fetch latest frame from a persistent RTSP capture session"""
     try:
-        cap = cv2.VideoCapture(rtsp_url)
-        cap.set(cv2.CAP_PROP_TIMEOUT, timeout * 1000)
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for N150
-        
-        if not cap.isOpened():
-            return None, "Cannot open RTSP stream"
-        
-        ret, frame = cap.read()
-        cap.release()
-        
-        if not ret:
-            return None, "Failed to read frame from RTSP stream"
-        
-        return frame, None
+        with STAGE_SECONDS.time('capture'):
+            return capture_manager.get_frame(rtsp_url, timeout=timeout,
+                                             options=options or capture_options(rtsp_url, {}))
     except Exception as e:
         return None, str(e)
 
-def run_inference(model, image):
-    """Run YOLO inference on image with N150 optimizations"""
+def resize_for_inference(image):
+    """Resize image if too large (N150 optimization)"""
+    h, w = image.shape[:2]
+    if max(h, w) > INFERENCE_SIZE:
+        scale = INFERENCE_SIZE / max(h, w)
+        new_w, new_h = int(w * scale), int(h * scale)
+        image = cv2.resize(image, (new_w, new_h))
+    return image
+
+def run_inference_arrays(model, images):
+    """Raw array path: returns [(resized_image, structured detection array)] per input image.
+    
+    Filtering, tracking and zone logic should build on this rather than on the dict lists.
+    """
+    with STAGE_SECONDS.time('resize'):
+        resized = [resize_for_inference(image) for image in images]
+    
+    with model.lock, STAGE_SECONDS.time('predict'):
+        batch_dets = model.predict(resized, **PREDICT_ARGS)
+    
+    with STAGE_SECONDS.time('postprocess'):
+        return [(image, dets_mod.from_array(dets, image.shape)) for image, dets in zip(resized, batch_dets)]
+
+# Result of one image from the inference pool; image is the resized frame the boxes refer to.
+# timings (ms per stage) is only filled in by sliced inference.
+InferenceOutput = namedtuple('InferenceOutput', ['image', 'detections', 'lookup', 'error', 'timings'], defaults=(None,))
+
+def run_model_batch(key, images):
+    """Pool worker: load the model once and infer the grouped images"""
+    model_path, backend = key
+    model = load_model(model_path, backend)
+    if model is None:
+        return [InferenceOutput(None, None, None, "Failed to load model") for _ in images]
     try:
-        print(f"Starting inference, memory: {get_memory_usage():.1f} MB")
-        
-        # Resize image if too large (N150 optimization)
-        h, w = image.shape[:2]
-        if max(h, w) > 640:
-            scale = 640 / max(h, w)
-            new_w, new_h = int(w * scale), int(h * scale)
-            image = cv2.resize(image, (new_w, new_h))
-            print(f"Resized image from {w}x{h} to {new_w}x{new_h}")
-        
-        # Use model.predict() with N150-specific settings
-        results = model.predict(
-            source=image,
-            conf=0.25,
-            verbose=False,
-            device='cpu',
-            half=False,  # Disable half precision for CPU
-            augment=False,  # Disable augmentation for speed
-            agnostic_nms=False,  # Standard NMS
-            max_det=100  # Limit detections for memory
-        )
-        
-        # Draw results on image
-        annotated_image = results[0].plot()
-        
-        # Extract detection data
-        detections = []
-        if results[0].boxes is not None:
-            boxes = results[0].boxes
-            for i in range(len(boxes)):
-                box = boxes.xyxy[i].cpu().numpy()
-                conf = float(boxes.conf[i].cpu().numpy())
-                cls = int(boxes.cls[i].cpu().numpy())
-                
-                # Get class name
-                class_name = model.names[cls] if cls in model.names else str(cls)
-                
-                # Calculate area
-                x1, y1, x2, y2 = box
-                area = (x2 - x1) * (y2 - y1)
-                img_area = image.shape[0] * image.shape[1]
-                relative_area = area / img_area
-                
-                detections.append({
-                    "class": class_name,
-                    "confidence": round(conf, 3),
-                    "bbox": [int(x1), int(y1), int(x2), int(y2)],
-                    "area": round(relative_area, 4)
-                })
-        
-        print(f"Inference complete, memory: {get_memory_usage():.1f} MB")
-        
+        outputs = [InferenceOutput(image, arr, model.class_lookup, None) for image, arr in run_inference_arrays(model, images)]
         # Force garbage collection after inference
         gc.collect()
-        
-        return annotated_image, detections, None
+        return outputs
     except Exception as e:
         print(f"Inference error: {e}")
-        print(f"Memory during error: {get_memory_usage():.1f} MB")
-        return None, [], str(e)
+        return [InferenceOutput(None, None, None, str(e)) for _ in images]
+
+inference_pool = InferencePool(run_model_batch, workers=INFERENCE_WORKERS, max_queue=INFERENCE_QUEUE_SIZE,
+                               window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH_SIZE)
+model_registry = ModelRegistry(model_store, profile_model, auto_profile=MODEL_PROFILE)
+
+def infer_images(model_path, backend, images):
+    """Run images through the inference pool; returns one InferenceOutput per image.
+    
+    Raises Overloaded when the queue is full, InferenceTimeout after INFERENCE_TIMEOUT.
+    """
+    # Queue wait + batched predict, as seen by the request
+    with STAGE_SECONDS.time('inference'):
+        return inference_pool.submit_many((model_path, backend), images, timeout=INFERENCE_TIMEOUT)
+
+def infer_image(model_path, backend, image):
+    """Single-image inference on the raw array path, grouped with concurrent requests when batching is on"""
+    return infer_images(model_path, backend, [image])[0]
+
+def infer_tiled(model_path, backend, image, rects=None, tiling=None):
+    """Sliced inference over the whole frame or the given pixel rects; returns an InferenceOutput with timings"""
+    tiling = tiling or {}
+    started = time.perf_counter()
+    h, w = image.shape[:2]
+    whole = not rects
+    rects = rects or [(0, 0, w, h)]
+    grid, tile_size = tiles_mod.plan(rects, tiling.get('size', TILE_SIZE), tiling.get('overlap', TILE_OVERLAP), MAX_TILES)
+    crops = [(image[y1:y2, x1:x2], (x1, y1)) for x1, y1, x2, y2 in grid]
+    if whole and TILE_FULL_FRAME and len(grid) > 1:
+        crops.append((image, (0, 0)))
+    sliced = time.perf_counter()
+    
+    # Tiles go in as queue room frees up, so other queued work does not make a tiled request fail
+    with STAGE_SECONDS.time('inference'):
+        outputs = inference_pool.submit_chunked((model_path, backend), [crop for crop, _ in crops],
+                                                timeout=INFERENCE_TIMEOUT)
+    for output in outputs:
+        if output.error:
+            return output
+    inferred = time.perf_counter()
+    
+    display = resize_for_inference(image)
+    dets = tiles_mod.map_to_frame(
+        [(o.detections, o.image.shape, crop.shape, offset) for o, (crop, offset) in zip(outputs, crops)],
+        display.shape[1] / w)
+    dets = tiles_mod.merge(dets, PREDICT_ARGS['iou'], tiling.get('merge', TILE_MERGE))
+    arr = dets_mod.from_array(dets[:PREDICT_ARGS['max_det']], display.shape)
+    merged = time.perf_counter()
+    
+    timings = {
+        "tiles": len(crops),
+        "tile_size": tile_size,
+        "slice_ms": round((sliced - started) * 1000, 1),
+        "inference_ms": round((inferred - sliced) * 1000, 1),
+        "merge_ms": round((merged - inferred) * 1000, 1),
+        "total_ms": round((merged - started) * 1000, 1),
+    }
+    return InferenceOutput(display, arr, outputs[0].lookup, None, timings)
+
+def infer_zones(model_path, backend, image, zones, tiling=None):
+    """Crop mode: infer only the zones' bounding boxes, mapped onto the resized full frame"""
+    if tiling:
+        output = infer_tiled(model_path, backend, image, [zone.bounds(image.shape, ROI_PADDING) for zone in zones], tiling)
+        if output.error:
+            return output
+        inside = zones_mod.membership(output.detections, zones, output.image.shape).any(axis=1)
+        return output._replace(detections=output.detections[inside])
+    parts = zones_mod.crops(image, zones, ROI_PADDING)
+    outputs = infer_images(model_path, backend, [crop for crop, _ in parts])
+    for output in outputs:
+        if output.error:
+            return output
+    display = resize_for_inference(image)
+    arr = zones_mod.merge_crop_detections(
+        [(o.detections, o.image.shape, crop.shape, offset) for o, (crop, offset) in zip(outputs, parts)],
+        display.shape[1] / image.shape[1], display.shape, PREDICT_ARGS['iou'])
+    # Crops are rectangles; keep what actually stands inside a zone
+    arr = arr[zones_mod.membership(arr, zones, display.shape).any(axis=1)]
+    return InferenceOutput(display, arr, outputs[0].lookup, None)
+
+def run_detection(model_path, backend, image, zones=None, roi_crop=False, tiling=None):
+    """Full-frame inference, zone crops when roi_crop is set, tiles when tiling options are given"""
+    if zones and roi_crop:
+        return infer_zones(model_path, backend, image, zones, tiling)
+    if tiling:
+        return infer_tiled(model_path, backend, image, tiling=tiling)
+    return infer_image(model_path, backend, image)
+
+def infer_sequence(model_path, backend, frames, zones=None, roi_crop=False, tiling=None):
+    """Infer a frame sequence and aggregate it over time; returns (InferenceOutput, sequence summary)"""
+    if tiling or (zones and roi_crop):
+        outputs = [run_detection(model_path, backend, frame, zones, roi_crop, tiling) for frame in frames]
+    else:
+        # One batched pass through the pool
+        outputs = infer_images(model_path, backend, frames)
+    for output in outputs:
+        if output.error:
+            return output, None
+    arrs = [output.detections for output in outputs]
+    image, lookup = outputs[-1].image, outputs[-1].lookup
+    arr, votes, seen = sequence_mod.vote(arrs, image.shape, TRACK_IOU, SEQUENCE_MIN_VOTE)
+    summary = {
+        "frames": len(frames),
+        "counts": sequence_mod.class_counts(arrs, lookup),
+        "votes": votes,
+        "seen": seen,
+        "per_frame": [{"index": i, "count": len(a), "detections": dets_mod.to_list(a, lookup)}
+                      for i, a in enumerate(arrs)],
+    }
+    return InferenceOutput(image, arr, lookup, None), summary
+
+def infer_gated(camera_key, model_path, backend, image, regions=None, threshold=None, zones=None, roi_crop=False,
+                tiling=None):
+    """run_detection behind the motion gate; returns (InferenceOutput, cached, changed fraction)"""
+    key = (model_path, backend, tuple((z.name, z.polygon.tobytes()) for z in zones or ()), roi_crop,
+           tuple(sorted((tiling or {}).items())))
+    cached, changed = motion_gate.check(camera_key, key, image, regions, threshold)
+    if cached is not None:
+        arr, lookup = cached
+        return InferenceOutput(resize_for_inference(image), arr, lookup, None), True, changed
+    output = run_detection(model_path, backend, image, zones, roi_crop, tiling)
+    if output.error is None:
+        motion_gate.update(camera_key, key, image, (output.detections, output.lookup))
+    return output, False, changed
+
+def inference_cache_key(image_bytes, model_name, backend, zones, roi_crop, tiling):
+    """Result cache key: image bytes, model checksum and every option that changes the detections.
+    
+    None while the model's checksum is still being computed; the request then skips the cache.
+    """
+    checksum = model_store.known_checksum(model_name)
+    if checksum is None:
+        return None
+    return cache_key(image_bytes, model_name, checksum, backend, PREDICT_ARGS,
+                     [(z.name, z.polygon.tolist()) for z in zones or ()], roi_crop, tiling)
+
+def parse_flag(value, default=False):
+    """Boolean request parameter from form, query or JSON"""
+    if value is None:
+        return default
+    return str(value).lower() in ('true', '1', 'yes')
+
+def parse_motion_options(params):
+    """(enabled, regions, threshold) from motion_gate, motion_regions and motion_threshold"""
+    enabled = parse_flag(params.get('motion_gate'), MOTION_GATE)
+    regions = params.get('motion_regions')
+    if isinstance(regions, str):
+        regions = json.loads(regions) if regions.strip() else None
+    regions = parse_regions(regions)
+    threshold = params.get('motion_threshold')
+    threshold = float(threshold) if threshold not in (None, '') else None
+    return enabled, regions, threshold
+
+def parse_zone_options(params):
+    """(zones, roi_crop) from zones (JSON list) and roi_crop (default on when zones are given)"""
+    raw = params.get('zones')
+    if isinstance(raw, str):
+        raw = json.loads(raw) if raw.strip() else None
+    zones = zones_mod.parse_zones(raw)
+    roi_crop = parse_flag(params.get('roi_crop'), True) if zones else False
+    if roi_crop and len(zones) > INFERENCE_QUEUE_SIZE:
+        raise ValueError(f"at most {INFERENCE_QUEUE_SIZE} zones can be cropped per frame")
+    return zones, roi_crop
+
+def parse_sequence_options(params):
+    """(count, interval) for mode=sequence"""
+    count = int(params.get('count', 5))
+    interval = float(params.get('interval', 1))
+    max_frames = min(MAX_SEQUENCE_FRAMES, INFERENCE_QUEUE_SIZE)
+    if not 1 <= count <= max_frames:
+        raise ValueError(f"count must be between 1 and {max_frames}")
+    if not 0 <= interval <= MAX_SEQUENCE_INTERVAL:
+        raise ValueError(f"interval must be between 0 and {MAX_SEQUENCE_INTERVAL:g} seconds")
+    return count, interval
+
+def parse_tile_options(params):
+    """Tiling options from tiled, tile_size, tile_overlap and tile_merge; None when not tiled"""
+    if not parse_flag(params.get('tiled')):
+        return None
+    tiling = {}
+    if params.get('tile_size') not in (None, ''):
+        tiling['size'] = int(params['tile_size'])
+        if not 160 <= tiling['size'] <= 4096:
+            raise ValueError("tile_size must be between 160 and 4096")
+    if params.get('tile_overlap') not in (None, ''):
+        tiling['overlap'] = float(params['tile_overlap'])
+        if not 0.0 <= tiling['overlap'] < 0.9:
+            raise ValueError("tile_overlap must be between 0 and 0.9")
+    if params.get('tile_merge'):
+        if params['tile_merge'] not in tiles_mod.MERGE_MODES:
+            raise ValueError(f"tile_merge must be one of: {', '.join(tiles_mod.MERGE_MODES)}")
+        tiling['merge'] = params['tile_merge']
+    return tiling or {'merge': TILE_MERGE}
+
+def add_zone_info(payload, detections, arr, zones, image_shape, lookup):
+    """Tag detections with the zones they stand in and add per-zone counts"""
+    inside = zones_mod.membership(arr, zones, image_shape)
+    names = [zone.name for zone in zones]
+    for detection, row in zip(detections, inside.tolist()):
+        detection["zones"] = [name for name, hit in zip(names, row) if hit]
+    payload["zones"] = zones_mod.summarize(arr, zones, inside, lookup)
+
+def apply_tracking(camera_key, detections, arr, lookup):
+    """Add track_id/dwell_s to the detection dicts; returns (events, active tracks)"""
+    tracker = trackers.get(camera_key)
+    with tracker.lock:
+        track_ids, dwell, events = tracker.update(arr, lookup)
+        active = tracker.active(lookup)
+    for detection, track_id, seconds in zip(detections, track_ids.tolist(), dwell.tolist()):
+        detection["track_id"] = track_id or None  # None while the track is tentative
+        detection["dwell_s"] = round(seconds, 1)
+    return events, active
+
+def overloaded_response(e):
+    """503 with Retry-After when the inference queue is full"""
+    response = jsonify({"error": "Server busy, inference queue is full", "retry_after": e.retry_after})
+    response.headers['Retry-After'] = str(e.retry_after)
+    return response, 503
+
+def timeout_response(e):
+    """504 when the inference did not finish within INFERENCE_TIMEOUT"""
+    return jsonify({"error": f"Inference timed out after {e.timeout:g}s", "timeout_s": e.timeout}), 504
+
+def get_request_params():
+    """Merge form fields and JSON body into one dict"""
+    params = dict(request.form.items())
+    params.update(request.get_json(silent=True) or {})
+    return params
+
+def save_result(result_id, jpeg_bytes, detections, model_name, camera_id=None):
+    """Write already-encoded result image and detection JSON through the result store.
+    
+    Returns (image file or None, json file); the image is skipped for empty frames when
+    RESULTS_IMAGES_WITH_DETECTIONS_ONLY is set.
+    """
+    with STAGE_SECONDS.time('save'):
+        return result_store.save(result_id, jpeg_bytes, detections, model_name, camera_id)
+
+def record_history(camera_id, model_name, detections):
+    """Queue the frame for the detection history; the writer thread inserts it later"""
+    if history is not None:
+        history.record(camera_id, model_name, detections)
+
+def detect_stream_frame(camera):
+    """Scheduler callback: run detection on the latest frame of a watched camera"""
+    model_path = os.path.join(MODELS_DIR, camera.model)
+    if not os.path.exists(model_path):
+        raise RuntimeError(f"Model not found: {camera.model}")
+    
+    zones, roi_crop = parse_zone_options(camera.options)
+    tiling = parse_tile_options(camera.options)
+    options = capture_options(camera.rtsp_url, camera.options, full_resolution=bool(tiling or roi_crop))
+    image, error_msg = fetch_rtsp_frame(camera.rtsp_url, options=options)
+    if image is None:
+        raise RuntimeError(error_msg or "Failed to get image")
+    
+    backend = default_backend(model_path, ONNX_BACKEND)
+    gated, regions, threshold = parse_motion_options(camera.options)
+    if gated:
+        output, cached, _ = infer_gated(f"stream:{camera.camera_id}", model_path, backend, image,
+                                        regions, threshold, zones, roi_crop, tiling)
+    else:
+        output, cached = run_detection(model_path, backend, image, zones, roi_crop, tiling), False
+    if output.error:
+        raise RuntimeError(output.error)
+    detections = dets_mod.to_list(output.detections, output.lookup)
+    # Kept on the camera for lazy rendering: the image is only encoded if a client fetches image_url
+    camera.latest = {"image": output.image, "detections": output.detections, "lookup": output.lookup, "jpeg": {}}
+    camera.frames += 1
+    
+    event = {
+        "type": "detections",
+        "model": camera.model,
+        "timestamp": datetime.now().isoformat(),
+        "count": len(detections),
+        "cached": cached,
+        "detections": detections,
+        # Stable per camera; the query changes per frame so clients notice a new image
+        "image_url": f"/api/streams/{quote(camera.camera_id, safe='')}/latest.jpg?frame={camera.frames}"
+    }
+    if zones:
+        add_zone_info(event, detections, output.detections, zones, output.image.shape, output.lookup)
+    if not parse_flag(camera.options.get('track'), True):
+        record_history(camera.camera_id, camera.model, detections)
+        return event
+    
+    track_events, active = apply_tracking(f"stream:{camera.camera_id}", detections, output.detections, output.lookup)
+    record_history(camera.camera_id, camera.model, detections)
+    if camera.options.get('emit') != 'tracks':
+        event["track_events"] = track_events
+        return event
+    # Track-only mode: publish only when something entered or left
+    if not track_events:
+        return None
+    return {
+        "type": "tracks",
+        "model": camera.model,
+        "timestamp": event["timestamp"],
+        "count": len(active),
+        "events": track_events,
+        "active": active,
+        "image_url": event["image_url"]
+    }
+
+event_broker = EventBroker()
+stream_scheduler = StreamScheduler(detect_stream_frame, event_broker, workers=STREAM_WORKERS, max_fps=STREAM_MAX_FPS)
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    """Latency and status per route (the URL rule, so label cardinality stays bounded)"""
+    started = g.get('request_started')
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint, request.method)
+        REQUESTS_TOTAL.inc(endpoint, request.method, str(response.status_code))
+    return response
+
+@metrics.collector
+def collect_component_metrics():
+    """Counters the components already keep, read only when /metrics is scraped"""
+    pool = inference_pool.stats()
+    cache = model_cache.stats()
+    motion = motion_gate.stats()
+    cameras = stream_scheduler.cameras()
+    yield ('yolo_process_resident_memory_bytes', 'gauge', "Resident memory of the API process",
+           [({}, process.memory_info().rss)])
+    yield ('yolo_inference_queue_depth', 'gauge', "Images waiting for an inference worker", [({}, pool["queue_depth"])])
+    yield ('yolo_inference_busy_workers', 'gauge', "Inference workers running a batch", [({}, pool["busy"])])
+    yield ('yolo_inference_batches_total', 'counter', "Batches run by the inference pool", [({}, pool["batches"])])
+    yield ('yolo_inference_images_total', 'counter', "Images inferred by the inference pool", [({}, pool["items"])])
+    yield ('yolo_frames_dropped_total', 'counter', "Frames or events dropped, by reason", [
+        ({"reason": "queue_full"}, pool["rejected"]),
+        ({"reason": "camera_behind"}, sum(c["skipped"] for c in cameras)),
+        ({"reason": "slow_subscriber"}, event_broker.dropped),
+        ({"reason": "history_queue_full"}, history.dropped if history is not None else 0),
+    ])
+    yield ('yolo_model_cache_hits_total', 'counter', "Model cache hits", [({}, cache["hits"])])
+    yield ('yolo_model_cache_misses_total', 'counter', "Model cache misses (model loads)", [({}, cache["misses"])])
+    yield ('yolo_model_cache_evictions_total', 'counter', "Models evicted from the cache", [({}, cache["evictions"])])
+    yield ('yolo_model_cache_models', 'gauge', "Models loaded in memory", [({}, len(cache["models"]))])
+    yield ('yolo_model_cache_used_bytes', 'gauge', "Measured memory of loaded models",
+           [({}, int(cache["used_mb"] * 1024 * 1024))])
+    results = result_cache.stats()
+    yield ('yolo_result_cache_hits_total', 'counter', "Uploads answered from the result cache", [({}, results["hits"])])
+    yield ('yolo_result_cache_misses_total', 'counter', "Cacheable uploads that ran inference", [({}, results["misses"])])
+    yield ('yolo_result_cache_entries', 'gauge', "Results held in the result cache", [({}, results["entries"])])
+    yield ('yolo_motion_checks_total', 'counter', "Frames checked by the motion gate", [({}, motion["checks"])])
+    yield ('yolo_motion_skipped_total', 'counter', "Inferences skipped by the motion gate", [({}, motion["skipped"])])
+    # rate(yolo_camera_frames_total[1m]) is the achieved FPS per watched camera
+    yield ('yolo_camera_frames_total', 'counter', "Frames processed per watched camera",
+           [({"camera_id": c["camera_id"]}, c["processed"]) for c in cameras])
+    yield ('yolo_camera_errors_total', 'counter', "Failed frames per watched camera",
+           [({"camera_id": c["camera_id"]}, c["errors"]) for c in cameras])
+    yield ('yolo_camera_target_fps', 'gauge', "Requested FPS per watched camera",
+           [({"camera_id": c["camera_id"]}, c["fps"]) for c in cameras])
+    yield ('yolo_camera_latency_seconds', 'gauge', "Latency of the last frame per watched camera",
+           [({"camera_id": c["camera_id"]}, c["last_latency_ms"] and c["last_latency_ms"] / 1000) for c in cameras])
+    yield ('yolo_capture_sessions', 'gauge', "Open RTSP capture sessions", [({}, capture_manager.stats()["active_sessions"])])
+    yield ('yolo_event_subscribers', 'gauge', "Connected /api/events clients", [({}, event_broker.subscriber_count)])
+    yield ('yolo_active_tracks', 'gauge', "Confirmed tracks across cameras", [({}, trackers.stats()["active_tracks"])])
+
+@app.route('/metrics')
+def metrics_endpoint():
+    """Prometheus text exposition"""
+    return Response(metrics.render(), content_type=metrics_mod.CONTENT_TYPE)
 
 # API Routes (same as original, just using optimized functions)
 
@@ -182,21 +709,13 @@ def run_inference(model, image):
 def list_models():
     """List all available models"""
     try:
-        models = []
-        for filename in os.listdir(MODELS_DIR):
-            if filename.endswith(('.pt', '.onnx', '.engine')):
-                model_path = os.path.join(MODELS_DIR, filename)
-                info = get_model_info(model_path)
-                if info:
-                    models.append(info)
-        
-        return jsonify({"models": models})
+        return jsonify({"models": model_registry.models()})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/api/models', methods=['POST'])
 def upload_model():
-    """Upload a new model"""
+    """Upload a new model (multipart form)"""
     try:
         if 'model' not in request.files:
             return jsonify({"error": "No model file provided"}), 400
@@ -205,22 +724,69 @@ def upload_model():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
         
-        # Validate file extension
-        if not file.filename.endswith(('.pt', '.onnx', '.engine')):
-            return jsonify({"error": "Invalid file type. Only .pt, .onnx, .engine files allowed"}), 400
-        
-        # Save file
-        filename = file.filename
-        filepath = os.path.join(MODELS_DIR, filename)
-        file.save(filepath)
-        
-        # Clear model cache when new model is uploaded
-        clear_model_cache()
-        
-        # Get model info
-        info = get_model_info(filepath)
-        
-        return jsonify({"message": "Model uploaded successfully", "model": info})
+        # Streamed into a partial file, hashed and renamed into place
+        model_store.save_stream(file.filename, file.stream, request.form.get('sha256'))
+        return model_uploaded(file.filename)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/models/<model_name>', methods=['PUT'])
+def put_model(model_name):
+    """Upload a model as the raw request body, streamed straight to disk"""
+    try:
+        model_store.save_stream(model_name, request.stream, request.headers.get('X-Checksum-SHA256'))
+        return model_uploaded(model_name)
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def model_uploaded(model_name):
+    """Response for a newly published model; profiling continues in the background"""
+    # Drop any cached copy of a model that was just overwritten
+    model_cache.remove(model_store.path(model_name))
+    return jsonify({"message": "Model uploaded successfully", "model": model_registry.refresh(model_name)})
+
+@app.route('/api/models/uploads', methods=['POST'])
+def create_model_upload():
+    """Start a resumable upload: {"name", "size", "sha256" (optional)}"""
+    data = request.get_json(silent=True) or {}
+    try:
+        status = model_store.create_upload(data.get('name'), data.get('size'), data.get('sha256'))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+    response = jsonify(status)
+    response.headers['Upload-Offset'] = str(status["offset"])
+    response.headers['Location'] = f"/api/models/uploads/{status['upload_id']}"
+    return response, 201
+
+@app.route('/api/models/uploads/<upload_id>', methods=['GET', 'HEAD', 'PATCH', 'DELETE'])
+def model_upload(upload_id):
+    """Resume point (GET/HEAD), next chunk at Upload-Offset (PATCH) or abort (DELETE)"""
+    try:
+        if request.method == 'DELETE':
+            model_store.abort(upload_id)
+            return jsonify({"message": "Upload aborted"})
+        if request.method == 'PATCH':
+            try:
+                offset = int(request.headers['Upload-Offset'])
+            except (KeyError, ValueError):
+                return jsonify({"error": "Upload-Offset header required"}), 400
+            status, sha256 = model_store.append(upload_id, offset, request.stream)
+            if sha256:
+                # Declared size reached: the model is published
+                response = model_uploaded(status["name"])
+                response.headers['Upload-Offset'] = str(status["offset"])
+                return response, 201
+        else:
+            status = model_store.upload_status(upload_id)
+        response = jsonify(status)
+        response.headers['Upload-Offset'] = str(status["offset"])
+        return response
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -228,17 +794,18 @@ def upload_model():
 def delete_model(model_name):
     """Delete a model"""
     try:
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Model not found"}), 404
         model_path = os.path.join(MODELS_DIR, model_name)
         
         if not os.path.exists(model_path):
             return jsonify({"error": "Model not found"}), 404
         
-        # Remove from loaded models cache
-        if model_path in loaded_models:
-            del loaded_models[model_path]
-            gc.collect()
+        # Remove from loaded models cache (every backend it was loaded into)
+        model_cache.remove(model_path)
         
-        os.remove(model_path)
+        model_store.delete(model_name)
+        model_registry.remove(model_name)
         
         return jsonify({"message": "Model deleted successfully"})
     except Exception as e:
@@ -246,14 +813,83 @@ def delete_model(model_name):
 
 @app.route('/api/models/<model_name>', methods=['GET'])
 def download_model(model_name):
-    """Download a model"""
+    """Download a model; the ETag is its SHA-256 and Range requests are supported"""
     try:
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Model not found"}), 404
         model_path = os.path.join(MODELS_DIR, model_name)
         
         if not os.path.exists(model_path):
             return jsonify({"error": "Model not found"}), 404
         
-        return send_file(model_path, as_attachment=True)
+        # Streamed by the server's file wrapper; If-None-Match / If-Range / Range handled by Werkzeug
+        sha256 = model_store.checksum(model_name)
+        response = send_file(model_path, as_attachment=True, etag=sha256, conditional=True, max_age=0)
+        response.headers['X-Checksum-SHA256'] = sha256
+        return response
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/models/<model_name>/info', methods=['GET'])
+def model_info(model_name):
+    """Registry entry of one model: classes, input size, task, parameters, latency"""
+    if not valid_model_name(model_name):
+        return jsonify({"error": "Invalid model name"}), 400
+    info = model_registry.get(model_name)
+    if info is None:
+        return jsonify({"error": "Model not found"}), 404
+    return jsonify(info)
+
+@app.route('/api/models/<model_name>/profile', methods=['POST'])
+def profile_model_route(model_name):
+    """Queue a background profile (classes, input size, latency) of one model"""
+    if not valid_model_name(model_name):
+        return jsonify({"error": "Invalid model name"}), 400
+    info = model_registry.profile(model_name)
+    if info is None:
+        return jsonify({"error": "Model not found"}), 404
+    return jsonify({"message": "Model profile queued", "model": info}), 202
+
+@app.route('/api/models/<model_name>/pin', methods=['POST', 'DELETE'])
+def pin_model(model_name):
+    """Pin (POST) or unpin (DELETE) a model so the cache never evicts it"""
+    if not valid_model_name(model_name):
+        return jsonify({"error": "Invalid model name"}), 400
+    model_path = os.path.join(MODELS_DIR, model_name)
+    if not os.path.exists(model_path):
+        return jsonify({"error": "Model not found"}), 404
+    if request.method == 'POST':
+        model_cache.pin(model_path)
+        return jsonify({"message": "Model pinned"})
+    model_cache.unpin(model_path)
+    return jsonify({"message": "Model unpinned"})
+
+@app.route('/api/models/<model_name>/export', methods=['POST'])
+def export_model(model_name):
+    """Export a .pt model to ONNX once; later calls return the cached export"""
+    try:
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Invalid model name"}), 400
+        model_path = os.path.join(MODELS_DIR, model_name)
+        if not os.path.exists(model_path):
+            return jsonify({"error": "Model not found"}), 404
+        if not model_name.endswith('.pt'):
+            return jsonify({"error": "Only .pt models can be exported"}), 400
+        
+        onnx_path = os.path.splitext(model_path)[0] + '.onnx'
+        if os.path.exists(onnx_path) and os.path.getmtime(onnx_path) >= os.path.getmtime(model_path):
+            return jsonify({"message": "Using cached ONNX export",
+                            "model": model_registry.refresh(os.path.basename(onnx_path))})
+        
+        print(f"Exporting {model_name} to ONNX, memory: {get_memory_usage():.1f} MB")
+        from ultralytics import YOLO
+        # Dynamic batch axis so the ONNX model can serve batched requests
+        exported = YOLO(model_path).export(format='onnx', imgsz=INFERENCE_SIZE, dynamic=True, simplify=False)
+        if exported and os.path.abspath(exported) != os.path.abspath(onnx_path):
+            shutil.move(exported, onnx_path)
+        gc.collect()
+        
+        return jsonify({"message": "Model exported to ONNX", "model": model_registry.refresh(os.path.basename(onnx_path))})
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -261,101 +897,440 @@ def download_model(model_name):
 def run_inference_api():
     """Run inference on image or RTSP stream"""
     try:
-        print(f"Inference request received, memory: {get_memory_usage():.1f} MB")
+        params = get_request_params()
         
         # Get model name
-        model_name = request.form.get('model') or request.json.get('model')
+        model_name = params.get('model')
         if not model_name:
             return jsonify({"error": "Model name required"}), 400
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Invalid model name"}), 400
         
         model_path = os.path.join(MODELS_DIR, model_name)
         if not os.path.exists(model_path):
             return jsonify({"error": "Model not found"}), 404
         
-        # Load model
-        model = load_model(model_path)
-        if model is None:
-            return jsonify({"error": "Failed to load model"}), 500
+        # Optional backend override (ultralytics, onnxruntime, openvino)
+        backend = params.get('backend') or default_backend(model_path, ONNX_BACKEND)
+        if backend not in BACKENDS:
+            return jsonify({"error": f"Unknown backend: {backend}"}), 400
+        
+        # Response content and encoding options
+        response_mode = params.get('response', 'inline')
+        if response_mode not in RESPONSE_MODES:
+            return jsonify({"error": f"Invalid response mode. Use one of: {', '.join(RESPONSE_MODES)}"}), 400
+        try:
+            quality = min(100, max(10, int(params.get('jpeg_quality', JPEG_QUALITY))))
+        except (TypeError, ValueError):
+            return jsonify({"error": "jpeg_quality must be an integer"}), 400
+        save = parse_flag(params.get('save'), response_mode in ('inline', 'url'))
+        try:
+            gated, motion_regions, motion_threshold = parse_motion_options(params)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid motion options: {e}"}), 400
+        try:
+            zones, roi_crop = parse_zone_options(params)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid zones: {e}"}), 400
+        try:
+            tiling = parse_tile_options(params)
+        except (TypeError, ValueError) as e:
+            return jsonify({"error": f"Invalid tiling options: {e}"}), 400
+        # mode: single (default) or sequence; "manual" is what the HA integration sends for uploads
+        sequence = params.get('mode') == 'sequence'
+        if sequence:
+            try:
+                count, interval = parse_sequence_options(params)
+            except (TypeError, ValueError) as e:
+                return jsonify({"error": f"Invalid sequence options: {e}"}), 400
+            if not params.get('rtsp_url') or 'image' in request.files:
+                return jsonify({"error": "Sequence mode requires rtsp_url and no image upload"}), 400
         
         image = None
         error_msg = None
+        cache_entry = result_key = None
         
         # Handle different input types
+        # Camera identity for the motion gate: explicit camera_id, else the RTSP URL
+        camera_key = params.get('camera_id')
         if 'image' in request.files:
             # File upload
             file = request.files['image']
             image_data = file.read()
-            nparr = np.frombuffer(image_data, np.uint8)
-            image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        elif request.json and 'rtsp_url' in request.json:
-            # RTSP stream
-            rtsp_url = request.json['rtsp_url']
-            image, error_msg = fetch_rtsp_frame(rtsp_url)
-        elif request.form.get('rtsp_url'):
-            # RTSP from form
-            rtsp_url = request.form.get('rtsp_url')
-            image, error_msg = fetch_rtsp_frame(rtsp_url)
+            if (result_cache.enabled and parse_flag(params.get('cache'), True)
+                    and not (sequence or (gated and camera_key))):
+                result_key = inference_cache_key(image_data, model_name, backend, zones, roi_crop, tiling)
+                cache_entry = result_cache.get(result_key) if result_key else None
+            if cache_entry is not None:
+                image = cache_entry["image"]
+            else:
+                nparr = np.frombuffer(image_data, np.uint8)
+                with STAGE_SECONDS.time('decode'):
+                    image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
+        elif params.get('rtsp_url'):
+            # RTSP stream (JSON or form)
+            options = capture_options(params['rtsp_url'], params, full_resolution=bool(tiling or roi_crop))
+            if sequence:
+                # One capture session, frames sampled at the requested interval
+                frames, error_msg = capture_manager.get_sequence(params['rtsp_url'], count, interval, options=options)
+                image = frames[-1] if frames else None
+            else:
+                image, error_msg = fetch_rtsp_frame(params['rtsp_url'], options=options)
+            camera_key = camera_key or params['rtsp_url']
         else:
             return jsonify({"error": "No image or RTSP URL provided"}), 400
         
         if image is None:
             return jsonify({"error": error_msg or "Failed to get image"}), 400
         
-        # Run inference
-        annotated_image, detections, error_msg = run_inference(model, image)
-        
-        if annotated_image is None:
+        # Run inference on the worker pool, unless the motion gate says nothing changed
+        cached, changed, summary = False, None, None
+        if cache_entry is not None:
+            output = InferenceOutput(image, cache_entry["detections"], cache_entry["lookup"], None)
+        elif sequence:
+            output, summary = infer_sequence(model_path, backend, frames, zones, roi_crop, tiling)
+        elif gated and camera_key:
+            output, cached, changed = infer_gated(camera_key, model_path, backend, image,
+                                                  motion_regions, motion_threshold, zones, roi_crop, tiling)
+        else:
+            output = run_detection(model_path, backend, image, zones, roi_crop, tiling)
+        image, arr, lookup, error_msg, timings = output
+        if arr is None:
             return jsonify({"error": error_msg or "Inference failed"}), 500
+        if result_key and cache_entry is None:
+            result_cache.put(result_key, image, arr, lookup)
         
-        # Save result image
+        detections = dets_mod.to_list(arr, lookup)
         result_id = str(uuid.uuid4())
-        result_filename = f"result_{result_id}.jpg"
-        result_path = os.path.join(RESULTS_DIR, result_filename)
-        cv2.imwrite(result_path, annotated_image)
-        
-        # Convert image to base64 for response
-        _, buffer = cv2.imencode('.jpg', annotated_image)
-        img_base64 = base64.b64encode(buffer).decode('utf-8')
-        
-        # Save detection JSON
-        json_filename = f"result_{result_id}.json"
-        json_path = os.path.join(RESULTS_DIR, json_filename)
-        with open(json_path, 'w') as f:
-            json.dump({
-                "timestamp": datetime.now().isoformat(),
-                "model": model_name,
-                "detections": detections,
-                "memory_usage_mb": get_memory_usage()
-            }, f, indent=2)
+        recent_results.put(result_id, image, arr, lookup)
         
-        return jsonify({
+        payload = {
             "result_id": result_id,
-            "image_base64": img_base64,
             "detections": detections,
-            "image_url": f"/api/results/{result_filename}",
-            "json_url": f"/api/results/{json_filename}",
-            "memory_usage_mb": round(get_memory_usage(), 1)
-        })
+            "image_url": f"/api/results/{result_id}/image"  # Rendered on demand
+        }
+        if summary:
+            # Aggregated detections: vote = summed confidence / frames, seen = frames it appeared in
+            for detection, vote, seen in zip(detections, summary.pop("votes"), summary.pop("seen")):
+                detection["vote"] = vote
+                detection["frames_seen"] = seen
+            payload["mode"] = "sequence"
+            payload["sequence"] = dict(summary, requested=count, interval=interval)
+        if zones:
+            add_zone_info(payload, detections, arr, zones, image.shape, lookup)
+        if timings:
+            payload["timings"] = timings
+        if camera_key and parse_flag(params.get('track')):
+            payload["track_events"], _ = apply_tracking(camera_key, detections, arr, lookup)
+        if gated and camera_key and not sequence:
+            # cached: detections are from an earlier frame, drawn on the current one
+            payload["cached"] = cached
+            payload["motion"] = None if changed is None else round(changed, 4)
+        if result_key:
+            # hit: identical upload seen within RESULT_CACHE_TTL, nothing was decoded or inferred
+            payload["result_cache"] = "hit" if cache_entry is not None else "miss"
+        record_history(params.get('camera_id') or (camera_label(params['rtsp_url']) if params.get('rtsp_url') else None),
+                       model_name, detections)
+        
+        # Render and encode once; the same bytes go to disk and into the response
+        jpeg_bytes = None
+        if response_mode != 'detections' or save:
+            jpeg_bytes = cache_entry["jpeg"].get(quality) if cache_entry is not None else None
+            if jpeg_bytes is None:
+                with STAGE_SECONDS.time('encode'):
+                    jpeg_bytes = encode_jpeg(draw_detections(image, arr, lookup), quality)
+                if result_key:
+                    result_cache.store_jpeg(result_key, quality, jpeg_bytes)
+            recent_results.store_jpeg(result_id, quality, jpeg_bytes)
+        
+        if save:
+            result_filename, json_filename = save_result(result_id, jpeg_bytes, detections, model_name,
+                                                         params.get('camera_id'))
+            if result_filename:
+                payload["image_url"] = f"/api/results/{result_filename}"
+            payload["json_url"] = f"/api/results/{json_filename}"
+        
+        with STAGE_SECONDS.time('serialize'):
+            if response_mode == 'inline':
+                payload["image_base64"] = base64.b64encode(jpeg_bytes).decode('utf-8')
+                payload["memory_usage_mb"] = round(get_memory_usage(), 1)
+            elif response_mode == 'multipart':
+                body, content_type = multipart_body(payload, jpeg_bytes)
+                return Response(body, content_type=content_type)
+            return jsonify(payload)
+        
+    except Overloaded as e:
+        return overloaded_response(e)
+    except InferenceTimeout as e:
+        return timeout_response(e)
+    except Exception as e:
+        print(f"API error: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/streams', methods=['GET'])
+def list_streams():
+    """List cameras registered for continuous detection"""
+    return jsonify({"streams": stream_scheduler.cameras()})
+
+@app.route('/api/streams', methods=['POST'])
+def register_stream():
+    """Register (or update) a camera for continuous detection"""
+    try:
+        data = request.get_json(silent=True) or {}
+        camera_id = data.get('camera_id')
+        rtsp_url = data.get('rtsp_url')
+        model_name = data.get('model')
+        if not camera_id or not rtsp_url or not model_name:
+            return jsonify({"error": "camera_id, rtsp_url and model are required"}), 400
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Invalid model name"}), 400
+        
+        if not os.path.exists(os.path.join(MODELS_DIR, model_name)):
+            return jsonify({"error": "Model not found"}), 404
+        
+        options = {k: data[k] for k in ('motion_gate', 'motion_regions', 'motion_threshold', 'zones', 'roi_crop',
+                                        'tiled', 'tile_size', 'tile_overlap', 'tile_merge', 'track', 'emit',
+                                        'substream_url', 'prefer_substream', 'keyframes_only')
+                   if k in data}
+        if options.get('emit', 'detections') not in ('detections', 'tracks'):
+            return jsonify({"error": "emit must be 'detections' or 'tracks'"}), 400
+        # Validate before the scheduler sees them
+        parse_motion_options(options)
+        parse_zone_options(options)
+        parse_tile_options(options)
+        info = stream_scheduler.register(camera_id, rtsp_url, model_name, fps=data.get('fps', 1.0), options=options)
+        return jsonify({"message": "Stream registered", "stream": info})
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"Invalid stream parameters: {e}"}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/api/streams/<camera_id>', methods=['DELETE'])
+def unregister_stream(camera_id):
+    """Stop continuous detection on a camera"""
+    camera = stream_scheduler.unregister(camera_id)
+    if camera is None:
+        return jsonify({"error": "Stream not found"}), 404
+    capture_manager.close(camera.rtsp_url)
+    motion_gate.reset(f"stream:{camera_id}")
+    trackers.reset(f"stream:{camera_id}")
+    return jsonify({"message": "Stream removed"})
+
+@app.route('/api/streams/<camera_id>/latest.jpg')
+def latest_stream_frame(camera_id):
+    """Annotated image of a watched camera's last processed frame, rendered on demand"""
+    try:
+        quality = min(100, max(10, int(request.args.get('quality', JPEG_QUALITY))))
+    except ValueError:
+        return jsonify({"error": "quality must be an integer"}), 400
+    camera = stream_scheduler.get(camera_id)
+    if camera is None:
+        return jsonify({"error": "Stream not found"}), 404
+    latest = camera.latest
+    if latest is None:
+        return jsonify({"error": "No frame processed yet"}), 404
+    jpeg_bytes = latest["jpeg"].get(quality)
+    if jpeg_bytes is None:
+        with STAGE_SECONDS.time('encode'):
+            jpeg_bytes = encode_jpeg(draw_detections(latest["image"], latest["detections"], latest["lookup"]), quality)
+        latest["jpeg"][quality] = jpeg_bytes
+    return Response(jpeg_bytes, mimetype='image/jpeg', headers={"Cache-Control": "no-cache"})
+
+@app.route('/api/events')
+def stream_events():
+    """Server-sent events: push detection results from watched cameras"""
+    camera_ids = set(request.args.getlist('camera_id'))
+    subscription = event_broker.subscribe()
+    
+    def generate():
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    event = subscription.get(timeout=EVENTS_KEEPALIVE)
+                except queue.Empty:
+                    # Comment line keeps proxies and the client's read timeout happy
+                    yield ": keep-alive\n\n"
+                    continue
+                if camera_ids and event.get("camera_id") not in camera_ids:
+                    continue
+                payload = json.dumps(event, separators=(',', ':'))
+                yield f"event: {event.get('type', 'message')}\ndata: {payload}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+@app.route('/api/inference/batch', methods=['POST'])
+def run_inference_batch_api():
+    """Run inference on several images (or RTSP URLs) in one batched pass"""
+    try:
+        data = request.get_json(silent=True) or {}
+        model_name = request.form.get('model') or data.get('model')
+        if not model_name:
+            return jsonify({"error": "Model name required"}), 400
+        if not valid_model_name(model_name):
+            return jsonify({"error": "Invalid model name"}), 400
         
+        model_path = os.path.join(MODELS_DIR, model_name)
+        if not os.path.exists(model_path):
+            return jsonify({"error": "Model not found"}), 404
+        
+        images = []
+        if request.files.getlist('images'):
+            for file in request.files.getlist('images'):
+                nparr = np.frombuffer(file.read(), np.uint8)
+                with STAGE_SECONDS.time('decode'):
+                    images.append(cv2.imdecode(nparr, cv2.IMREAD_COLOR))
+        elif data.get('rtsp_urls'):
+            for rtsp_url in data['rtsp_urls']:
+                image, _ = fetch_rtsp_frame(rtsp_url)
+                images.append(image)
+        else:
+            return jsonify({"error": "No images or RTSP URLs provided"}), 400
+        
+        if len(images) > INFERENCE_QUEUE_SIZE:
+            return jsonify({"error": f"Too many images (max {INFERENCE_QUEUE_SIZE})"}), 400
+        
+        # The pool runs these in batches of up to MAX_BATCH_SIZE
+        valid = [i for i, image in enumerate(images) if image is not None]
+        outputs = dict(zip(valid, infer_images(model_path, default_backend(model_path, ONNX_BACKEND),
+                                               [images[i] for i in valid]))) if valid else {}
+        
+        results = []
+        for i in range(len(images)):
+            if i not in outputs:
+                results.append({"index": i, "error": "Failed to get image"})
+                continue
+            image, arr, lookup, error_msg, _ = outputs[i]
+            if arr is None:
+                results.append({"index": i, "error": error_msg or "Inference failed"})
+                continue
+            detections = dets_mod.to_list(arr, lookup)
+            record_history(camera_label(data['rtsp_urls'][i]) if data.get('rtsp_urls') else None, model_name, detections)
+            result_id = str(uuid.uuid4())
+            recent_results.put(result_id, image, arr, lookup)
+            with STAGE_SECONDS.time('encode'):
+                jpeg_bytes = encode_jpeg(draw_detections(image, arr, lookup), JPEG_QUALITY)
+            result_filename, json_filename = save_result(result_id, jpeg_bytes, detections, model_name)
+            results.append({
+                "index": i,
+                "result_id": result_id,
+                "detections": detections,
+                "image_url": f"/api/results/{result_filename}" if result_filename else f"/api/results/{result_id}/image",
+                "json_url": f"/api/results/{json_filename}"
+            })
+        
+        return jsonify({"model": model_name, "results": results})
+    except Overloaded as e:
+        return overloaded_response(e)
+    except InferenceTimeout as e:
+        return timeout_response(e)
     except Exception as e:
         print(f"API error: {e}")
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/results/<result_id>/image')
+def render_result(result_id):
+    """Render the annotated image of a recent result on demand"""
+    try:
+        quality = min(100, max(10, int(request.args.get('quality', JPEG_QUALITY))))
+    except ValueError:
+        return jsonify({"error": "quality must be an integer"}), 400
+    jpeg_bytes = recent_results.render(result_id, quality)
+    if jpeg_bytes is None:
+        # Fall back to an image saved at inference time
+        filename = f"result_{result_id}.jpg"
+        if os.path.exists(os.path.join(RESULTS_DIR, filename)):
+            return send_from_directory(RESULTS_DIR, filename)
+        return jsonify({"error": "Result not found or expired"}), 404
+    return Response(jpeg_bytes, mimetype='image/jpeg')
+
+@app.route('/api/results', methods=['GET'])
+def query_results():
+    """Look up saved results by camera, time range and class (newest first)"""
+    try:
+        since = request.args.get('since')
+        until = request.args.get('until')
+        limit = min(1000, max(1, int(request.args.get('limit', 100))))
+        results = result_store.query(
+            camera_id=request.args.get('camera_id'),
+            since=datetime.fromisoformat(since).timestamp() if since else None,
+            until=datetime.fromisoformat(until).timestamp() if until else None,
+            class_name=request.args.get('class'),
+            limit=limit
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+    return jsonify({"results": results})
+
+@app.route('/api/history', methods=['GET'])
+def query_history():
+    """Time-bucketed detection counts per camera and class"""
+    if history is None:
+        return jsonify({"error": "Detection history is disabled"}), 404
+    try:
+        until = request.args.get('until')
+        until = datetime.fromisoformat(until).timestamp() if until else time.time()
+        since = request.args.get('since')
+        since = datetime.fromisoformat(since).timestamp() if since else until - 86400
+        bucket = parse_bucket(request.args.get('bucket', '1h'))
+        buckets = history.counts(
+            since, until, bucket,
+            camera_id=request.args.get('camera_id'),
+            class_name=request.args.get('class'),
+            min_confidence=float(request.args.get('min_confidence', 0))
+        )
+    except ValueError as e:
+        return jsonify({"error": f"Invalid query: {e}"}), 400
+    return jsonify({
+        "since": datetime.fromtimestamp(since).isoformat(),
+        "until": datetime.fromtimestamp(until).isoformat(),
+        "bucket_s": bucket,
+        "buckets": buckets
+    })
+
 @app.route('/api/results/<filename>')
 def get_result(filename):
     """Get result file"""
+    if not filename.startswith('result_'):
+        return jsonify({"error": "Result not found"}), 404
     try:
         return send_from_directory(RESULTS_DIR, filename)
     except Exception as e:
         return jsonify({"error": str(e)}), 404
 
+@app.route('/api/health')
+def health():
+    """Liveness: the process is up and serving HTTP"""
+    return jsonify({"status": "ok"})
+
+@app.route('/api/ready')
+def ready():
+    """Readiness: 200 once preloaded models are loaded and warmed up, 503 before"""
+    return jsonify(readiness), (200 if readiness["ready"] else 503)
+
 @app.route('/api/status')
 def get_status():
     """Get system status"""
     return jsonify({
         "memory_usage_mb": round(get_memory_usage(), 1),
-        "loaded_models": len(loaded_models),
-        "torch_threads": torch.get_num_threads()
+        "loaded_models": len(model_cache),
+        "model_cache": model_cache.stats(),
+        "model_registry": model_registry.stats(),
+        "torch_threads": INFERENCE_THREADS,
+        "capture": capture_manager.stats(),
+        "streams": len(stream_scheduler.cameras()),
+        "subscribers": event_broker.subscriber_count,
+        "inference": inference_pool.stats(),
+        "motion_gate": motion_gate.stats(),
+        "result_cache": result_cache.stats(),
+        "tracking": trackers.stats(),
+        "results": result_store.stats(),
+        "history": history.stats() if history is not None else None
     })
 
 # Serve React frontend
@@ -374,4 +1349,15 @@ def serve_frontend(path=''):
 
 if __name__ == '__main__':
     print(f"Starting YOLO API for N150, initial memory: {get_memory_usage():.1f} MB")
-    app.run(host='0.0.0.0', port=5000, debug=False)
+    threading.Thread(target=preload_models, name="model-preload", daemon=True).start()
+    model_registry.start()
+    result_store.start()
+    if history is not None:
+        history.start()
+    if SERVER == 'dev':
+        app.run(host='0.0.0.0', port=5000, debug=False, threaded=True)
+    else:
+        from waitress import serve
+        print(f"Serving with waitress: {SERVER_THREADS} HTTP threads, {INFERENCE_WORKERS} inference worker(s)")
+        serve(app, host='0.0.0.0', port=5000, threads=SERVER_THREADS,
+              connection_limit=SERVER_THREADS * 4, channel_timeout=120)
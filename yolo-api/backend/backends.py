@@ -0,0 +1,231 @@
+"""Inference backends for the YOLO API
+
+Every backend takes a list of BGR images (already resized so the longest
+side fits the serving size) and returns one float32 array of shape (N, 6)
+per image with rows [x1, y1, x2, y2, confidence, class_id] in that image's
+pixel coordinates.
+
+- UltralyticsBackend: PyTorch through ultralytics.YOLO (.pt, .engine, .onnx)
+- OnnxRuntimeBackend: ONNX Runtime with NumPy pre/post-processing (.onnx)
+- OpenVinoBackend: OpenVINO runtime on the same .onnx graph (optional)
+
+ultralytics/torch, onnxruntime and openvino are imported lazily so an
+ONNX-only deployment never pays for the torch import.
+"""
+import ast
+import os
+
+import cv2
+import numpy as np
+
+EMPTY_DETECTIONS = np.zeros((0, 6), dtype=np.float32)
+
+
+def letterbox(image, size):
+    """Fit image inside a size x size canvas, padding bottom/right only.
+
+    Never upscales. Returns (padded, ratio); divide box coordinates by ratio
+    to map them back onto image.
+    """
+    h, w = image.shape[:2]
+    ratio = min(size / h, size / w, 1.0)
+    if ratio != 1.0:
+        image = cv2.resize(image, (int(round(w * ratio)), int(round(h * ratio))), interpolation=cv2.INTER_LINEAR)
+        h, w = image.shape[:2]
+    if h != size or w != size:
+        image = cv2.copyMakeBorder(image, 0, size - h, 0, size - w, cv2.BORDER_CONSTANT, value=(114, 114, 114))
+    return image, ratio
+
+
+def nms(boxes, scores, iou_threshold):
+    """Greedy non-maximum suppression; returns kept indices, best score first"""
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    order = scores.argsort()[::-1]
+    keep = []
+    while order.size:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+        iw = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        ih = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = iw * ih
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        order = rest[iou <= iou_threshold]
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess_yolov8(output, conf, iou, max_det):
+    """Decode raw YOLOv8 output (B, 4 + nc, anchors) into per-image (N, 6) arrays"""
+    results = []
+    for pred in output.transpose(0, 2, 1):
+        scores = pred[:, 4:]
+        cls = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), cls]
+        mask = confidence > conf
+        if not mask.any():
+            results.append(EMPTY_DETECTIONS)
+            continue
+        xywh, cls, confidence = pred[mask, :4], cls[mask], confidence[mask]
+        boxes = np.empty_like(xywh)
+        boxes[:, :2] = xywh[:, :2] - xywh[:, 2:] / 2
+        boxes[:, 2:] = xywh[:, :2] + xywh[:, 2:] / 2
+        # Offset boxes per class so one NMS pass never suppresses across classes
+        keep = nms(boxes + cls[:, None] * 4096.0, confidence, iou)[:max_det]
+        results.append(np.concatenate([
+            boxes[keep], confidence[keep, None], cls[keep, None].astype(np.float32)
+        ], axis=1).astype(np.float32))
+    return results
+
+
+def parse_names(raw):
+    """Class names from Ultralytics export metadata ("{0: 'person', ...}")"""
+    if not raw:
+        return {}
+    try:
+        names = ast.literal_eval(raw)
+        return {int(k): str(v) for k, v in names.items()}
+    except (ValueError, SyntaxError, AttributeError):
+        return {}
+
+
+class UltralyticsBackend:
+    """PyTorch inference through ultralytics.YOLO"""
+
+    name = "ultralytics"
+
+    def __init__(self, model_path, threads=2):
+        import torch
+        from ultralytics import YOLO
+
+        torch.set_num_threads(threads)
+        self.model_path = model_path
+        # Load model with CPU device explicitly (PyTorch 2.0.1 defaults to weights_only=False)
+        self.model = YOLO(model_path)
+        self.model.to('cpu')  # Ensure CPU inference
+        self.names = self.model.names
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.7, max_det=100):
+        if len(images) == 1:
+            source = images[0]
+        else:
+            # Batched frames must share one shape; images are already <= imgsz so ratio is 1
+            source = [letterbox(image, imgsz)[0] for image in images]
+        results = self.model.predict(
+            source=source,
+            imgsz=imgsz,
+            conf=conf,
+            iou=iou,
+            verbose=False,
+            device='cpu',
+            half=False,  # Disable half precision for CPU
+            augment=False,  # Disable augmentation for speed
+            agnostic_nms=False,  # Standard NMS
+            max_det=max_det  # Limit detections for memory
+        )
+        return [
+            r.boxes.data[:, :6].cpu().numpy().astype(np.float32) if r.boxes is not None else EMPTY_DETECTIONS
+            for r in results
+        ]
+
+
+class OnnxRuntimeBackend:
+    """ONNX Runtime session with vectorized NumPy pre/post-processing"""
+
+    name = "onnxruntime"
+
+    def __init__(self, model_path, threads=2):
+        self.model_path = model_path
+        self.threads = threads
+        self._load()
+
+    def _load(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.intra_op_num_threads = self.threads
+        options.inter_op_num_threads = 1
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(self.model_path, sess_options=options, providers=['CPUExecutionProvider'])
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        self._set_input_shape(model_input.shape)
+        self.names = parse_names(self.session.get_modelmeta().custom_metadata_map.get('names'))
+
+    def _set_input_shape(self, shape):
+        """Record input size and whether the graph accepts more than one image per run"""
+        batch, _, height, _ = shape
+        self.input_size = height if isinstance(height, int) else 640
+        self.dynamic_batch = not isinstance(batch, int) or batch != 1
+
+    def _run(self, blob):
+        return self.session.run(None, {self.input_name: blob})[0]
+
+    def preprocess(self, images):
+        """Letterbox, BGR->RGB, HWC->CHW and scale to [0, 1] as one float32 batch"""
+        padded, ratios = zip(*(letterbox(image, self.input_size) for image in images))
+        blob = np.stack(padded)[..., ::-1].transpose(0, 3, 1, 2)
+        blob = np.ascontiguousarray(blob, dtype=np.float32) / 255.0
+        return blob, ratios
+
+    def predict(self, images, imgsz=640, conf=0.25, iou=0.7, max_det=100):
+        blob, ratios = self.preprocess(images)
+        if self.dynamic_batch:
+            output = self._run(blob)
+        else:
+            output = np.concatenate([self._run(blob[i:i + 1]) for i in range(len(blob))])
+        results = postprocess_yolov8(output, conf, iou, max_det)
+        for dets, ratio in zip(results, ratios):
+            if ratio != 1.0:
+                dets[:, :4] /= ratio
+        return results
+
+
+class OpenVinoBackend(OnnxRuntimeBackend):
+    """OpenVINO runtime on an ONNX graph, sharing the NumPy pre/post-processing"""
+
+    name = "openvino"
+
+    def _load(self):
+        import onnx
+        from openvino.runtime import Core
+
+        core = Core()
+        model = core.read_model(self.model_path)
+        self.compiled = core.compile_model(model, 'CPU', {
+            "INFERENCE_NUM_THREADS": str(self.threads),
+            "PERFORMANCE_HINT": "LATENCY",
+        })
+        self.output = self.compiled.output(0)
+        self._set_input_shape([
+            d.get_length() if d.is_static else None for d in model.input(0).get_partial_shape()
+        ])
+        metadata = onnx.load(self.model_path, load_external_data=False).metadata_props
+        self.names = parse_names({p.key: p.value for p in metadata}.get('names'))
+
+    def _run(self, blob):
+        return self.compiled([blob])[self.output]
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVinoBackend.name: OpenVinoBackend,
+}
+
+
+def default_backend(model_path, onnx_backend="onnxruntime"):
+    """Backend name used for a model file when the request does not pick one"""
+    if os.path.splitext(model_path)[1] == '.onnx':
+        return onnx_backend
+    return UltralyticsBackend.name
+
+
+def create_backend(model_path, backend=None, threads=2, onnx_backend="onnxruntime"):
+    """Instantiate the named backend (or the default one for the file type)"""
+    backend = backend or default_backend(model_path, onnx_backend)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Available: {', '.join(BACKENDS)}")
+    if backend != UltralyticsBackend.name and not model_path.endswith('.onnx'):
+        raise ValueError(f"Backend '{backend}' requires an .onnx model")
+    return BACKENDS[backend](model_path, threads=threads)
@@ -0,0 +1,458 @@
+"""Reproducible benchmark for the YOLO API inference pipeline
+
+Runs offline, in the container or next to the backend, against the same
+functions the API uses:
+
+- pipeline: one frame at a time through decode, resize, predict,
+  post-process, annotate + JPEG encode, disk write and JSON, timing every
+  stage (per-stage p50/p90/p99)
+- route: /api/inference through Flask's test client (or a live server with
+  --url) with N concurrent clients, reporting throughput and latency
+
+Frame sources (--source):
+
+- synthetic (default): seeded frames with shapes and noise at --resolution
+- a video file, an image file or a folder of images: recorded frames
+- capture:<url or file>: frames from the RTSP capture sessions; a local
+  video file is looped in real time, standing in for a camera
+
+Results, including peak RSS and the settings that affect speed (model,
+backend, threads, batching, resolution), are written as JSON so runs can
+be compared with the compare command:
+
+    python benchmark.py run --model yolov8n.onnx --clients 1,2,4 --output n150-onnx.json
+    python benchmark.py compare baseline.json n150-onnx.json
+
+Settings read from the environment by the API (TORCH_NUM_THREADS,
+INFERENCE_WORKERS, MAX_BATCH_SIZE, ...) can be overridden with --threads,
+--workers and --batch; they are applied before the API module is imported.
+The in-process API reads models from --models-dir and writes its results
+to --results-dir (a temporary folder by default) with the detection
+history off, so a benchmark never adds to the real results or history.
+"""
+import argparse
+import io
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+STAGES = ('decode', 'resize', 'predict', 'postprocess', 'encode', 'disk_write', 'json')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.bmp')
+VIDEO_EXTENSIONS = ('.mp4', '.mkv', '.avi', '.mov', '.ts')
+
+
+def percentiles(samples):
+    """Summary of millisecond samples"""
+    if not samples:
+        return None
+    values = np.asarray(samples, dtype=np.float64)
+    return {
+        "n": len(values),
+        "mean": round(float(values.mean()), 2),
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p90": round(float(np.percentile(values, 90)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "max": round(float(values.max()), 2),
+    }
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far"""
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def synthetic_frames(count, width, height, seed):
+    """Deterministic camera-like frames: gradient background, filled shapes, sensor noise"""
+    rng = np.random.default_rng(seed)
+    base = np.linspace(40, 200, width, dtype=np.float32)[None, :, None].repeat(height, 0).repeat(3, 2)
+    frames = []
+    for _ in range(count):
+        frame = base.copy()
+        for _ in range(int(rng.integers(3, 9))):
+            x, y = int(rng.integers(0, width - 40)), int(rng.integers(0, height - 40))
+            w, h = int(rng.integers(20, width // 4)), int(rng.integers(40, height // 3))
+            color = rng.integers(0, 255, 3).tolist()
+            cv2.rectangle(frame, (x, y), (x + w, y + h), color, -1)
+        frame += rng.normal(0, 6, frame.shape).astype(np.float32)
+        frames.append(frame.clip(0, 255).astype(np.uint8))
+    return frames
+
+
+def recorded_frames(path, count):
+    """Up to count frames from a video file, an image or a folder of images"""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        frames = [cv2.imread(os.path.join(path, n)) for n in names[:count]]
+    elif path.lower().endswith(VIDEO_EXTENSIONS):
+        capture = cv2.VideoCapture(path)
+        frames = []
+        while len(frames) < count:
+            ok, frame = capture.read()
+            if not ok:
+                break
+            frames.append(frame)
+        capture.release()
+    else:
+        frames = [cv2.imread(path)]
+    frames = [f for f in frames if f is not None]
+    if not frames:
+        raise SystemExit(f"No frames could be read from {path}")
+    # Repeat short recordings so every run sees the same number of frames
+    return [frames[i % len(frames)] for i in range(count)]
+
+
+def encode_frames(frames, quality=90):
+    """Frames as the JPEG bytes a client would upload"""
+    return [cv2.imencode('.jpg', f, [cv2.IMWRITE_JPEG_QUALITY, quality])[1].tobytes() for f in frames]
+
+
+class FrameSource:
+    """Encoded frames in memory, or frames read live from a capture session"""
+
+    def __init__(self, args, api):
+        self.api = api
+        self.capture_url = args.source[len('capture:'):] if args.source.startswith('capture:') else None
+        if self.capture_url:
+            self.description = {"type": "capture", "url": self.capture_url}
+            self.jpegs = None
+            return
+        width, height = (int(v) for v in args.resolution.lower().split('x'))
+        if args.source == 'synthetic':
+            frames = synthetic_frames(args.frames, width, height, args.seed)
+            self.description = {"type": "synthetic", "resolution": args.resolution, "seed": args.seed}
+        else:
+            frames = recorded_frames(args.source, args.frames)
+            h, w = frames[0].shape[:2]
+            self.description = {"type": "recorded", "path": args.source, "resolution": f"{w}x{h}"}
+        self.jpegs = encode_frames(frames)
+        self.description["frames"] = len(self.jpegs)
+
+    def jpeg(self, i):
+        if self.jpegs:
+            return self.jpegs[i % len(self.jpegs)]
+        image, error = self.api.fetch_rtsp_frame(self.capture_url)
+        if image is None:
+            raise RuntimeError(error or "Capture returned no frame")
+        return encode_frames([image])[0]
+
+
+def run_pipeline(api, source, model_name, backend, count, warmup):
+    """Time each stage of the single-image path, one frame at a time"""
+    from detections import from_array, to_list
+    from rendering import draw_detections, encode_jpeg
+    from result_store import ResultStore
+
+    model_path = os.path.join(api.MODELS_DIR, model_name)
+    model = api.load_model(model_path, backend)
+    if model is None:
+        raise SystemExit(f"Could not load {model_path}")
+    samples = {stage: [] for stage in STAGES + ('capture', 'total')}
+    with tempfile.TemporaryDirectory() as results_dir:
+        store = ResultStore(results_dir, os.path.join(results_dir, 'index.sqlite3'), max_age_days=0, max_count=0, max_mb=0)
+        for i in range(warmup + count):
+            timings = {}
+            mark = time.perf_counter()
+
+            def lap(stage):
+                nonlocal mark
+                now = time.perf_counter()
+                timings[stage] = (now - mark) * 1000
+                mark = now
+
+            if source.capture_url:
+                image, error = api.fetch_rtsp_frame(source.capture_url)
+                if image is None:
+                    raise SystemExit(f"Capture failed: {error}")
+                lap('capture')
+            else:
+                image = cv2.imdecode(np.frombuffer(source.jpeg(i), np.uint8), cv2.IMREAD_COLOR)
+                lap('decode')
+            image = api.resize_for_inference(image)
+            lap('resize')
+            with model.lock:
+                dets = model.predict([image], **api.PREDICT_ARGS)[0]
+            lap('predict')
+            arr = from_array(dets, image.shape)
+            detections = to_list(arr, model.class_lookup)
+            lap('postprocess')
+            jpeg_bytes = encode_jpeg(draw_detections(image, arr, model.class_lookup), api.JPEG_QUALITY)
+            lap('encode')
+            store.save(str(uuid.uuid4()), jpeg_bytes, detections, model_name)
+            lap('disk_write')
+            json.dumps({"detections": detections, "image_url": "/api/results/x.jpg"})
+            lap('json')
+            if i >= warmup:
+                for stage, ms in timings.items():
+                    samples[stage].append(ms)
+                samples['total'].append(sum(timings.values()))
+    return {stage: percentiles(values) for stage, values in samples.items() if values}
+
+
+def _multipart(fields, jpeg):
+    boundary = uuid.uuid4().hex
+    body = io.BytesIO()
+    for key, value in fields.items():
+        body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="{key}"\r\n\r\n{value}\r\n'.encode())
+    body.write(f'--{boundary}\r\nContent-Disposition: form-data; name="image"; filename="frame.jpg"\r\n'
+               f'Content-Type: image/jpeg\r\n\r\n'.encode())
+    body.write(jpeg)
+    body.write(f'\r\n--{boundary}--\r\n'.encode())
+    return body.getvalue(), f'multipart/form-data; boundary={boundary}'
+
+
+def make_client(api, url):
+    """post(fields, jpeg) -> HTTP status, against a live server or the in-process app"""
+    if url:
+        def post(fields, jpeg):
+            body, content_type = _multipart(fields, jpeg)
+            req = urllib.request.Request(url.rstrip('/') + '/api/inference', data=body,
+                                         headers={'Content-Type': content_type})
+            try:
+                with urllib.request.urlopen(req, timeout=120) as response:
+                    response.read()
+                    return response.status
+            except urllib.error.HTTPError as e:
+                return e.code
+        return post
+
+    client = api.app.test_client()
+
+    def post(fields, jpeg):
+        data = dict(fields, image=(io.BytesIO(jpeg), 'frame.jpg'))
+        response = client.post('/api/inference', data=data, content_type='multipart/form-data')
+        response.close()
+        return response.status_code
+    return post
+
+
+def server_status(url):
+    """/api/status of a live server (its settings and RSS), or None"""
+    try:
+        with urllib.request.urlopen(url.rstrip('/') + '/api/status', timeout=10) as response:
+            return json.load(response)
+    except (OSError, ValueError):
+        return None
+
+
+def run_route(api, source, url, model_name, backend, clients, requests_per_client, response_mode, warmup):
+    """Closed-loop load: each client sends its next request as soon as the previous one returns"""
+    # Frames repeat across passes; bypass the result cache so every request runs inference
+    fields = {"model": model_name, "response": response_mode, "cache": "false"}
+    if url:
+        # A live server's results folder cannot be swapped out; do not fill it with benchmark frames
+        fields["save"] = "false"
+    if backend:
+        fields["backend"] = backend
+    warm = make_client(api, url)
+    for i in range(warmup):
+        warm(fields, source.jpeg(i))
+
+    latencies, statuses = [], {}
+    lock = threading.Lock()
+
+    def worker(index):
+        post = make_client(api, url)
+        for n in range(requests_per_client):
+            jpeg = source.jpeg(index * requests_per_client + n)
+            started = time.perf_counter()
+            status = post(fields, jpeg)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                if status == 200:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.perf_counter() - started
+    result = {
+        "clients": clients,
+        "requests": clients * requests_per_client,
+        "seconds": round(wall, 2),
+        "throughput_rps": round(len(latencies) / wall, 2),
+        "status_codes": {str(k): v for k, v in sorted(statuses.items())},
+        "latency_ms": percentiles(latencies),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+    if url:
+        # Client-side RSS says nothing about the server; report the server's current RSS too
+        status = server_status(url)
+        result["server_rss_mb"] = status and status.get("memory_usage_mb")
+    return result
+
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def cmd_run(args):
+    if args.threads:
+        for var in ('TORCH_NUM_THREADS', 'OMP_NUM_THREADS', 'MKL_NUM_THREADS'):
+            os.environ[var] = str(args.threads)
+    if args.workers:
+        os.environ['INFERENCE_WORKERS'] = str(args.workers)
+    if args.batch:
+        os.environ['MAX_BATCH_SIZE'] = str(args.batch)
+    # Warm-up is measured separately; keep it out of model loading
+    os.environ.setdefault('WARMUP_RUNS', '0')
+    # Saved results and history go to a throwaway folder, not the API's real ones
+    results_dir = args.results_dir or tempfile.mkdtemp(prefix='yolo-bench-')
+    os.environ['MODELS_DIR'] = args.models_dir
+    os.environ['RESULTS_DIR'] = results_dir
+    os.environ['UPLOADS_DIR'] = os.path.join(results_dir, 'uploads')
+    os.environ['HISTORY_ENABLED'] = 'false'
+
+    import app as api
+
+    source = FrameSource(args, api)
+    if source.capture_url and args.url:
+        raise SystemExit("capture: sources are read in-process; they cannot be combined with --url")
+    report = {
+        "timestamp": datetime.now().isoformat(),
+        "git_revision": git_revision(),
+        "host": {
+            "machine": platform.machine(),
+            "processor": platform.processor() or None,
+            "cpu_count": os.cpu_count(),
+            "python": platform.python_version(),
+        },
+        "settings": {
+            "model": args.model,
+            "backend": args.backend or api.default_backend(os.path.join(api.MODELS_DIR, args.model), api.ONNX_BACKEND),
+            "inference_threads": api.INFERENCE_THREADS,
+            "inference_workers": api.INFERENCE_WORKERS,
+            "max_batch_size": api.MAX_BATCH_SIZE,
+            "batch_window_ms": api.BATCH_WINDOW_MS,
+            "inference_size": api.INFERENCE_SIZE,
+            "jpeg_quality": api.JPEG_QUALITY,
+            "response": args.response,
+            "url": args.url,
+        },
+        "source": source.description,
+    }
+    if args.url:
+        # Settings above are this process's environment; the server's own are in its status
+        report["server_status"] = server_status(args.url)
+
+    count = args.frames if not source.capture_url else args.capture_frames
+    if 'pipeline' in args.modes and not args.url:
+        print(f"Pipeline: {count} frames after {args.warmup} warm-up", file=sys.stderr)
+        report["pipeline"] = run_pipeline(api, source, args.model, args.backend, count, args.warmup)
+        report["pipeline_peak_rss_mb"] = peak_rss_mb()
+    if 'route' in args.modes:
+        report["route"] = []
+        for clients in args.clients:
+            print(f"Route: {clients} client(s) x {args.requests} requests", file=sys.stderr)
+            report["route"].append(run_route(api, source, args.url, args.model, args.backend, clients,
+                                             args.requests, args.response, args.warmup))
+    report["peak_rss_mb"] = peak_rss_mb()
+
+    text = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(text)
+    if source.capture_url:
+        api.capture_manager.close_all()
+    if not args.results_dir:
+        shutil.rmtree(results_dir, ignore_errors=True)
+
+
+def _change(old, new):
+    if old in (None, 0) or new is None:
+        return ''
+    return f"{(new - old) / old * 100:+.1f}%"
+
+
+def cmd_compare(args):
+    """Print p50/p90 per stage and throughput per client count side by side"""
+    with open(args.baseline) as f:
+        old = json.load(f)
+    with open(args.candidate) as f:
+        new = json.load(f)
+    print(f"{'':24}{'baseline':>20}{'candidate':>20}{'change':>10}")
+    for stage in list(STAGES) + ['capture', 'total']:
+        a, b = (old.get('pipeline') or {}).get(stage), (new.get('pipeline') or {}).get(stage)
+        if not a and not b:
+            continue
+        for key in ('p50', 'p90'):
+            va, vb = a and a[key], b and b[key]
+            print(f"{stage + ' ' + key + ' ms':24}{va if va is not None else '-':>20}"
+                  f"{vb if vb is not None else '-':>20}{_change(va, vb):>10}")
+    runs = {r['clients']: r for r in old.get('route') or []}
+    for run in new.get('route') or []:
+        base = runs.get(run['clients'], {})
+        for key, label in (('throughput_rps', 'req/s'), ('latency_ms', 'p90 ms')):
+            va, vb = base.get(key), run.get(key)
+            if key == 'latency_ms':
+                va, vb = va and va['p90'], vb and vb['p90']
+            print(f"{str(run['clients']) + ' clients ' + label:24}{va if va is not None else '-':>20}"
+                  f"{vb if vb is not None else '-':>20}{_change(va, vb):>10}")
+    print(f"{'peak RSS MB':24}{old.get('peak_rss_mb', '-'):>20}{new.get('peak_rss_mb', '-'):>20}"
+          f"{_change(old.get('peak_rss_mb'), new.get('peak_rss_mb')):>10}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help="Benchmark the pipeline and/or the /api/inference route")
+    run.add_argument('--model', required=True, help="Model file in the models folder")
+    run.add_argument('--models-dir', default=os.environ.get('MODELS_DIR', '/app/models'),
+                     help="Models folder (default: MODELS_DIR or /app/models)")
+    run.add_argument('--results-dir', help="Where the in-process API saves results (default: a temporary folder)")
+    run.add_argument('--backend', help="ultralytics, onnxruntime or openvino (default: by file type)")
+    run.add_argument('--source', default='synthetic',
+                     help="synthetic, a video/image file or folder, or capture:<rtsp url or video file>")
+    run.add_argument('--resolution', default='1920x1080', help="Synthetic frame size WxH")
+    run.add_argument('--frames', type=int, default=50, help="Frames per pipeline run / in the frame pool")
+    run.add_argument('--capture-frames', type=int, default=20, help="Frames to read from a capture source")
+    run.add_argument('--seed', type=int, default=0)
+    run.add_argument('--warmup', type=int, default=3, help="Untimed iterations before measuring")
+    run.add_argument('--modes', default='pipeline,route', type=lambda v: v.split(','))
+    run.add_argument('--clients', default='1,2,4', type=lambda v: [int(c) for c in v.split(',')],
+                     help="Concurrent client counts for the route benchmark")
+    run.add_argument('--requests', type=int, default=20, help="Requests per client")
+    run.add_argument('--response', default='inline', help="Response mode sent to /api/inference")
+    run.add_argument('--url', help="Benchmark a running server instead of the in-process app")
+    run.add_argument('--threads', type=int, help="Override TORCH_NUM_THREADS/OMP_NUM_THREADS")
+    run.add_argument('--workers', type=int, help="Override INFERENCE_WORKERS")
+    run.add_argument('--batch', type=int, help="Override MAX_BATCH_SIZE")
+    run.add_argument('--output', help="Write the JSON report here instead of stdout")
+    run.set_defaults(func=cmd_run)
+
+    compare = sub.add_parser('compare', help="Compare two JSON reports")
+    compare.add_argument('baseline')
+    compare.add_argument('candidate')
+    compare.set_defaults(func=cmd_compare)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
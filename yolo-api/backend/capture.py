@@ -0,0 +1,408 @@
+"""RTSP capture sessions for the YOLO API
+
+Opening an RTSP stream costs a handshake plus a wait for the next keyframe,
+which is 1-3 s on typical IP cameras. Instead of paying that on every
+inference request, each RTSP URL gets one long-lived reader thread that keeps
+only the latest decoded frame. Sessions reconnect with backoff when the
+stream drops and are closed after sitting idle for a configurable TTL.
+
+Decoding a 4K main stream at full resolution is the largest CPU cost of a
+watched camera, so a session can instead decode through an ffmpeg
+subprocess that scales frames down inside the decoder pipeline, decodes
+keyframes only (enough when sampling at about 1 FPS or less), or uses VAAPI
+on an Intel iGPU. Every step degrades gracefully: a substream that will not
+open falls back to the main stream, VAAPI falls back to CPU ffmpeg, and a
+missing ffmpeg binary falls back to OpenCV.
+"""
+import os
+import re
+import select
+import shutil
+import subprocess
+import threading
+import time
+from collections import deque, namedtuple
+
+import cv2
+import numpy as np
+
+# decoder: "auto" (ffmpeg when it can save work, else OpenCV), "ffmpeg" or "opencv"
+# size: longest side of decoded frames, 0 for full resolution
+# hwaccel: "none", "vaapi" or "auto" (VAAPI when a render node exists)
+DecodeOptions = namedtuple('DecodeOptions', ['decoder', 'size', 'keyframes_only', 'hwaccel', 'substream_url'],
+                           defaults=('auto', 0, False, 'none', None))
+
+VAAPI_DEVICE = os.environ.get('VAAPI_DEVICE', '/dev/dri/renderD128')
+
+# Main-stream -> substream URL rewrites for common camera firmwares
+SUBSTREAM_PATTERNS = [
+    (re.compile(r'(/Streaming/Channels/\d+)01\b', re.I), r'\g<1>02'),  # Hikvision
+    (re.compile(r'([?&]subtype=)0\b'), r'\g<1>1'),  # Dahua / Amcrest
+    (re.compile(r'(/h264Preview_\d+_)main\b'), r'\g<1>sub'),  # Reolink
+    (re.compile(r'/stream1\b'), '/stream2'),  # TP-Link Tapo
+]
+
+
+def guess_substream(url):
+    """Substream URL for known camera URL layouts, or None"""
+    for pattern, replacement in SUBSTREAM_PATTERNS:
+        candidate = pattern.sub(replacement, url, count=1)
+        if candidate != url:
+            return candidate
+    return None
+
+
+def _is_network(url):
+    return '://' in url and not url.startswith('file:')
+
+
+class FfmpegReader:
+    """cv2.VideoCapture-like reader over an ffmpeg subprocess that writes raw BGR frames"""
+
+    _SIZE_RE = re.compile(r'Video: rawvideo.*?, (\d{2,5})x(\d{2,5})')
+
+    def __init__(self, url, size=0, keyframes_only=False, vaapi_device=None, open_timeout=10, read_timeout=5):
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.width = self.height = None
+        self._size_known = threading.Event()
+        self._log = deque(maxlen=20)
+
+        cmd = ['ffmpeg', '-hide_banner', '-nostdin', '-loglevel', 'info']
+        if _is_network(url):
+            if url.startswith('rtsp'):
+                cmd += ['-rtsp_transport', 'tcp']
+            cmd += ['-timeout', str(int(open_timeout * 1_000_000))]
+        else:
+            # Local file test source: play in real time, forever
+            cmd += ['-re', '-stream_loop', '-1']
+        if keyframes_only:
+            cmd += ['-skip_frame', 'nokey']
+        filters = []
+        if vaapi_device:
+            cmd += ['-hwaccel', 'vaapi', '-hwaccel_device', vaapi_device, '-hwaccel_output_format', 'vaapi']
+            if size:
+                filters.append(f'scale_vaapi=w={size}:h={size}:force_original_aspect_ratio=decrease')
+            filters += ['hwdownload', 'format=nv12']
+        elif size:
+            filters.append(f'scale={size}:{size}:force_original_aspect_ratio=decrease')
+        cmd += ['-i', url, '-an', '-sn', '-dn']
+        if filters:
+            cmd += ['-vf', ','.join(filters)]
+        # Passthrough: never duplicate frames to fill a constant rate
+        cmd += ['-vsync', '0', '-f', 'rawvideo', '-pix_fmt', 'bgr24', 'pipe:1']
+
+        self._proc = subprocess.Popen(cmd, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE,
+                                      stderr=subprocess.PIPE, bufsize=0)
+        threading.Thread(target=self._read_log, name=f"ffmpeg-log-{self._proc.pid}", daemon=True).start()
+
+    def _read_log(self):
+        """Collect stderr and pick the output frame size from the stream summary"""
+        for raw in iter(self._proc.stderr.readline, b''):
+            line = raw.decode(errors='replace').rstrip()
+            self._log.append(line)
+            if not self._size_known.is_set():
+                match = self._SIZE_RE.search(line)
+                if match:
+                    self.width, self.height = int(match.group(1)), int(match.group(2))
+                    self._size_known.set()
+        self._size_known.set()  # Process ended; wake anyone waiting
+
+    def last_error(self):
+        errors = [line for line in self._log if 'rror' in line or 'nvalid' in line or 'failed' in line]
+        return (errors or list(self._log) or ["ffmpeg exited"])[-1]
+
+    def isOpened(self):
+        """Wait for ffmpeg to report the output size, i.e. the stream opened and decodes"""
+        self._size_known.wait(self.open_timeout)
+        return self.width is not None and self._proc.poll() is None
+
+    def read(self):
+        frame_bytes = self.width * self.height * 3
+        buffer = bytearray(frame_bytes)
+        view = memoryview(buffer)
+        got = 0
+        while got < frame_bytes:
+            ready, _, _ = select.select([self._proc.stdout], [], [], self.read_timeout)
+            if not ready:
+                return False, None
+            n = self._proc.stdout.readinto(view[got:])
+            if not n:
+                return False, None
+            got += n
+        return True, np.frombuffer(buffer, dtype=np.uint8).reshape(self.height, self.width, 3)
+
+    def release(self):
+        if self._proc.poll() is None:
+            self._proc.terminate()
+            try:
+                self._proc.wait(timeout=2)
+            except subprocess.TimeoutExpired:
+                self._proc.kill()
+                self._proc.wait()
+        self._proc.stdout.close()
+
+
+class CaptureSession:
+    """Background reader holding the latest frame of a single RTSP stream"""
+
+    def __init__(self, url, open_timeout=10, read_timeout=5, max_backoff=30, options=None):
+        self.url = url
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.max_backoff = max_backoff
+        self.options = options or DecodeOptions()
+        self.decoder = None  # What actually opened: "opencv", "ffmpeg" or "ffmpeg-vaapi"
+        self.substream = False
+        self._vaapi_failed = False
+
+        self._cond = threading.Condition()
+        self._frame = None
+        self._frame_time = 0.0
+        self._frame_seq = 0
+        self._error = None
+        self._stop = threading.Event()
+
+        self.created = time.monotonic()
+        self.last_access = self.created
+        self.reconnects = 0
+        self.frames_read = 0
+
+        self._thread = threading.Thread(target=self._run, name=f"capture-{id(self):x}", daemon=True)
+        self._thread.start()
+
+    def _open_opencv(self, url):
+        """Open the stream with connect/read timeouts and a minimal buffer"""
+        cap = cv2.VideoCapture(url, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, int(self.open_timeout * 1000),
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, int(self.read_timeout * 1000),
+        ])
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)  # Reduce buffer for N150
+        return cap
+
+    def _decoders(self):
+        """Decoders to try in order of preference"""
+        opts = self.options
+        wants_ffmpeg = opts.decoder == 'ffmpeg' or (
+            opts.decoder == 'auto' and (opts.size or opts.keyframes_only or opts.hwaccel != 'none'))
+        decoders = []
+        if wants_ffmpeg and shutil.which('ffmpeg'):
+            vaapi = opts.hwaccel == 'vaapi' or (opts.hwaccel == 'auto' and os.path.exists(VAAPI_DEVICE))
+            if vaapi and not self._vaapi_failed:
+                decoders.append('ffmpeg-vaapi')
+            decoders.append('ffmpeg')
+        decoders.append('opencv')
+        return decoders
+
+    def _open(self):
+        """Open the first working (url, decoder) pair: substream before main stream, GPU before CPU"""
+        urls = [self.options.substream_url, self.url] if self.options.substream_url else [self.url]
+        last = None
+        for url in urls:
+            for decoder in self._decoders():
+                if decoder == 'opencv':
+                    cap = self._open_opencv(url)
+                else:
+                    cap = FfmpegReader(url, size=self.options.size, keyframes_only=self.options.keyframes_only,
+                                       vaapi_device=VAAPI_DEVICE if decoder == 'ffmpeg-vaapi' else None,
+                                       open_timeout=self.open_timeout, read_timeout=self.read_timeout)
+                if cap.isOpened():
+                    self.decoder, self.substream = decoder, url != self.url
+                    return cap
+                if decoder == 'ffmpeg-vaapi':
+                    print(f"VAAPI decode unavailable ({cap.last_error()}), falling back to CPU")
+                    self._vaapi_failed = True
+                cap.release()
+                last = cap
+        return last
+
+    def _set_error(self, message):
+        with self._cond:
+            self._error = message
+            self._cond.notify_all()
+
+    def _run(self):
+        """Reader loop: keep decoding so the held frame is always the newest one"""
+        backoff = 1
+        while not self._stop.is_set():
+            cap = None
+            try:
+                cap = self._open()
+                if not cap.isOpened():
+                    self._set_error("Cannot open RTSP stream")
+                else:
+                    while not self._stop.is_set():
+                        ret, frame = cap.read()
+                        if not ret:
+                            self._set_error("Failed to read frame from RTSP stream")
+                            break
+                        with self._cond:
+                            # Replace, never mutate: readers may still hold the previous frame
+                            self._frame = frame
+                            self._frame_time = time.monotonic()
+                            self._frame_seq += 1
+                            self._error = None
+                            self._cond.notify_all()
+                        self.frames_read += 1
+                        backoff = 1
+            except Exception as e:
+                self._set_error(str(e))
+            finally:
+                if cap is not None:
+                    cap.release()
+
+            if self._stop.is_set():
+                break
+            self.reconnects += 1
+            self._stop.wait(backoff)
+            backoff = min(backoff * 2, self.max_backoff)
+
+    def read(self, timeout=10, max_age=5.0):
+        """Return (frame, error) with the latest frame no older than max_age seconds.
+
+        The returned array is shared with other readers and must not be
+        modified in place.
+        """
+        frame, _, error = self._wait_frame(-1, timeout, max_age)
+        return frame, error
+
+    def _wait_frame(self, after_seq, timeout, max_age):
+        """(frame, seq, error) for the newest frame with seq > after_seq and no older than max_age"""
+        self.last_access = time.monotonic()
+        deadline = self.last_access + timeout
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                if self._frame is not None and self._frame_seq > after_seq and now - self._frame_time <= max_age:
+                    return self._frame, self._frame_seq, None
+                # Fail fast if the stream is down and we have nothing fresh to give
+                if self._error is not None:
+                    return None, None, self._error
+                remaining = deadline - now
+                if remaining <= 0:
+                    return None, None, "Timed out waiting for RTSP frame"
+                self._cond.wait(remaining)
+
+    def read_sequence(self, count, interval, timeout=10, max_age=5.0):
+        """Return (frames, error) with count distinct frames sampled interval seconds apart.
+
+        Stops early on a stream error; frames read so far are still returned.
+        """
+        frames = []
+        last_seq = -1
+        next_at = time.monotonic()
+        for _ in range(count):
+            delay = next_at - time.monotonic()
+            if delay > 0 and self._stop.wait(delay):
+                break
+            frame, last_seq_read, error = self._wait_frame(last_seq, timeout, max_age)
+            if frame is None:
+                return frames, error
+            frames.append(frame)
+            last_seq = last_seq_read
+            next_at = max(next_at + interval, time.monotonic())
+        return frames, None
+
+    def close(self):
+        """Stop the reader thread; the capture is released by the thread itself"""
+        self._stop.set()
+        with self._cond:
+            self._cond.notify_all()
+
+    @property
+    def alive(self):
+        return self._thread.is_alive()
+
+    def info(self):
+        """Session summary for the status endpoint"""
+        now = time.monotonic()
+        with self._cond:
+            frame_age = round(now - self._frame_time, 2) if self._frame is not None else None
+            error = self._error
+        return {
+            "decoder": self.decoder,
+            "substream": self.substream,
+            "decode_size": self.options.size or None,
+            "keyframes_only": self.options.keyframes_only,
+            "frames_read": self.frames_read,
+            "reconnects": self.reconnects,
+            "frame_age_s": frame_age,
+            "idle_s": round(now - self.last_access, 1),
+            "error": error,
+        }
+
+
+class CaptureManager:
+    """Owns one CaptureSession per RTSP URL and closes sessions left idle"""
+
+    def __init__(self, idle_ttl=120, open_timeout=10, read_timeout=5, max_age=5.0):
+        self.idle_ttl = idle_ttl
+        self.open_timeout = open_timeout
+        self.read_timeout = read_timeout
+        self.max_age = max_age
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+
+    def _ensure_reaper(self):
+        if self._reaper is None or not self._reaper.is_alive():
+            self._reaper = threading.Thread(target=self._reap_loop, name="capture-reaper", daemon=True)
+            self._reaper.start()
+
+    def _reap_loop(self):
+        interval = max(1, min(10, self.idle_ttl / 4))
+        while True:
+            time.sleep(interval)
+            self.reap_idle()
+
+    def reap_idle(self):
+        """Close sessions nobody has read from within idle_ttl"""
+        now = time.monotonic()
+        with self._lock:
+            idle = [key for key, s in self._sessions.items() if now - s.last_access > self.idle_ttl]
+            sessions = [self._sessions.pop(key) for key in idle]
+        for session in sessions:
+            session.close()
+        return len(sessions)
+
+    def session(self, url, options=None):
+        """Get or start the session for url decoded with options"""
+        key = (url, options or DecodeOptions())
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None or not session.alive:
+                session = CaptureSession(url, open_timeout=self.open_timeout, read_timeout=self.read_timeout,
+                                         options=key[1])
+                self._sessions[key] = session
+            self._ensure_reaper()
+            return session
+
+    def get_frame(self, url, timeout=10, options=None):
+        """Return (frame, error) with the latest frame for url"""
+        return self.session(url, options).read(timeout=timeout, max_age=self.max_age)
+
+    def get_sequence(self, url, count, interval, timeout=10, options=None):
+        """Return (frames, error) with count frames of url sampled interval seconds apart"""
+        return self.session(url, options).read_sequence(count, interval, timeout=timeout, max_age=self.max_age)
+
+    def close(self, url):
+        """Close every session reading url, whatever its decode options"""
+        with self._lock:
+            keys = [key for key in self._sessions if key[0] == url]
+            sessions = [self._sessions.pop(key) for key in keys]
+        for session in sessions:
+            session.close()
+        return bool(sessions)
+
+    def close_all(self):
+        with self._lock:
+            sessions = list(self._sessions.values())
+            self._sessions.clear()
+        for session in sessions:
+            session.close()
+
+    def stats(self):
+        """Session summaries without URLs so camera credentials are not exposed"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+        return {"active_sessions": len(sessions), "sessions": [s.info() for s in sessions]}
@@ -0,0 +1,85 @@
+"""Detection arrays for the YOLO API
+
+Backends return plain (N, 6) float arrays. They are converted once, in bulk,
+into a structured NumPy array with named fields and a relative area column;
+filtering, tracking and zone logic operate on that array, and only the final
+response is turned into a list of dicts.
+"""
+import numpy as np
+
+DETECTION_DTYPE = np.dtype([
+    ('x1', np.float32),
+    ('y1', np.float32),
+    ('x2', np.float32),
+    ('y2', np.float32),
+    ('confidence', np.float32),
+    ('class_id', np.int32),
+    ('area', np.float32),  # Box area relative to the image area
+])
+
+
+def empty():
+    return np.zeros(0, dtype=DETECTION_DTYPE)
+
+
+def from_array(dets, image_shape):
+    """Build a structured detection array from backend (N, 6) output"""
+    arr = np.empty(len(dets), dtype=DETECTION_DTYPE)
+    if not len(dets):
+        return arr
+    dets = np.asarray(dets, dtype=np.float32)
+    for i, field in enumerate(('x1', 'y1', 'x2', 'y2', 'confidence')):
+        arr[field] = dets[:, i]
+    arr['class_id'] = dets[:, 5].astype(np.int32)
+    img_area = float(image_shape[0] * image_shape[1])
+    arr['area'] = (arr['x2'] - arr['x1']) * (arr['y2'] - arr['y1']) / img_area
+    return arr
+
+
+def boxes(arr):
+    """(N, 4) float view-copy of the xyxy columns"""
+    return np.stack([arr['x1'], arr['y1'], arr['x2'], arr['y2']], axis=1) if len(arr) else np.zeros((0, 4), np.float32)
+
+
+def class_lookup(names):
+    """Array mapping class id -> class name, for vectorized name lookup"""
+    size = max(names) + 1 if names else 0
+    lookup = np.array([str(i) for i in range(size)], dtype=object)
+    for cls, name in names.items():
+        lookup[cls] = name
+    return lookup
+
+
+def class_names(arr, lookup):
+    """Class name per detection; ids outside the lookup fall back to the id"""
+    ids = arr['class_id']
+    known = (ids >= 0) & (ids < len(lookup))
+    if known.all():
+        return lookup[ids]
+    out = ids.astype(str).astype(object)
+    out[known] = lookup[ids[known]]
+    return out
+
+
+def select(arr, min_confidence=None, classes=None, lookup=None):
+    """Filter by confidence and/or class names without leaving array form"""
+    mask = np.ones(len(arr), dtype=bool)
+    if min_confidence is not None:
+        mask &= arr['confidence'] >= min_confidence
+    if classes:
+        mask &= np.isin(class_names(arr, lookup), list(classes))
+    return arr[mask]
+
+
+def to_list(arr, lookup):
+    """Convert to the API's list of detection dicts"""
+    if not len(arr):
+        return []
+    names = class_names(arr, lookup).tolist()
+    confidence = np.round(arr['confidence'].astype(np.float64), 3).tolist()
+    bbox = boxes(arr).astype(np.int32).tolist()
+    area = np.round(arr['area'].astype(np.float64), 4).tolist()
+    return [
+        {"class": n, "confidence": c, "bbox": b, "area": a}
+        for n, c, b, a in zip(names, confidence, bbox, area)
+    ]
@@ -0,0 +1,210 @@
+"""Detection history for the YOLO API
+
+Every analysed frame is appended to a SQLite database (WAL mode) so questions
+like "how many people were at the front door between 8 and 9" can be answered
+without reading result files. Inference threads only put rows on a bounded
+queue; a single writer thread drains it and inserts in batches, one
+transaction per batch, so recording never adds latency to a request. When the
+queue is full, frames are dropped and counted rather than blocking.
+
+Queries aggregate per time bucket, camera and class: detections, frames with
+the class, the most seen in one frame and, for tracked cameras, distinct
+tracks (the closest answer to "how many different people").
+"""
+import queue
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from urllib.parse import urlsplit
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS frames (
+    ts REAL NOT NULL,
+    camera_id TEXT,
+    model TEXT,
+    count INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS frames_camera_ts ON frames (camera_id, ts);
+CREATE INDEX IF NOT EXISTS frames_ts ON frames (ts);
+CREATE TABLE IF NOT EXISTS detections (
+    ts REAL NOT NULL,
+    camera_id TEXT,
+    class TEXT NOT NULL,
+    confidence REAL NOT NULL,
+    track_id INTEGER,
+    x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER
+);
+CREATE INDEX IF NOT EXISTS detections_camera_class_ts ON detections (camera_id, class, ts, confidence);
+CREATE INDEX IF NOT EXISTS detections_class_ts ON detections (class, ts, confidence);
+CREATE INDEX IF NOT EXISTS detections_ts ON detections (ts);
+"""
+
+BUCKET_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+MAX_BUCKETS = 10000
+
+
+def camera_label(rtsp_url):
+    """Camera identity for an RTSP URL without its credentials"""
+    parts = urlsplit(rtsp_url)
+    host = parts.hostname or ''
+    if parts.port:
+        host = f"{host}:{parts.port}"
+    return f"{host}{parts.path}" if host else rtsp_url
+
+
+def parse_bucket(value):
+    """Bucket size in seconds from "900", "15m", "1h" or "1d" """
+    value = str(value).strip().lower()
+    if value[-1:] in BUCKET_UNITS:
+        seconds = float(value[:-1]) * BUCKET_UNITS[value[-1]]
+    else:
+        seconds = float(value)
+    if seconds < 1:
+        raise ValueError("bucket must be at least 1 second")
+    return int(seconds)
+
+
+class DetectionHistory:
+    """Append-only detection log with a batched background writer
+
+    max_age_days of 0 keeps history forever.
+    """
+
+    def __init__(self, db_path, batch_size=500, flush_interval=1.0, max_queue=10000,
+                 max_age_days=90, prune_interval=3600):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_age_days = max_age_days
+        self.prune_interval = prune_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._writer = None
+        self._read_lock = threading.Lock()
+        db = sqlite3.connect(db_path)
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(SCHEMA)
+        db.close()
+        # Readers never wait for the writer in WAL mode
+        self._reader = sqlite3.connect(db_path, check_same_thread=False)
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        if self._writer is None or not self._writer.is_alive():
+            self._writer = threading.Thread(target=self._write_loop, name="history-writer", daemon=True)
+            self._writer.start()
+
+    def record(self, camera_id, model, detections, ts=None):
+        """Queue one analysed frame; never blocks"""
+        ts = time.time() if ts is None else ts
+        rows = [(ts, camera_id, d["class"], d["confidence"], d.get("track_id"), *d["bbox"]) for d in detections]
+        try:
+            self._queue.put_nowait(((ts, camera_id, model, len(detections)), rows))
+        except queue.Full:
+            self.dropped += 1
+
+    def _write_loop(self):
+        db = sqlite3.connect(self.db_path)
+        db.execute("PRAGMA synchronous=NORMAL")
+        next_prune = time.time()
+        while True:
+            batch = []
+            deadline = time.time() + self.flush_interval
+            try:
+                batch.append(self._queue.get(timeout=self.flush_interval))
+                while len(batch) < self.batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                pass
+            try:
+                if batch:
+                    with db:
+                        db.executemany("INSERT INTO frames VALUES (?, ?, ?, ?)", [frame for frame, _ in batch])
+                        db.executemany("INSERT INTO detections VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                       [row for _, rows in batch for row in rows])
+                    self.written += len(batch)
+                if self.max_age_days and time.time() >= next_prune:
+                    next_prune = time.time() + self.prune_interval
+                    self._prune(db)
+            except sqlite3.Error as e:
+                print(f"History write failed: {e}")
+
+    def _prune(self, db):
+        cutoff = time.time() - self.max_age_days * 86400
+        with db:
+            removed = db.execute("DELETE FROM detections WHERE ts < ?", (cutoff,)).rowcount
+            db.execute("DELETE FROM frames WHERE ts < ?", (cutoff,))
+        if removed:
+            print(f"Pruned {removed} history detections older than {self.max_age_days} days")
+
+    def counts(self, since, until, bucket=3600, camera_id=None, class_name=None, min_confidence=0.0):
+        """Time-bucketed counts between since and until (epoch seconds)
+
+        Returns one entry per bucket and camera with the number of frames analysed
+        and, per class: detections, frames containing it, the most seen in one
+        frame, distinct tracks and the best confidence. Buckets are aligned to
+        local time, so 1d buckets start at midnight.
+        """
+        if (until - since) / bucket > MAX_BUCKETS:
+            raise ValueError(f"Too many buckets (max {MAX_BUCKETS}), use a larger bucket")
+        offset = datetime.fromtimestamp(since).astimezone().utcoffset().total_seconds()
+        where = ["ts >= ?", "ts < ?"]
+        args = [since, until]
+        if camera_id:
+            where.append("camera_id = ?")
+            args.append(camera_id)
+        frame_where, frame_args = ' AND '.join(where), list(args)
+        if class_name:
+            where.append("class = ?")
+            args.append(class_name)
+        if min_confidence:
+            where.append("confidence >= ?")
+            args.append(min_confidence)
+        det_where = ' AND '.join(where)
+        bucket_of = "CAST((ts + ?) / ? AS INTEGER)"
+        frame_sql = (f"SELECT {bucket_of} AS b, camera_id, COUNT(*) FROM frames "
+                     f"WHERE {frame_where} GROUP BY b, camera_id")
+        # Inner query: one row per frame and class, so per-frame counts can be maxed
+        det_sql = (f"SELECT b, camera_id, class, SUM(n), COUNT(*), MAX(n), MAX(best) FROM ("
+                   f"SELECT {bucket_of} AS b, camera_id, class, ts, COUNT(*) AS n, MAX(confidence) AS best "
+                   f"FROM detections WHERE {det_where} GROUP BY camera_id, class, ts"
+                   f") GROUP BY b, camera_id, class")
+        track_sql = (f"SELECT {bucket_of} AS b, camera_id, class, COUNT(DISTINCT track_id) FROM detections "
+                     f"WHERE {det_where} AND track_id IS NOT NULL GROUP BY b, camera_id, class")
+        bucket_args = [offset, bucket]
+        with self._read_lock:
+            frames = self._reader.execute(frame_sql, bucket_args + frame_args).fetchall()
+            dets = self._reader.execute(det_sql, bucket_args + args).fetchall()
+            tracks = self._reader.execute(track_sql, bucket_args + args).fetchall()
+
+        buckets = {}
+        for b, camera, n in frames:
+            buckets[(b, camera)] = {"frames": n, "classes": {}}
+        for b, camera, cls, total, with_class, peak, best in dets:
+            entry = buckets.setdefault((b, camera), {"frames": 0, "classes": {}})
+            entry["classes"][cls] = {
+                "detections": total,
+                "frames": with_class,
+                "max_per_frame": peak,
+                "tracks": 0,
+                "max_confidence": round(best, 3),
+            }
+        for b, camera, cls, n in tracks:
+            buckets[(b, camera)]["classes"][cls]["tracks"] = n
+        return [{
+            "start": datetime.fromtimestamp(b * bucket - offset).isoformat(),
+            "camera_id": camera,
+            **entry,
+        } for (b, camera), entry in sorted(buckets.items(), key=lambda item: (item[0][0], item[0][1] or ''))]
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "written": self.written,
+            "dropped": self.dropped,
+            "max_age_days": self.max_age_days,
+        }
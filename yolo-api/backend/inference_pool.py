@@ -0,0 +1,205 @@
+"""Bounded inference worker pool with micro-batching
+
+All inference runs on a fixed number of worker threads that own model
+loading and prediction; HTTP handler threads only decode input and encode
+output. Submissions wait in a bounded queue: when it is full the caller
+gets Overloaded (mapped to 503 + Retry-After) instead of piling up work the
+CPU cannot finish in time.
+
+Requests that arrive within a short window for the same model are grouped
+and run as one batch, so the fixed Python/Ultralytics pre- and
+post-processing cost per predict call is paid once per batch instead of
+once per image.
+"""
+import math
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+
+class Overloaded(Exception):
+    """Raised by submit() when the queue is full"""
+
+    def __init__(self, retry_after):
+        super().__init__("Inference queue is full")
+        self.retry_after = retry_after
+
+
+class InferenceTimeout(Exception):
+    """Raised by submit() when the results are not ready within the timeout; queued items are cancelled"""
+
+    def __init__(self, timeout):
+        super().__init__(f"Inference did not finish within {timeout:g}s")
+        self.timeout = timeout
+
+
+class InferencePool:
+    """Groups submissions by key and hands them to run_batch(key, items) on worker threads
+
+    run_batch must return one result per item, in order.
+    """
+
+    def __init__(self, run_batch, workers=1, max_queue=8, window_ms=10, max_batch=4):
+        self.run_batch = run_batch
+        self.workers = workers
+        self.max_queue = max_queue
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._pending = {}  # key -> list of (item, future)
+        self._collecting = set()  # keys a worker is holding the batch window open for
+        self._cond = threading.Condition()
+        self._threads = []
+        self.batches = 0
+        self.items = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.busy = 0
+        self._batch_seconds = None  # EWMA of batch run time, for Retry-After
+
+    @property
+    def queue_depth(self):
+        return sum(len(entries) for entries in self._pending.values())
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._loop, name=f"inference-worker-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def retry_after(self):
+        """Seconds until the current backlog should have drained"""
+        per_batch = self._batch_seconds or 1.0
+        batches = math.ceil(self.queue_depth / self.max_batch) + self.busy
+        return max(1, math.ceil(per_batch * batches / self.workers))
+
+    def submit_many(self, key, items, timeout=None):
+        """Queue items under one key and block until all have run; returns their results in order"""
+        futures = [Future() for _ in items]
+        with self._cond:
+            if self.queue_depth + len(items) > self.max_queue:
+                self.rejected += len(items)
+                raise Overloaded(self.retry_after())
+            self._pending.setdefault(key, []).extend(zip(items, futures))
+            self._ensure_workers()
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        return [self._result(key, futures, f, deadline, timeout) for f in futures]
+
+    def _result(self, key, futures, future, deadline, timeout):
+        """future.result() before the deadline; on timeout the caller's queued items are dropped"""
+        try:
+            return future.result(timeout=None if deadline is None else max(0, deadline - time.monotonic()))
+        except FutureTimeout:
+            self._cancel(key, futures)
+            raise InferenceTimeout(timeout) from None
+
+    def _cancel(self, key, futures):
+        """Remove still-queued items so workers do not run them for nobody; running ones finish"""
+        cancelled = set(map(id, futures))
+        with self._cond:
+            self.timeouts += 1
+            entries = self._pending.get(key)
+            if entries:
+                entries[:] = [entry for entry in entries if id(entry[1]) not in cancelled]
+                if not entries:
+                    del self._pending[key]
+        for future in futures:
+            future.cancel()
+
+    def submit_chunked(self, key, items, timeout=None):
+        """submit_many for more items than the queue has room for (e.g. the tiles of one frame)
+
+        Queues as many items as there is free room for, waits for its own earlier
+        items to finish to make room, and queues the rest. Raises Overloaded only
+        when the queue is full and none of its own items are left to wait for.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        futures = []
+        waited = 0
+        while len(futures) < len(items):
+            with self._cond:
+                free = self.max_queue - self.queue_depth
+                if free > 0:
+                    chunk = [(item, Future()) for item in items[len(futures):len(futures) + free]]
+                    self._pending.setdefault(key, []).extend(chunk)
+                    futures.extend(future for _, future in chunk)
+                    self._ensure_workers()
+                    self._cond.notify_all()
+                    continue
+                if waited == len(futures):
+                    self.rejected += len(items) - len(futures)
+                    raise Overloaded(self.retry_after())
+            self._result(key, futures, futures[waited], deadline, timeout)
+            waited += 1
+        return [self._result(key, futures, f, deadline, timeout) for f in futures]
+
+    def submit(self, key, item, timeout=None):
+        """Queue one item and block until its batch has run; returns its result"""
+        return self.submit_many(key, [item], timeout=timeout)[0]
+
+    def _take_batch(self):
+        """Wait for work, then hold the window open to collect more of the same key"""
+        with self._cond:
+            while True:
+                key = next((k for k in self._pending if k not in self._collecting), None)
+                if key is not None:
+                    break
+                self._cond.wait()
+            self._collecting.add(key)
+            deadline = time.monotonic() + self.window
+            while len(self._pending.get(key, ())) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._cond.wait(remaining)
+            self._collecting.discard(key)
+            entries = self._pending.get(key, [])[:self.max_batch]
+            rest = self._pending.pop(key, [])[self.max_batch:]
+            if rest:
+                # Re-queue at the back so other models get their turn
+                self._pending[key] = rest
+            self.busy += 1
+            self._cond.notify_all()
+            # Running futures can no longer be cancelled by a caller that timed out
+            return key, [entry for entry in entries if entry[1].set_running_or_notify_cancel()]
+
+    def _loop(self):
+        while True:
+            key, entries = self._take_batch()
+            if not entries:
+                # Every item was cancelled by a caller that timed out
+                with self._cond:
+                    self.busy -= 1
+                continue
+            items = [item for item, _ in entries]
+            started = time.monotonic()
+            try:
+                results = self.run_batch(key, items)
+                for (_, future), result in zip(entries, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in entries:
+                    if not future.done():
+                        future.set_exception(e)
+            elapsed = time.monotonic() - started
+            with self._cond:
+                self.busy -= 1
+                self.batches += 1
+                self.items += len(entries)
+                self._batch_seconds = elapsed if self._batch_seconds is None else 0.8 * self._batch_seconds + 0.2 * elapsed
+
+    def stats(self):
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "busy": self.busy,
+                "queue_depth": self.queue_depth,
+                "max_queue": self.max_queue,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+                "batches": self.batches,
+                "items": self.items,
+                "avg_batch_size": round(self.items / self.batches, 2) if self.batches else 0,
+                "avg_batch_ms": round(self._batch_seconds * 1000, 1) if self._batch_seconds else None,
+            }
@@ -0,0 +1,169 @@
+"""LRU cache of loaded models for the YOLO API
+
+Models are kept until the sum of their measured sizes exceeds a memory
+budget, then the least recently used unpinned model is evicted. A model's
+size is the RSS growth observed while loading it, not warming it up (never
+less than its file size), so alternating between a few small models no
+longer reloads weights from disk on every request. The first load on each
+backend also imports its runtime (torch, onnxruntime, ...), which would be
+charged to that model, so it is sized by its file until it is reloaded.
+"""
+import gc
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheEntry:
+    def __init__(self, model, size_mb, load_time):
+        self.model = model
+        self.size_mb = size_mb
+        self.load_time = load_time
+        self.hits = 0
+        self.last_used = time.time()
+
+
+class ModelCache:
+    """Memory-budgeted LRU keyed by (model_path, backend)
+
+    loader(key) returns a loaded model or raises; memory_fn() returns the
+    current process RSS in MB; warmup(model), if given, runs after the size
+    is measured.
+    """
+
+    def __init__(self, loader, memory_fn, budget_mb=512, max_models=4, warmup=None):
+        self.loader = loader
+        self.memory_fn = memory_fn
+        self.warmup = warmup
+        self.budget_mb = budget_mb
+        self.max_models = max_models
+        self._entries = OrderedDict()
+        self._pinned = set()  # model paths that are never evicted
+        self._known_sizes = {}  # key -> size measured at its last load
+        self._loaded_backends = set()  # backends whose runtime has been imported
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.load_seconds = 0.0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return the cached model for key, loading it on a miss"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                return self._touch(key, entry)
+
+        # One load at a time: loads are rare and concurrent ones would skew the RSS measurement
+        with self._load_lock:
+            with self._lock:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    return self._touch(key, entry)
+                self.misses += 1
+
+            model_path = key[0]
+            file_mb = os.path.getsize(model_path) / 1024 / 1024
+            with self._lock:
+                # Make room up front so the old model is freed before the new one is allocated
+                self._evict(reserve_mb=self._known_sizes.get(key, file_mb), reserve_slot=True)
+
+            before = self.memory_fn()
+            started = time.monotonic()
+            model = self.loader(key)
+            load_time = time.monotonic() - started
+            if key[1] in self._loaded_backends:
+                size_mb = max(self.memory_fn() - before, file_mb)
+            else:
+                # RSS growth includes the runtime import, which no single model owns
+                self._loaded_backends.add(key[1])
+                size_mb = self._known_sizes.get(key, file_mb)
+            if self.warmup:
+                self.warmup(model)
+
+            with self._lock:
+                self.load_seconds += load_time
+                self._entries[key] = CacheEntry(model, size_mb, load_time)
+                self._known_sizes[key] = size_mb
+                self._evict(keep=key)
+            print(f"Loaded {os.path.basename(model_path)} ({key[1]}) in {load_time:.2f}s, ~{size_mb:.0f} MB")
+            return model
+
+    def _touch(self, key, entry):
+        self.hits += 1
+        entry.hits += 1
+        entry.last_used = time.time()
+        self._entries.move_to_end(key)
+        return entry.model
+
+    def _evict(self, reserve_mb=0.0, reserve_slot=False, keep=None):
+        """Drop least recently used unpinned models until within count and memory budget"""
+        evicted = False
+        while True:
+            used = sum(e.size_mb for e in self._entries.values()) + reserve_mb
+            count = len(self._entries) + (1 if reserve_slot else 0)
+            if used <= self.budget_mb and count <= self.max_models:
+                break
+            victim = next((k for k in self._entries if k[0] not in self._pinned and k != keep), None)
+            if victim is None:
+                break  # Only pinned models (and the one just loaded) left
+            del self._entries[victim]
+            self.evictions += 1
+            evicted = True
+            print(f"Evicted model {os.path.basename(victim[0])} ({victim[1]})")
+        if evicted:
+            gc.collect()
+
+    def pin(self, model_path):
+        with self._lock:
+            self._pinned.add(model_path)
+
+    def unpin(self, model_path):
+        with self._lock:
+            self._pinned.discard(model_path)
+
+    def remove(self, model_path):
+        """Drop every backend instance of model_path (e.g. after delete or re-upload)"""
+        with self._lock:
+            keys = [k for k in self._entries if k[0] == model_path]
+            for key in keys:
+                del self._entries[key]
+        if keys:
+            gc.collect()
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+        gc.collect()
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "budget_mb": self.budget_mb,
+                "max_models": self.max_models,
+                "used_mb": round(sum(e.size_mb for e in self._entries.values()), 1),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else None,
+                "evictions": self.evictions,
+                "avg_load_time_s": round(self.load_seconds / self.misses, 2) if self.misses else None,
+                "models": [{
+                    "name": os.path.basename(path),
+                    "backend": backend,
+                    "size_mb": round(entry.size_mb, 1),
+                    "load_time_s": round(entry.load_time, 2),
+                    "hits": entry.hits,
+                    "pinned": path in self._pinned,
+                    "last_used": entry.last_used,
+                } for (path, backend), entry in self._entries.items()],
+            }
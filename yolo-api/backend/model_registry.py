@@ -0,0 +1,246 @@
+"""Model metadata registry for the YOLO API
+
+Listing models used to list and stat the models folder on every call, and
+nothing about a model (classes, input size, task) was known without loading
+it. The registry keeps one in-memory entry per model, built from the
+metadata file ModelStore keeps next to each model, and serves the listing
+from memory. A single background thread profiles a model when asked to (or
+every new model when auto-profiling is on): the profiler records class
+names, input size, task, parameter count and format, times a few inferences
+and the result is written to the metadata file, so restarts do not profile
+again.
+
+Models copied into the folder by hand are picked up when the folder's mtime
+changes; uploads and deletes update the registry directly.
+"""
+import gc
+import os
+import queue
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+from model_store import MODEL_EXTENSIONS
+
+FORMATS = {'.pt': 'pytorch', '.onnx': 'onnx', '.engine': 'tensorrt'}
+PROFILE_FIELDS = ('format', 'task', 'classes', 'num_classes', 'input_size', 'dynamic_batch', 'parameters',
+                  'latency_ms', 'profile_backend', 'profile_resolution')
+
+
+def _onnx_facts(model_path):
+    """Task and parameter count from the ONNX graph, if onnx is installed"""
+    try:
+        import onnx
+    except ImportError:
+        return {}
+    graph = onnx.load(model_path, load_external_data=False)
+    meta = {p.key: p.value for p in graph.metadata_props}
+    parameters = sum(int(np.prod(init.dims)) for init in graph.graph.initializer)
+    return {"task": meta.get('task'), "parameters": parameters}
+
+
+def _ultralytics_facts(backend):
+    model = backend.model
+    facts = {"task": getattr(model, 'task', None)}
+    try:
+        facts["parameters"] = sum(p.numel() for p in model.model.parameters())
+    except (AttributeError, TypeError):
+        pass  # .engine files have no PyTorch parameters
+    return facts
+
+
+def describe(backend, model_path):
+    """Static facts about a loaded backend"""
+    names = backend.names or {}
+    info = {
+        "format": FORMATS.get(os.path.splitext(model_path)[1]),
+        "task": None,
+        "classes": [str(names[k]) for k in sorted(names)],
+        "num_classes": len(names),
+        "input_size": getattr(backend, 'input_size', None),
+        "dynamic_batch": getattr(backend, 'dynamic_batch', None),
+        "parameters": None,
+    }
+    if hasattr(backend, 'model'):
+        info.update(_ultralytics_facts(backend))
+    elif model_path.endswith('.onnx'):
+        info.update(_onnx_facts(model_path))
+    return info
+
+
+def measure_latency(run, runs):
+    """Median milliseconds of one run() after a warm-up call"""
+    run()
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run()
+        samples.append((time.perf_counter() - started) * 1000)
+    return round(float(np.median(samples)), 1)
+
+
+class ModelRegistry:
+    """In-memory model listing backed by ModelStore metadata
+
+    profiler(model_path) returns the fields to store for a model, or is None
+    to disable profiling. With auto_profile off, models are only profiled
+    through profile(name).
+    """
+
+    def __init__(self, store, profiler=None, auto_profile=True):
+        self.store = store
+        self.profiler = profiler
+        self.auto_profile = auto_profile
+        self._requested = set()  # names queued through profile()
+        self._lock = threading.Lock()
+        self._models = {}
+        self._listing = None
+        self._dir_mtime = None
+        self._queue = queue.Queue()
+        self._worker = None
+
+    def start(self):
+        """Scan the folder; with auto_profile, models without a profile are profiled in the background"""
+        self._rescan()
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._profile_loop, name="model-profiler", daemon=True)
+            self._worker.start()
+
+    def _entry(self, name):
+        path = self.store.path(name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return None
+        meta = self.store.metadata(name) or {}
+        entry = {
+            "name": name,
+            "size": stat.st_size,
+            "modified": datetime.fromtimestamp(stat.st_mtime).isoformat(),
+            "sha256": meta.get("sha256"),
+            "path": path,
+        }
+        entry.update({field: meta.get(field) for field in PROFILE_FIELDS})
+        if not self.profiler:
+            entry["profile"] = "disabled"
+        elif name in self._requested:
+            entry["profile"] = "pending"
+        elif meta.get("profile_error"):
+            entry["profile"] = "failed"
+            entry["profile_error"] = meta["profile_error"]
+        elif meta.get("profiled"):
+            entry["profile"] = "done"
+        else:
+            entry["profile"] = "pending" if self.auto_profile else "none"
+        return entry
+
+    def _rescan(self):
+        """Rebuild every entry from disk (startup, or files added outside the API)"""
+        self._dir_mtime = os.stat(self.store.models_dir).st_mtime
+        names = [n for n in os.listdir(self.store.models_dir) if n.endswith(MODEL_EXTENSIONS)]
+        entries = {}
+        for name in names:
+            entry = self._entry(name)
+            if entry:
+                entries[name] = entry
+        with self._lock:
+            queued = {name for name, entry in self._models.items() if entry["profile"] == "pending"}
+            self._models = entries
+            self._listing = None
+        for name, entry in entries.items():
+            if entry["profile"] == "pending" and name not in queued:
+                self._ensure_worker()
+                self._queue.put(name)
+
+    def _check_folder(self):
+        if os.stat(self.store.models_dir).st_mtime != self._dir_mtime:
+            self._rescan()
+
+    def models(self):
+        """All models; one stat of the folder, no per-model file access"""
+        self._check_folder()
+        with self._lock:
+            if self._listing is None:
+                self._listing = sorted(self._models.values(), key=lambda entry: entry["name"])
+            return self._listing
+
+    def get(self, name):
+        self._check_folder()
+        with self._lock:
+            return self._models.get(name)
+
+    def refresh(self, name, profile=True):
+        """Re-read one model after it was written; queues a profile unless it has one"""
+        entry = self._entry(name)
+        with self._lock:
+            if entry:
+                self._models[name] = entry
+            else:
+                self._models.pop(name, None)
+            self._listing = None
+            self._dir_mtime = os.stat(self.store.models_dir).st_mtime
+        if entry and profile and entry["profile"] == "pending":
+            self._ensure_worker()
+            self._queue.put(name)
+        return entry
+
+    def profile(self, name):
+        """Queue a (re-)profile of one model; returns its entry, or None if it does not exist"""
+        if not self.profiler:
+            raise RuntimeError("Model profiling is disabled")
+        with self._lock:
+            if name in self._requested:
+                return self._models.get(name)
+            self._requested.add(name)
+        entry = self.refresh(name, profile=False)
+        if entry is None:
+            with self._lock:
+                self._requested.discard(name)
+            return None
+        self._ensure_worker()
+        self._queue.put(name)
+        return entry
+
+    def remove(self, name):
+        with self._lock:
+            self._requested.discard(name)
+            self._models.pop(name, None)
+            self._listing = None
+            self._dir_mtime = os.stat(self.store.models_dir).st_mtime
+
+    def _profile_loop(self):
+        while True:
+            name = self._queue.get()
+            with self._lock:
+                entry = self._models.get(name)
+            if entry is None or entry["profile"] != "pending":
+                continue
+            print(f"Profiling model {name}")
+            try:
+                self.store.checksum(name)
+                fields = self.profiler(self.store.path(name))
+                self.store.write_metadata(name, profiled=True, profile_error=None, **fields)
+            except FileNotFoundError:
+                continue
+            except Exception as e:
+                print(f"Profiling {name} failed: {e}")
+                try:
+                    self.store.write_metadata(name, profile_error=str(e))
+                except OSError:
+                    continue
+            finally:
+                with self._lock:
+                    self._requested.discard(name)
+                gc.collect()
+            self.refresh(name, profile=False)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "models": len(self._models),
+                "profiling_queue": self._queue.qsize(),
+            }
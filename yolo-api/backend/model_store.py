@@ -0,0 +1,276 @@
+"""Model file storage for the YOLO API
+
+Uploads are streamed in chunks into a partial file next to the models (same
+filesystem), hashed with SHA-256 as they are written and published with an
+atomic rename, so list_models and load_model never see a half-written
+model. Large uploads can be resumed: the client creates an upload, appends
+chunks at the offset the server reports and the model is published when the
+declared size is reached. The checksum is kept in a small metadata file per
+model and used as the download ETag.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+
+MODEL_EXTENSIONS = ('.pt', '.onnx', '.engine')
+CHUNK_SIZE = 1024 * 1024
+PARTIAL_TTL = 24 * 3600  # seconds an abandoned resumable upload is kept
+
+
+class UploadError(Exception):
+    """Rejected upload; status is the HTTP status to answer with"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def valid_model_name(name):
+    return (isinstance(name, str) and bool(name) and name == os.path.basename(name) and not name.startswith('.')
+            and name.endswith(MODEL_EXTENSIONS))
+
+
+def _hash_file(path, sha=None):
+    sha = sha or hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    return sha
+
+
+class ModelStore:
+    """Atomic, checksummed model files with resumable uploads"""
+
+    def __init__(self, models_dir):
+        self.models_dir = models_dir
+        self.partial_dir = os.path.join(models_dir, '.partial')
+        self.meta_dir = os.path.join(models_dir, '.meta')
+        os.makedirs(self.partial_dir, exist_ok=True)
+        os.makedirs(self.meta_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._uploads = {}  # upload id -> {"lock", "sha", "offset"} for uploads in progress
+        self._checksums = {}  # name -> (size, mtime, sha256), so per-request lookups are one stat
+        self._hashing = set()  # names being hashed in the background
+
+    def path(self, name):
+        return os.path.join(self.models_dir, name)
+
+    # Metadata
+
+    def _meta_path(self, name):
+        return os.path.join(self.meta_dir, name + '.json')
+
+    def metadata(self, name):
+        """Stored metadata of a model, or None if missing or stale"""
+        try:
+            with open(self._meta_path(name)) as f:
+                meta = json.load(f)
+            stat = os.stat(self.path(name))
+        except (OSError, ValueError):
+            return None
+        if meta.get("size") != stat.st_size or meta.get("mtime") != stat.st_mtime:
+            return None
+        return meta
+
+    def write_metadata(self, name, **fields):
+        """Merge fields into the model's metadata (size and mtime are refreshed)"""
+        stat = os.stat(self.path(name))
+        meta = self.metadata(name) or {}
+        meta.update(fields, size=stat.st_size, mtime=stat.st_mtime)
+        tmp = self._meta_path(name) + '.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(name))
+        if meta.get("sha256"):
+            with self._lock:
+                self._checksums[name] = (stat.st_size, stat.st_mtime, meta["sha256"])
+        return meta
+
+    def _remembered_checksum(self, name):
+        """SHA-256 from memory or the metadata file while the file is unchanged, else None"""
+        stat = os.stat(self.path(name))
+        with self._lock:
+            known = self._checksums.get(name)
+        if known and known[:2] == (stat.st_size, stat.st_mtime):
+            return known[2]
+        meta = self.metadata(name)
+        if not meta or not meta.get("sha256"):
+            return None
+        with self._lock:
+            self._checksums[name] = (meta["size"], meta["mtime"], meta["sha256"])
+        return meta["sha256"]
+
+    def known_checksum(self, name):
+        """SHA-256 of a model if already known, else None while it is hashed in the background
+
+        For request paths: one stat while the file's size and mtime are
+        unchanged, and never a full-file hash on the caller's thread.
+        """
+        sha256 = self._remembered_checksum(name)
+        if sha256 is not None:
+            return sha256
+        with self._lock:
+            if name in self._hashing:
+                return None
+            self._hashing.add(name)
+        threading.Thread(target=self._hash_in_background, args=(name,), name="model-hash", daemon=True).start()
+        return None
+
+    def _hash_in_background(self, name):
+        try:
+            self.checksum(name)
+        except OSError:
+            pass
+        finally:
+            with self._lock:
+                self._hashing.discard(name)
+
+    def checksum(self, name):
+        """SHA-256 of a model, hashing it once if it predates the store"""
+        sha256 = self._remembered_checksum(name)
+        if sha256 is not None:
+            return sha256
+        return self.write_metadata(name, sha256=_hash_file(self.path(name)).hexdigest())["sha256"]
+
+    def delete(self, name):
+        with self._lock:
+            self._checksums.pop(name, None)
+        os.remove(self.path(name))
+        try:
+            os.remove(self._meta_path(name))
+        except FileNotFoundError:
+            pass
+
+    # One-shot streaming upload
+
+    def save_stream(self, name, stream, expected_sha256=None):
+        """Copy a file-like stream into the models folder; returns the SHA-256"""
+        if not valid_model_name(name):
+            raise UploadError(f"Invalid model name. Use a plain filename ending in {', '.join(MODEL_EXTENSIONS)}")
+        partial = os.path.join(self.partial_dir, f"{uuid.uuid4().hex}.part")
+        sha = hashlib.sha256()
+        try:
+            with open(partial, 'wb') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    sha.update(chunk)
+                    f.write(chunk)
+            return self._publish(partial, name, sha.hexdigest(), expected_sha256)
+        finally:
+            if os.path.exists(partial):
+                os.remove(partial)
+
+    def _publish(self, partial, name, sha256, expected_sha256=None):
+        if expected_sha256 and expected_sha256.lower() != sha256:
+            raise UploadError(f"Checksum mismatch: got {sha256}", 422)
+        with open(partial, 'rb+') as f:
+            os.fsync(f.fileno())
+        os.replace(partial, self.path(name))
+        self.write_metadata(name, sha256=sha256)
+        return sha256
+
+    # Resumable upload: create, append chunks at the reported offset, publish at the declared size
+
+    def _state_path(self, upload_id):
+        return os.path.join(self.partial_dir, f"{upload_id}.json")
+
+    def _partial_path(self, upload_id):
+        return os.path.join(self.partial_dir, f"{upload_id}.part")
+
+    def create_upload(self, name, size, sha256=None):
+        if not valid_model_name(name):
+            raise UploadError(f"Invalid model name. Use a plain filename ending in {', '.join(MODEL_EXTENSIONS)}")
+        if not isinstance(size, int) or size <= 0:
+            raise UploadError("size must be a positive integer")
+        self.cleanup()
+        upload_id = uuid.uuid4().hex
+        with open(self._state_path(upload_id), 'w') as f:
+            json.dump({"name": name, "size": size, "sha256": sha256, "created": time.time()}, f)
+        open(self._partial_path(upload_id), 'wb').close()
+        return self.upload_status(upload_id)
+
+    def _state(self, upload_id):
+        if not upload_id.isalnum():
+            raise UploadError("Upload not found", 404)
+        try:
+            with open(self._state_path(upload_id)) as f:
+                state = json.load(f)
+            state["offset"] = os.path.getsize(self._partial_path(upload_id))
+        except (OSError, ValueError):
+            raise UploadError("Upload not found", 404)
+        return state
+
+    def upload_status(self, upload_id):
+        state = self._state(upload_id)
+        return {"upload_id": upload_id, "name": state["name"], "size": state["size"], "offset": state["offset"]}
+
+    def append(self, upload_id, offset, stream):
+        """Append a chunk at offset; returns (status, sha256 once the upload is complete)
+
+        The offset must equal the bytes received so far, so a client that lost a
+        response asks for the status and continues from there.
+        """
+        state = self._state(upload_id)
+        with self._lock:
+            entry = self._uploads.setdefault(upload_id, {"lock": threading.Lock(), "sha": None, "offset": 0})
+        if not entry["lock"].acquire(blocking=False):
+            raise UploadError("Another chunk for this upload is in progress", 409)
+        try:
+            state = self._state(upload_id)
+            if offset != state["offset"]:
+                raise UploadError(f"Offset mismatch: upload is at {state['offset']}", 409)
+            if entry["sha"] is None or entry["offset"] != offset:
+                # First chunk in this process (or after a restart): rehash what is on disk
+                entry["sha"] = _hash_file(self._partial_path(upload_id))
+            partial = self._partial_path(upload_id)
+            with open(partial, 'ab') as f:
+                for chunk in iter(lambda: stream.read(CHUNK_SIZE), b''):
+                    if offset + len(chunk) > state["size"]:
+                        # Drop the whole chunk so the upload stays at the offset the client sent
+                        f.truncate(state["offset"])
+                        raise UploadError(f"Upload exceeds declared size of {state['size']} bytes", 413)
+                    entry["sha"].update(chunk)
+                    f.write(chunk)
+                    offset += len(chunk)
+            entry["offset"] = offset
+            if offset < state["size"]:
+                return self.upload_status(upload_id), None
+            sha256 = entry["sha"].hexdigest()
+            try:
+                self._publish(partial, state["name"], sha256, state.get("sha256"))
+            finally:
+                self._discard(upload_id)
+            return {"upload_id": upload_id, "name": state["name"], "size": state["size"],
+                    "offset": offset, "sha256": sha256}, sha256
+        except UploadError:
+            # Keep the bytes that were written; the hash state no longer matches them
+            entry["sha"] = None
+            raise
+        finally:
+            entry["lock"].release()
+
+    def abort(self, upload_id):
+        self._state(upload_id)
+        self._discard(upload_id)
+
+    def _discard(self, upload_id):
+        with self._lock:
+            self._uploads.pop(upload_id, None)
+        for path in (self._partial_path(upload_id), self._state_path(upload_id)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def cleanup(self):
+        """Remove partial uploads untouched for PARTIAL_TTL"""
+        cutoff = time.time() - PARTIAL_TTL
+        for name in os.listdir(self.partial_dir):
+            path = os.path.join(self.partial_dir, name)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except FileNotFoundError:
+                pass
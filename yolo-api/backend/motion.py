@@ -0,0 +1,126 @@
+"""Motion gate in front of inference for the YOLO API
+
+Each camera keeps a small blurred grayscale copy of the frame its last
+detections were computed on. A new frame is compared against it with a
+plain absolute difference; if too few pixels changed, the previous
+detections are reused instead of running a forward pass. Comparing against
+the last inferred frame (rather than the previous frame) means slow changes
+still add up and eventually trigger a fresh inference.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+import cv2
+import numpy as np
+
+GATE_WIDTH = 160  # frames are compared at this width
+
+
+def _small_gray(image):
+    h, w = image.shape[:2]
+    scale = GATE_WIDTH / float(w)
+    small = cv2.resize(image, (GATE_WIDTH, max(1, int(round(h * scale)))), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(small, (5, 5), 0)
+
+
+def parse_regions(raw):
+    """Validate polygons given as lists of [x, y] in 0..1 image coordinates; returns (K, 2) arrays"""
+    if not raw:
+        return None
+    regions = []
+    for polygon in raw:
+        points = np.asarray(polygon, dtype=np.float32)
+        if points.ndim != 2 or points.shape[1] != 2 or len(points) < 3:
+            raise ValueError("each region must be a list of at least 3 [x, y] points")
+        regions.append(np.clip(points, 0.0, 1.0))
+    return regions
+
+
+def region_mask(regions, shape):
+    """uint8 mask of the parsed polygons at the given shape, or None"""
+    if not regions:
+        return None
+    h, w = shape[:2]
+    mask = np.zeros((h, w), dtype=np.uint8)
+    for points in regions:
+        cv2.fillPoly(mask, [np.round(points * [w - 1, h - 1]).astype(np.int32)], 255)
+    return mask
+
+
+class GateState:
+    def __init__(self, model_key, reference, result):
+        self.model_key = model_key
+        self.reference = reference
+        self.result = result
+        self.updated = time.monotonic()
+
+
+class MotionGate:
+    """Per-camera frame differencing that decides whether a frame needs inference
+
+    pixel_threshold is the grey-level change counted as motion, min_changed the
+    fraction of (masked) pixels that must change, max_skip the longest time in
+    seconds previous detections are reused.
+    """
+
+    def __init__(self, pixel_threshold=25, min_changed=0.005, max_skip=60.0, max_cameras=64):
+        self.pixel_threshold = pixel_threshold
+        self.min_changed = min_changed
+        self.max_skip = max_skip
+        self.max_cameras = max_cameras
+        self._states = OrderedDict()
+        self._lock = threading.Lock()
+        self.checks = 0
+        self.skipped = 0
+
+    def check(self, camera_key, model_key, image, regions=None, min_changed=None):
+        """Return (cached_result, changed_fraction); cached_result is None when inference is needed"""
+        small = _small_gray(image)
+        with self._lock:
+            self.checks += 1
+            state = self._states.get(camera_key)
+            if state is None or state.model_key != model_key or state.reference.shape != small.shape:
+                return None, 1.0
+            self._states.move_to_end(camera_key)
+            if time.monotonic() - state.updated > self.max_skip:
+                return None, None
+            reference = state.reference
+
+        diff = cv2.absdiff(small, reference) > self.pixel_threshold
+        mask = region_mask(regions, small.shape)
+        if mask is not None:
+            masked = mask > 0
+            changed = float(diff[masked].mean()) if masked.any() else 0.0
+        else:
+            changed = float(diff.mean())
+
+        if changed >= (self.min_changed if min_changed is None else min_changed):
+            return None, changed
+        with self._lock:
+            self.skipped += 1
+        return state.result, changed
+
+    def update(self, camera_key, model_key, image, result):
+        """Remember the frame a fresh result was computed on"""
+        state = GateState(model_key, _small_gray(image), result)
+        with self._lock:
+            self._states.pop(camera_key, None)
+            self._states[camera_key] = state
+            while len(self._states) > self.max_cameras:
+                self._states.popitem(last=False)
+
+    def reset(self, camera_key):
+        with self._lock:
+            self._states.pop(camera_key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cameras": len(self._states),
+                "checks": self.checks,
+                "skipped": self.skipped,
+                "skip_rate": round(self.skipped / self.checks, 3) if self.checks else None,
+            }
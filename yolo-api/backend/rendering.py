@@ -0,0 +1,103 @@
+"""Annotated image rendering and response encoding for the YOLO API
+
+Rendering is done only when a response actually needs the picture. Frames
+and detection arrays of recent results are kept in a small in-memory LRU so
+GET /api/results/<result_id>/image can render them on demand, and the JPEG
+is encoded once and shared between disk, inline base64 and raw responses.
+"""
+import json
+import threading
+import uuid
+from collections import OrderedDict
+
+import cv2
+
+import detections as dets_mod
+
+# Box colours (BGR) for annotated images, picked by class id
+CLASS_COLORS = [
+    (56, 56, 255), (151, 157, 255), (31, 112, 255), (29, 178, 255), (49, 210, 207),
+    (10, 249, 72), (23, 204, 146), (134, 219, 61), (52, 147, 26), (187, 212, 0),
+    (168, 153, 44), (255, 194, 0), (147, 69, 52), (255, 115, 100), (236, 24, 0),
+    (255, 56, 132), (133, 0, 82), (255, 56, 203), (200, 149, 255), (199, 55, 255)
+]
+
+
+def draw_detections(image, arr, lookup):
+    """Draw boxes and labels for a structured detection array on a copy of image"""
+    annotated = image.copy()
+    thickness = max(1, round(sum(image.shape[:2]) / 2 * 0.003))
+    font_scale, font_thickness = thickness / 3, max(thickness - 1, 1)
+    names = dets_mod.class_names(arr, lookup)
+    for (x1, y1, x2, y2), conf, cls, name in zip(dets_mod.boxes(arr).astype(int).tolist(),
+                                                 arr['confidence'].tolist(), arr['class_id'].tolist(), names):
+        color = CLASS_COLORS[cls % len(CLASS_COLORS)]
+        cv2.rectangle(annotated, (x1, y1), (x2, y2), color, thickness, cv2.LINE_AA)
+        label = f"{name} {conf:.2f}"
+        (tw, th), _ = cv2.getTextSize(label, cv2.FONT_HERSHEY_SIMPLEX, font_scale, font_thickness)
+        top = y1 - th - 3 if y1 - th - 3 >= 0 else y1 + th + 3
+        cv2.rectangle(annotated, (x1, y1), (x1 + tw, top), color, -1, cv2.LINE_AA)
+        cv2.putText(annotated, label, (x1, y1 - 2 if top < y1 else top - 2),
+                    cv2.FONT_HERSHEY_SIMPLEX, font_scale, (255, 255, 255), font_thickness, cv2.LINE_AA)
+    return annotated
+
+
+def encode_jpeg(image, quality):
+    """Encode once to JPEG bytes"""
+    ok, buffer = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, int(quality)])
+    if not ok:
+        raise RuntimeError("Failed to encode JPEG")
+    return buffer.tobytes()
+
+
+def multipart_body(payload, jpeg_bytes):
+    """multipart/mixed body with the JSON payload and the raw JPEG; returns (body, content_type)"""
+    boundary = uuid.uuid4().hex
+    body = b"".join([
+        f"--{boundary}\r\nContent-Type: application/json\r\n\r\n".encode(),
+        json.dumps(payload, separators=(',', ':')).encode(),
+        f"\r\n--{boundary}\r\nContent-Type: image/jpeg\r\nContent-Length: {len(jpeg_bytes)}\r\n\r\n".encode(),
+        jpeg_bytes,
+        f"\r\n--{boundary}--\r\n".encode(),
+    ])
+    return body, f"multipart/mixed; boundary={boundary}"
+
+
+class RecentResults:
+    """Bounded LRU of recent frames and detections for lazy rendering by result_id"""
+
+    def __init__(self, capacity=8):
+        self.capacity = capacity
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, result_id, image, arr, lookup):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._items[result_id] = {"image": image, "detections": arr, "lookup": lookup, "jpeg": {}}
+            self._items.move_to_end(result_id)
+            while len(self._items) > self.capacity:
+                self._items.popitem(last=False)
+
+    def render(self, result_id, quality):
+        """Annotated JPEG bytes for result_id, or None if it has been evicted"""
+        with self._lock:
+            item = self._items.get(result_id)
+            if item is None:
+                return None
+            self._items.move_to_end(result_id)
+            cached = item["jpeg"].get(quality)
+        if cached is not None:
+            return cached
+        jpeg = encode_jpeg(draw_detections(item["image"], item["detections"], item["lookup"]), quality)
+        with self._lock:
+            item["jpeg"][quality] = jpeg
+        return jpeg
+
+    def store_jpeg(self, result_id, quality, jpeg):
+        """Remember an already-encoded JPEG so a later lazy fetch does not re-render"""
+        with self._lock:
+            item = self._items.get(result_id)
+            if item is not None:
+                item["jpeg"][quality] = jpeg
@@ -0,0 +1,103 @@
+"""Content-addressed inference result cache for the YOLO API
+
+Automations often send the same picture again: a snapshot that did not
+change, a retry after a timeout, a manual run on a file on disk. Uploaded
+images are keyed by the SHA-256 of their bytes together with the model's
+checksum and every option that changes the detections, so a repeated
+request skips decoding and inference and is answered from memory, including
+the annotated JPEG that was already encoded for it. Entries expire after a
+TTL and the cache is bounded by entry count and by memory.
+"""
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(image_bytes, *parts):
+    """SHA-256 of the image bytes and the JSON of everything else that affects the result"""
+    sha = hashlib.sha256(image_bytes)
+    sha.update(json.dumps(parts, sort_keys=True, default=str).encode())
+    return sha.hexdigest()
+
+
+class ResultCache:
+    """Bounded LRU of inference results with a TTL; max_entries of 0 disables it"""
+
+    def __init__(self, max_entries=32, max_mb=64, ttl=300):
+        self.max_entries = max_entries
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.ttl = ttl
+        self._items = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def enabled(self):
+        return self.max_entries > 0
+
+    @staticmethod
+    def _size(entry):
+        return entry["image"].nbytes + entry["detections"].nbytes + sum(map(len, entry["jpeg"].values()))
+
+    def get(self, key):
+        """Cached entry (image, detections, lookup, jpeg by quality) or None; counts the hit or miss"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is not None and entry["expires"] < time.monotonic():
+                self._remove(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, image, arr, lookup):
+        if not self.enabled:
+            return
+        entry = {"image": image, "detections": arr, "lookup": lookup, "jpeg": {},
+                 "expires": time.monotonic() + self.ttl}
+        with self._lock:
+            if key in self._items:
+                self._remove(key)
+            self._items[key] = entry
+            self._bytes += self._size(entry)
+            self._trim()
+
+    def store_jpeg(self, key, quality, jpeg_bytes):
+        """Keep an encoded annotated image next to the entry it was rendered from"""
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None or quality in entry["jpeg"]:
+                return
+            entry["jpeg"][quality] = jpeg_bytes
+            self._bytes += len(jpeg_bytes)
+            self._trim()
+
+    def _remove(self, key):
+        self._bytes -= self._size(self._items.pop(key))
+
+    def _trim(self):
+        while self._items and (len(self._items) > self.max_entries or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._items)))
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._items),
+                "max_entries": self.max_entries,
+                "size_mb": round(self._bytes / 1024 / 1024, 1),
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 3) if requests else None,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,240 @@
+"""Bounded result storage for the YOLO API
+
+Saved results (annotated JPEG + detection JSON) used to accumulate in
+RESULTS_DIR forever. ResultStore indexes every saved result in SQLite
+(time, camera, model, classes, file sizes) so results can be looked up by
+camera, time range or class without listing the directory, and a background
+thread prunes them by age, count and total size. Frames without detections
+can optionally be saved without their image.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    id TEXT PRIMARY KEY,
+    created REAL NOT NULL,
+    camera_id TEXT,
+    model TEXT,
+    count INTEGER NOT NULL,
+    image_file TEXT,
+    json_file TEXT NOT NULL,
+    bytes INTEGER NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_created ON results (created);
+CREATE INDEX IF NOT EXISTS results_camera ON results (camera_id, created);
+CREATE TABLE IF NOT EXISTS result_classes (
+    result_id TEXT NOT NULL,
+    class TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (class, result_id)
+);
+CREATE INDEX IF NOT EXISTS result_classes_result ON result_classes (result_id);
+"""
+
+
+class ResultStore:
+    """Result files plus a SQLite index, with age/count/size retention
+
+    max_age_days, max_count and max_mb of 0 disable that limit.
+    """
+
+    def __init__(self, results_dir, db_path, max_age_days=7, max_count=5000, max_mb=1024,
+                 prune_interval=300, images_with_detections_only=False):
+        self.results_dir = results_dir
+        self.max_age_days = max_age_days
+        self.max_count = max_count
+        self.max_mb = max_mb
+        self.prune_interval = prune_interval
+        self.images_with_detections_only = images_with_detections_only
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(SCHEMA)
+        self._pruner = None
+        self.pruned = 0
+
+    def start(self):
+        """Index files left from before the store existed, then prune periodically"""
+        if self._pruner is None or not self._pruner.is_alive():
+            self._pruner = threading.Thread(target=self._prune_loop, name="result-pruner", daemon=True)
+            self._pruner.start()
+
+    def _prune_loop(self):
+        try:
+            self.adopt_orphans()
+        except Exception as e:
+            print(f"Result index rebuild failed: {e}")
+        while True:
+            try:
+                self.prune()
+            except Exception as e:
+                print(f"Result pruning failed: {e}")
+            time.sleep(self.prune_interval)
+
+    def save(self, result_id, jpeg_bytes, detections, model_name, camera_id=None):
+        """Write result files and index them; returns (image file or None, json file)"""
+        created = time.time()
+        image_file = None
+        size = 0
+        if jpeg_bytes is not None and (detections or not self.images_with_detections_only):
+            image_file = f"result_{result_id}.jpg"
+            with open(os.path.join(self.results_dir, image_file), 'wb') as f:
+                f.write(jpeg_bytes)
+            size += len(jpeg_bytes)
+
+        json_file = f"result_{result_id}.json"
+        body = json.dumps({
+            "timestamp": datetime.fromtimestamp(created).isoformat(),
+            "model": model_name,
+            "camera_id": camera_id,
+            "detections": detections
+        }, separators=(',', ':')).encode()
+        with open(os.path.join(self.results_dir, json_file), 'wb') as f:
+            f.write(body)
+        size += len(body)
+
+        self._index(result_id, created, camera_id, model_name, detections, image_file, json_file, size)
+        return image_file, json_file
+
+    def _index(self, result_id, created, camera_id, model_name, detections, image_file, json_file, size):
+        classes = {}
+        for detection in detections:
+            classes[detection["class"]] = classes.get(detection["class"], 0) + 1
+        with self._lock, self._db:
+            self._db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                             (result_id, created, camera_id, model_name, len(detections), image_file, json_file, size))
+            self._db.executemany("INSERT OR REPLACE INTO result_classes VALUES (?, ?, ?)",
+                                 [(result_id, name, n) for name, n in classes.items()])
+
+    def adopt_orphans(self):
+        """Index result_<id>.json files on disk that the index does not know about"""
+        with self._lock:
+            known = {row[0] for row in self._db.execute("SELECT json_file FROM results")}
+        adopted = 0
+        for name in os.listdir(self.results_dir):
+            if not (name.startswith("result_") and name.endswith(".json")) or name in known:
+                continue
+            path = os.path.join(self.results_dir, name)
+            try:
+                with open(path) as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            result_id = name[len("result_"):-len(".json")]
+            image_file = f"result_{result_id}.jpg"
+            size = os.path.getsize(path)
+            if os.path.exists(os.path.join(self.results_dir, image_file)):
+                size += os.path.getsize(os.path.join(self.results_dir, image_file))
+            else:
+                image_file = None
+            self._index(result_id, os.path.getmtime(path), data.get("camera_id"), data.get("model"),
+                        data.get("detections", []), image_file, name, size)
+            adopted += 1
+        if adopted:
+            print(f"Indexed {adopted} existing results")
+        return adopted
+
+    def _victims(self):
+        """Result rows to delete, oldest first, to satisfy age, count and size limits"""
+        victims = []
+        with self._lock:
+            if self.max_age_days:
+                cutoff = time.time() - self.max_age_days * 86400
+                victims += self._db.execute(
+                    "SELECT id, image_file, json_file FROM results WHERE created < ?", (cutoff,)).fetchall()
+            count, total = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0) FROM results").fetchone()
+            count -= len(victims)
+            excess_count = max(0, count - self.max_count) if self.max_count else 0
+            excess_bytes = total - self.max_mb * 1024 * 1024 if self.max_mb else 0
+            if excess_count > 0 or excess_bytes > 0:
+                done = {row[0] for row in victims}
+                for row in self._db.execute(
+                        "SELECT id, image_file, json_file, bytes FROM results ORDER BY created"):
+                    if excess_count <= 0 and excess_bytes <= 0:
+                        break
+                    if row[0] in done:
+                        excess_bytes -= row[3]
+                        continue
+                    victims.append(row[:3])
+                    excess_count -= 1
+                    excess_bytes -= row[3]
+        return victims
+
+    def prune(self):
+        """Delete results beyond the retention limits; returns how many were removed"""
+        victims = self._victims()
+        for _, image_file, json_file in victims:
+            for name in (image_file, json_file):
+                if name:
+                    try:
+                        os.remove(os.path.join(self.results_dir, name))
+                    except FileNotFoundError:
+                        pass
+        if victims:
+            with self._lock, self._db:
+                ids = [(row[0],) for row in victims]
+                self._db.executemany("DELETE FROM results WHERE id = ?", ids)
+                self._db.executemany("DELETE FROM result_classes WHERE result_id = ?", ids)
+            self.pruned += len(victims)
+            print(f"Pruned {len(victims)} old results")
+        return len(victims)
+
+    def query(self, camera_id=None, since=None, until=None, class_name=None, limit=100):
+        """Newest results first, filtered by camera, time range (epoch seconds) and class"""
+        sql = "SELECT r.id, r.created, r.camera_id, r.model, r.count, r.image_file, r.json_file FROM results r"
+        where, args = [], []
+        if class_name:
+            sql += " JOIN result_classes c ON c.result_id = r.id AND c.class = ?"
+            args.append(class_name)
+        if camera_id:
+            where.append("r.camera_id = ?")
+            args.append(camera_id)
+        if since is not None:
+            where.append("r.created >= ?")
+            args.append(since)
+        if until is not None:
+            where.append("r.created < ?")
+            args.append(until)
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY r.created DESC LIMIT ?"
+        args.append(limit)
+        with self._lock:
+            rows = self._db.execute(sql, args).fetchall()
+            classes = {}
+            if rows:
+                marks = ",".join("?" * len(rows))
+                for result_id, name, n in self._db.execute(
+                        f"SELECT result_id, class, count FROM result_classes WHERE result_id IN ({marks})",
+                        [row[0] for row in rows]):
+                    classes.setdefault(result_id, {})[name] = n
+        return [{
+            "result_id": result_id,
+            "timestamp": datetime.fromtimestamp(created).isoformat(),
+            "camera_id": camera,
+            "model": model,
+            "count": count,
+            "classes": classes.get(result_id, {}),
+            "image_url": f"/api/results/{image_file}" if image_file else None,
+            "json_url": f"/api/results/{json_file}",
+        } for result_id, created, camera, model, count, image_file, json_file in rows]
+
+    def stats(self):
+        with self._lock:
+            count, total, oldest = self._db.execute(
+                "SELECT COUNT(*), COALESCE(SUM(bytes), 0), MIN(created) FROM results").fetchone()
+        return {
+            "count": count,
+            "size_mb": round(total / 1024 / 1024, 1),
+            "oldest": datetime.fromtimestamp(oldest).isoformat() if oldest else None,
+            "pruned": self.pruned,
+            "max_age_days": self.max_age_days,
+            "max_count": self.max_count,
+            "max_mb": self.max_mb,
+        }
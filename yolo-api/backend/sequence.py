@@ -0,0 +1,73 @@
+"""Temporal aggregation of a short frame sequence for the YOLO API
+
+A single frame is a noisy sample: a person half hidden behind a post, a
+shadow that looks like a cat for one frame. Sequence mode infers several
+frames from one capture session in one batch and aggregates them:
+
+- per-class counts across frames (max, median, mean)
+- detections matched across frames by IoU into objects; each object gets a
+  confidence-weighted vote (sum of its confidences over the number of
+  frames) and a class chosen by confidence-weighted majority, and is kept
+  when its vote reaches min_vote, so one-frame flickers drop out while an
+  object seen in most frames survives
+"""
+import numpy as np
+
+import detections as dets_mod
+from tracker import greedy_assign, iou_matrix
+
+
+def class_counts(arrs, lookup):
+    """{class name: {"max", "median", "mean"}} over the per-frame counts"""
+    classes = np.unique(np.concatenate([arr['class_id'] for arr in arrs])) if arrs else []
+    counts = {}
+    for cls in np.asarray(classes).tolist():
+        per_frame = np.array([int((arr['class_id'] == cls).sum()) for arr in arrs])
+        name = str(lookup[cls]) if 0 <= cls < len(lookup) else str(cls)
+        counts[name] = {
+            "max": int(per_frame.max()),
+            "median": float(np.median(per_frame)),
+            "mean": round(float(per_frame.mean()), 2),
+        }
+    return counts
+
+
+def vote(arrs, image_shape, iou_threshold=0.3, min_vote=0.4):
+    """Match detections across frames and keep objects with enough confidence-weighted votes
+
+    Returns (arr, votes, seen): a structured detection array in image_shape
+    coordinates, the vote of each object and the number of frames it was seen in.
+    """
+    n_frames = len(arrs)
+    clusters = []  # each: list of (frame index, box, confidence, class)
+    anchors = np.zeros((0, 4), dtype=np.float32)  # latest box per cluster, for matching
+    for f, arr in enumerate(arrs):
+        boxes = dets_mod.boxes(arr).astype(np.float32)
+        rows, cols = greedy_assign(iou_matrix(anchors, boxes), iou_threshold)
+        matched = np.zeros(len(arr), dtype=bool)
+        for c, d in zip(rows.tolist(), cols.tolist()):
+            clusters[c].append((f, boxes[d], float(arr['confidence'][d]), int(arr['class_id'][d])))
+            anchors[c] = boxes[d]
+            matched[d] = True
+        for d in np.flatnonzero(~matched).tolist():
+            clusters.append([(f, boxes[d], float(arr['confidence'][d]), int(arr['class_id'][d]))])
+        anchors = np.concatenate([anchors, boxes[~matched]])
+
+    rows, votes, seen = [], [], []
+    for members in clusters:
+        conf = np.array([m[2] for m in members])
+        score = float(conf.sum()) / n_frames
+        if score < min_vote:
+            continue
+        cls = np.array([m[3] for m in members])
+        labels = np.unique(cls)
+        winner = labels[np.argmax([conf[cls == label].sum() for label in labels])]
+        box = np.average(np.stack([m[1] for m in members]), axis=0, weights=conf)
+        rows.append([*box.tolist(), float(conf[cls == winner].mean()), int(winner)])
+        votes.append(round(score, 3))
+        seen.append(len({m[0] for m in members}))
+
+    order = np.argsort(votes)[::-1] if votes else []
+    dets = np.asarray(rows, dtype=np.float32)[order] if rows else np.zeros((0, 6), np.float32)
+    return (dets_mod.from_array(dets, image_shape),
+            [votes[i] for i in order], [seen[i] for i in order])
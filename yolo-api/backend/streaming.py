@@ -0,0 +1,196 @@
+"""Continuous detection on registered cameras
+
+Cameras are registered with a target FPS and a small pool of worker threads
+runs detections on them using earliest-deadline-first scheduling. A camera
+that falls behind has its missed frames skipped rather than queued, and
+because the camera just served gets the latest deadline, cameras sharing the
+CPU are served round-robin when the box is overloaded. Results are pushed to
+subscribers through an EventBroker instead of being polled.
+"""
+import queue
+import threading
+import time
+
+
+class EventBroker:
+    """Fan-out of detection events to subscriber queues"""
+
+    def __init__(self, queue_size=100):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.dropped = 0
+
+    def subscribe(self):
+        q = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            self._subscribers.add(q)
+        return q
+
+    def unsubscribe(self, q):
+        with self._lock:
+            self._subscribers.discard(q)
+
+    def publish(self, event):
+        """Deliver event to every subscriber; a full queue drops its oldest event"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for q in subscribers:
+            while True:
+                try:
+                    q.put_nowait(event)
+                    break
+                except queue.Full:
+                    try:
+                        q.get_nowait()
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+class WatchedCamera:
+    """Registration and scheduling state for one camera"""
+
+    def __init__(self, camera_id, rtsp_url, model, fps=1.0, options=None):
+        self.camera_id = camera_id
+        self.rtsp_url = rtsp_url
+        self.model = model
+        self.fps = fps
+        self.options = options or {}
+        self.next_due = time.monotonic()
+        self.busy = False
+        self.processed = 0
+        self.skipped = 0
+        self.errors = 0
+        self.last_error = None
+        self.last_latency_ms = None
+        # Last processed frame ({"image", "detections", "lookup", "jpeg"}), rendered by GET .../latest.jpg
+        self.latest = None
+        self.frames = 0  # frames stored in latest, numbers the image URL
+
+    @property
+    def period(self):
+        return 1.0 / self.fps
+
+    def info(self):
+        return {
+            "camera_id": self.camera_id,
+            "model": self.model,
+            "fps": self.fps,
+            "processed": self.processed,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "last_error": self.last_error,
+            "last_latency_ms": self.last_latency_ms,
+        }
+
+
+class StreamScheduler:
+    """Runs detect_fn on registered cameras at their target FPS
+
+    detect_fn(camera) must return an event dict, None to publish nothing,
+    or raise; the scheduler adds camera_id/latency and publishes it to the broker.
+    """
+
+    def __init__(self, detect_fn, broker, workers=1, max_fps=5.0):
+        self.detect_fn = detect_fn
+        self.broker = broker
+        self.workers = workers
+        self.max_fps = max_fps
+        self._cameras = {}
+        self._cond = threading.Condition()
+        self._threads = []
+
+    def _ensure_workers(self):
+        self._threads = [t for t in self._threads if t.is_alive()]
+        while len(self._threads) < self.workers:
+            t = threading.Thread(target=self._worker, name=f"stream-worker-{len(self._threads)}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def register(self, camera_id, rtsp_url, model, fps=1.0, options=None):
+        """Add or update a camera; returns its info"""
+        fps = max(0.01, min(float(fps), self.max_fps))
+        with self._cond:
+            camera = self._cameras.get(camera_id)
+            if camera is None:
+                camera = WatchedCamera(camera_id, rtsp_url, model, fps, options)
+                self._cameras[camera_id] = camera
+            else:
+                camera.rtsp_url = rtsp_url
+                camera.model = model
+                camera.fps = fps
+                camera.options = options or {}
+                camera.next_due = time.monotonic()
+            self._ensure_workers()
+            self._cond.notify_all()
+            return camera.info()
+
+    def unregister(self, camera_id):
+        with self._cond:
+            camera = self._cameras.pop(camera_id, None)
+            self._cond.notify_all()
+        return camera
+
+    def get(self, camera_id):
+        with self._cond:
+            return self._cameras.get(camera_id)
+
+    def cameras(self):
+        with self._cond:
+            return [c.info() for c in self._cameras.values()]
+
+    def _next_camera(self):
+        """Block until a camera is due and claim it (caller holds no lock)"""
+        with self._cond:
+            while True:
+                idle = [c for c in self._cameras.values() if not c.busy]
+                if not idle:
+                    self._cond.wait()
+                    continue
+                camera = min(idle, key=lambda c: c.next_due)
+                delay = camera.next_due - time.monotonic()
+                if delay > 0:
+                    # Woken early by register/unregister or another worker finishing
+                    self._cond.wait(delay)
+                    continue
+                camera.busy = True
+                return camera
+
+    def _finish(self, camera, started):
+        """Release camera and schedule its next run, skipping missed slots"""
+        now = time.monotonic()
+        with self._cond:
+            due = camera.next_due + camera.period
+            if due < now:
+                missed = int((now - due) / camera.period) + 1
+                camera.skipped += missed
+                due += missed * camera.period
+            camera.next_due = due
+            camera.busy = False
+            camera.last_latency_ms = round((now - started) * 1000, 1)
+            self._cond.notify_all()
+
+    def _worker(self):
+        while True:
+            camera = self._next_camera()
+            started = time.monotonic()
+            try:
+                event = self.detect_fn(camera)
+                camera.processed += 1
+                camera.last_error = None
+            except Exception as e:
+                camera.errors += 1
+                camera.last_error = str(e)
+                event = {"type": "error", "error": str(e)}
+            self._finish(camera, started)
+            if event is None or camera.camera_id not in self._cameras:
+                continue  # Nothing worth publishing, or unregistered while running
+            event["camera_id"] = camera.camera_id
+            event["latency_ms"] = camera.last_latency_ms
+            self.broker.publish(event)
@@ -0,0 +1,102 @@
+"""Sliced inference helpers for the YOLO API
+
+A high-resolution frame (or a region of it) is cut into overlapping tiles
+that are inferred at native resolution, so small objects in a 4K frame are
+not shrunk six-fold to fit a 640 px input. Boxes are mapped back onto the
+frame and merged across tiles: objects cut by a tile edge show up as
+several partial boxes with low IoU but high overlap relative to the smaller
+box, so the fuse merge joins those into one box instead of keeping both.
+"""
+import math
+
+import numpy as np
+
+from backends import nms
+
+MERGE_MODES = ('fuse', 'nms')
+
+
+def _starts(start, end, tile, stride):
+    length = end - start
+    if length <= tile:
+        return [start]
+    count = math.ceil((length - tile) / stride) + 1
+    return np.linspace(start, end - tile, count).round().astype(int).tolist()
+
+
+def tile_grid(rect, tile, overlap):
+    """Overlapping tiles of at most tile x tile px covering rect (x1, y1, x2, y2)"""
+    x1, y1, x2, y2 = rect
+    stride = max(1, int(tile * (1.0 - overlap)))
+    return [(x, y, min(x + tile, x2), min(y + tile, y2))
+            for y in _starts(y1, y2, tile, stride)
+            for x in _starts(x1, x2, tile, stride)]
+
+
+def plan(rects, tile, overlap, max_tiles):
+    """Tiles for all rects, growing the tile size until there are at most max_tiles
+
+    Returns (tiles, tile_size); tiles larger than the inference size are downscaled by the model input.
+    """
+    while True:
+        tiles = [t for rect in rects for t in tile_grid(rect, tile, overlap)]
+        if len(tiles) <= max(max_tiles, len(rects)):
+            return tiles, tile
+        tile = int(tile * 1.25)
+
+
+def map_to_frame(parts, scale):
+    """Per-crop detections -> (N, 6) [x1, y1, x2, y2, conf, cls] in frame pixels times scale
+
+    parts is [(arr, inferred_shape, crop_shape, (x_offset, y_offset))] with boxes in
+    inferred_shape pixels (the crop as the model saw it, after any resize).
+    """
+    rows = []
+    for arr, inferred_shape, crop_shape, (ox, oy) in parts:
+        if not len(arr):
+            continue
+        sx, sy = crop_shape[1] / inferred_shape[1], crop_shape[0] / inferred_shape[0]
+        rows.append(np.column_stack([
+            (arr['x1'] * sx + ox) * scale, (arr['y1'] * sy + oy) * scale,
+            (arr['x2'] * sx + ox) * scale, (arr['y2'] * sy + oy) * scale,
+            arr['confidence'], arr['class_id'],
+        ]))
+    return np.concatenate(rows).astype(np.float32) if rows else np.zeros((0, 6), np.float32)
+
+
+def fuse_boxes(dets, iou_threshold, ios_threshold=0.6):
+    """Greedy per-class fusion: the best box absorbs same-class boxes that overlap it by
+    IoU > iou_threshold or intersection / smaller area > ios_threshold, growing to their union"""
+    if len(dets) < 2:
+        return dets
+    order = dets[:, 4].argsort()[::-1]
+    dets = dets[order]
+    x1, y1, x2, y2, cls = dets[:, 0], dets[:, 1], dets[:, 2], dets[:, 3], dets[:, 5]
+    areas = (x2 - x1).clip(0) * (y2 - y1).clip(0)
+    alive = np.ones(len(dets), dtype=bool)
+    fused = []
+    for i in range(len(dets)):
+        if not alive[i]:
+            continue
+        rest = np.flatnonzero(alive)
+        rest = rest[(rest != i) & (cls[rest] == cls[i])]
+        iw = (np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest])).clip(0)
+        ih = (np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest])).clip(0)
+        inter = iw * ih
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+        ios = inter / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        group = rest[(iou > iou_threshold) | (ios > ios_threshold)]
+        alive[i] = False
+        alive[group] = False
+        members = np.append(group, i)
+        fused.append([x1[members].min(), y1[members].min(), x2[members].max(), y2[members].max(), dets[i, 4], cls[i]])
+    return np.asarray(fused, dtype=np.float32)
+
+
+def merge(dets, iou_threshold, mode='fuse'):
+    """Cross-tile merge of (N, 6) detections with class-aware NMS or box fusion"""
+    if mode == 'nms':
+        if not len(dets):
+            return dets
+        return dets[nms(dets[:, :4] + dets[:, 5:6] * 4096.0, dets[:, 4], iou_threshold)]
+    return fuse_boxes(dets, iou_threshold)
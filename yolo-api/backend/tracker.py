@@ -0,0 +1,205 @@
+"""Per-camera multi-object tracking for the YOLO API
+
+Each camera has a Tracker that links detections across frames into tracks
+with stable IDs, so clients can tell "same car still parked" from "new car
+arrived". Track boxes are predicted forward with a constant-velocity
+alpha-beta filter (the steady-state form of a Kalman filter), matched to
+new detections of the same class by IoU, and confirmed after min_hits
+matches. Confirmation emits an "enter" event; a confirmed track that goes
+unmatched for max_age seconds emits "exit" with its dwell time.
+
+All track state lives in parallel NumPy arrays so prediction, the IoU
+matrix and the updates are vectorized; only the greedy assignment walks the
+candidate pairs.
+"""
+import threading
+import time
+
+import numpy as np
+
+import detections as dets_mod
+
+
+def iou_matrix(a, b):
+    """(len(a), len(b)) IoU between two sets of xyxy boxes"""
+    if not len(a) or not len(b):
+        return np.zeros((len(a), len(b)), dtype=np.float32)
+    iw = (np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])).clip(0)
+    ih = (np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])).clip(0)
+    inter = iw * ih
+    area_a = ((a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1]))[:, None]
+    area_b = ((b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1]))[None, :]
+    return inter / (area_a + area_b - inter + 1e-9)
+
+
+def _class_name(lookup, cls):
+    return str(lookup[cls]) if 0 <= cls < len(lookup) else str(cls)
+
+
+def greedy_assign(scores, threshold):
+    """Match rows to columns by descending score; returns (rows, cols) index arrays"""
+    rows, cols = np.nonzero(scores >= threshold)
+    order = scores[rows, cols].argsort()[::-1]
+    used_rows, used_cols = set(), set()
+    matched_rows, matched_cols = [], []
+    for r, c in zip(rows[order].tolist(), cols[order].tolist()):
+        if r in used_rows or c in used_cols:
+            continue
+        used_rows.add(r)
+        used_cols.add(c)
+        matched_rows.append(r)
+        matched_cols.append(c)
+    return np.array(matched_rows, dtype=np.int64), np.array(matched_cols, dtype=np.int64)
+
+
+class Tracker:
+    """IoU tracker with alpha-beta motion prediction for one camera"""
+
+    def __init__(self, iou_threshold=0.3, min_hits=2, max_age=5.0, alpha=0.6, beta=0.2):
+        self.iou_threshold = iou_threshold
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.alpha = alpha
+        self.beta = beta
+        self.lock = threading.Lock()
+        self.last_update = None
+        self._next_id = 1
+        self.ids = np.zeros(0, dtype=np.int64)
+        self.cls = np.zeros(0, dtype=np.int32)
+        self.boxes = np.zeros((0, 4), dtype=np.float32)
+        self.velocity = np.zeros((0, 4), dtype=np.float32)
+        self.first_seen = np.zeros(0, dtype=np.float64)
+        self.last_seen = np.zeros(0, dtype=np.float64)
+        self.hits = np.zeros(0, dtype=np.int32)
+        self.confirmed = np.zeros(0, dtype=bool)
+
+    def __len__(self):
+        return int(self.confirmed.sum())
+
+    def _keep(self, mask):
+        for field in ('ids', 'cls', 'boxes', 'velocity', 'first_seen', 'last_seen', 'hits', 'confirmed'):
+            setattr(self, field, getattr(self, field)[mask])
+
+    def update(self, arr, lookup, now=None):
+        """Advance tracks with one frame of detections
+
+        Returns (track_ids, dwell, events): per detection the confirmed track id
+        (0 while tentative) and seconds since the track appeared, plus the
+        enter/exit events this frame produced.
+        """
+        now = time.time() if now is None else now
+        dt = 0.0 if self.last_update is None else max(0.0, now - self.last_update)
+        self.last_update = now
+
+        predicted = self.boxes + self.velocity * dt
+        det_boxes = dets_mod.boxes(arr).astype(np.float32)
+        det_cls = arr['class_id']
+        scores = iou_matrix(predicted, det_boxes)
+        scores[self.cls[:, None] != det_cls[None, :]] = 0.0
+        t_idx, d_idx = greedy_assign(scores, self.iou_threshold)
+
+        # Matched tracks: correct the prediction towards the measurement
+        self.boxes = predicted
+        residual = det_boxes[d_idx] - predicted[t_idx]
+        self.boxes[t_idx] = predicted[t_idx] + self.alpha * residual
+        if dt > 0:
+            self.velocity[t_idx] += self.beta * residual / dt
+        self.last_seen[t_idx] = now
+        self.hits[t_idx] += 1
+
+        # Unmatched tracks coast with damped velocity
+        unmatched = np.ones(len(self.ids), dtype=bool)
+        unmatched[t_idx] = False
+        self.velocity[unmatched] *= 0.5
+
+        # Unmatched detections start tentative tracks
+        new = np.ones(len(arr), dtype=bool)
+        new[d_idx] = False
+        n_new = int(new.sum())
+        new_ids = np.arange(self._next_id, self._next_id + n_new, dtype=np.int64)
+        self._next_id += n_new
+        start = len(self.ids)
+        self.ids = np.concatenate([self.ids, new_ids])
+        self.cls = np.concatenate([self.cls, det_cls[new]])
+        self.boxes = np.concatenate([self.boxes, det_boxes[new]])
+        self.velocity = np.concatenate([self.velocity, np.zeros((n_new, 4), dtype=np.float32)])
+        self.first_seen = np.concatenate([self.first_seen, np.full(n_new, now)])
+        self.last_seen = np.concatenate([self.last_seen, np.full(n_new, now)])
+        self.hits = np.concatenate([self.hits, np.ones(n_new, dtype=np.int32)])
+        self.confirmed = np.concatenate([self.confirmed, np.zeros(n_new, dtype=bool)])
+
+        track_of_det = np.empty(len(arr), dtype=np.int64)
+        track_of_det[d_idx] = t_idx
+        track_of_det[new] = np.arange(start, start + n_new)
+
+        events = []
+        entering = ~self.confirmed & (self.hits >= self.min_hits)
+        self.confirmed |= entering
+        for i in np.flatnonzero(entering).tolist():
+            events.append(self._event("enter", i, lookup))
+
+        track_ids = np.where(self.confirmed[track_of_det], self.ids[track_of_det], 0)
+        dwell = now - self.first_seen[track_of_det]
+
+        # Drop tracks not seen for max_age; confirmed ones report an exit
+        expired = (now - self.last_seen) > self.max_age
+        for i in np.flatnonzero(expired & self.confirmed).tolist():
+            events.append(self._event("exit", i, lookup))
+        if expired.any():
+            self._keep(~expired)
+        return track_ids, dwell, events
+
+    def _event(self, kind, i, lookup):
+        event = {
+            "event": kind,
+            "track_id": int(self.ids[i]),
+            "class": _class_name(lookup, int(self.cls[i])),
+        }
+        if kind == "enter":
+            event["bbox"] = self.boxes[i].astype(np.int32).tolist()
+        else:
+            event["dwell_s"] = round(float(self.last_seen[i] - self.first_seen[i]), 1)
+        return event
+
+    def active(self, lookup, now=None):
+        """Compact list of confirmed tracks"""
+        now = time.time() if now is None else now
+        return [{
+            "track_id": int(self.ids[i]),
+            "class": _class_name(lookup, int(self.cls[i])),
+            "bbox": self.boxes[i].astype(np.int32).tolist(),
+            "dwell_s": round(float(now - self.first_seen[i]), 1),
+        } for i in np.flatnonzero(self.confirmed).tolist()]
+
+
+class TrackerRegistry:
+    """Trackers keyed by camera, dropped after idle_ttl seconds without frames"""
+
+    def __init__(self, idle_ttl=300.0, **tracker_args):
+        self.idle_ttl = idle_ttl
+        self.tracker_args = tracker_args
+        self._trackers = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            stale = [k for k, t in self._trackers.items()
+                     if t.last_update is not None and now - t.last_update > self.idle_ttl]
+            for k in stale:
+                del self._trackers[k]
+            tracker = self._trackers.get(key)
+            if tracker is None:
+                tracker = self._trackers[key] = Tracker(**self.tracker_args)
+            return tracker
+
+    def reset(self, key):
+        with self._lock:
+            self._trackers.pop(key, None)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cameras": len(self._trackers),
+                "active_tracks": sum(len(t) for t in self._trackers.values()),
+            }
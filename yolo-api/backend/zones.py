@@ -0,0 +1,107 @@
+"""Regions of interest and zone counting for the YOLO API
+
+Zones are named polygons (or rectangles) in 0..1 image coordinates. They are
+used two ways: detections are assigned to the zones containing their bottom
+centre point (where an object touches the ground) and counted per zone, and
+in crop mode only the zones' bounding boxes are sent to the model. A crop of
+a 1920x1080 frame that fits within the inference size is run at native
+resolution, so distant objects keep their pixels instead of being shrunk
+along with the sky and walls.
+"""
+import numpy as np
+
+import detections as dets_mod
+import tiles
+
+
+class Zone:
+    def __init__(self, name, polygon):
+        self.name = name
+        self.polygon = polygon  # (K, 2) float32 in 0..1 coordinates
+
+    def bounds(self, shape, pad=0.0):
+        """Pixel crop (x1, y1, x2, y2) around the polygon, padded by a fraction of its size"""
+        h, w = shape[:2]
+        (x1, y1), (x2, y2) = self.polygon.min(axis=0), self.polygon.max(axis=0)
+        px, py = (x2 - x1) * pad, (y2 - y1) * pad
+        left, top = int(max(0.0, x1 - px) * w), int(max(0.0, y1 - py) * h)
+        right, bottom = int(np.ceil(min(1.0, x2 + px) * w)), int(np.ceil(min(1.0, y2 + py) * h))
+        return left, top, max(right, left + 1), max(bottom, top + 1)
+
+
+def parse_zones(raw):
+    """Build zones from a list of {"name", "polygon": [[x, y], ...]} or {"name", "rect": [x1, y1, x2, y2]}"""
+    if not raw:
+        return []
+    zones = []
+    for i, spec in enumerate(raw):
+        if not isinstance(spec, dict):
+            raise ValueError("each zone must be an object with a polygon or rect")
+        name = str(spec.get('name') or f"zone_{i + 1}")
+        if spec.get('rect') is not None:
+            rect = np.asarray(spec['rect'], dtype=np.float32)
+            if rect.shape != (4,) or rect[2] <= rect[0] or rect[3] <= rect[1]:
+                raise ValueError(f"zone {name}: rect must be [x1, y1, x2, y2] with x2 > x1 and y2 > y1")
+            x1, y1, x2, y2 = rect
+            polygon = np.array([[x1, y1], [x2, y1], [x2, y2], [x1, y2]], dtype=np.float32)
+        else:
+            polygon = np.asarray(spec.get('polygon', []), dtype=np.float32)
+            if polygon.ndim != 2 or polygon.shape[1] != 2 or len(polygon) < 3:
+                raise ValueError(f"zone {name}: polygon must be a list of at least 3 [x, y] points")
+        zones.append(Zone(name, np.clip(polygon, 0.0, 1.0)))
+    if len({z.name for z in zones}) != len(zones):
+        raise ValueError("zone names must be unique")
+    return zones
+
+
+def points_in_polygon(points, polygon):
+    """Vectorized even-odd rule; points (N, 2) and polygon (K, 2) in the same coordinates"""
+    x, y = points[:, 0:1], points[:, 1:2]
+    xi, yi = polygon[:, 0], polygon[:, 1]
+    xj, yj = np.roll(xi, 1), np.roll(yi, 1)
+    crosses = (yi > y) != (yj > y)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cross = (xj - xi) * (y - yi) / (yj - yi) + xi
+    return ((crosses & (x < x_cross)).sum(axis=1) % 2) == 1
+
+
+def membership(arr, zones, shape):
+    """(N, Z) bool matrix: detection i has its bottom centre inside zone j"""
+    if not len(arr) or not zones:
+        return np.zeros((len(arr), len(zones)), dtype=bool)
+    h, w = shape[:2]
+    feet = np.stack([(arr['x1'] + arr['x2']) / 2 / w, arr['y2'] / h], axis=1)
+    return np.stack([points_in_polygon(feet, zone.polygon) for zone in zones], axis=1)
+
+
+def crops(image, zones, pad=0.05):
+    """[(crop, (x_offset, y_offset))] for each zone's padded bounding box"""
+    out = []
+    for zone in zones:
+        x1, y1, x2, y2 = zone.bounds(image.shape, pad)
+        out.append((image[y1:y2, x1:x2], (x1, y1)))
+    return out
+
+
+def merge_crop_detections(parts, scale, out_shape, iou):
+    """Map per-crop detections back onto the frame and suppress duplicates where crops overlap
+
+    parts is as for tiles.map_to_frame; scale maps frame pixels to the out_shape image.
+    """
+    merged = tiles.map_to_frame(parts, scale)
+    if len(parts) > 1:
+        merged = tiles.merge(merged, iou, mode='nms')
+    return dets_mod.from_array(merged, out_shape)
+
+
+def summarize(arr, zones, inside, lookup):
+    """Per-zone counts, total and by class name"""
+    names = dets_mod.class_names(arr, lookup) if len(arr) else np.array([], dtype=object)
+    summary = {}
+    for j, zone in enumerate(zones):
+        labels, counts = np.unique(names[inside[:, j]].astype(str), return_counts=True)
+        summary[zone.name] = {
+            "count": int(inside[:, j].sum()),
+            "classes": dict(zip(labels.tolist(), counts.tolist())),
+        }
+    return summary